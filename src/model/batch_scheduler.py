@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Batch Scheduler
+Collects concurrent inference requests into micro-batches so the model runs one
+padded generate call per batch instead of one per request. Streaming requests
+run alone so their tokens can be forwarded as they are produced, and jobs only
+share a batch with jobs of the same inference mode.
+"""
+
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Dict, List, Optional
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .cancellation import CancellationToken, RequestCancelled
+except ImportError:
+    from cancellation import CancellationToken, RequestCancelled
+
+
+class _Job:
+    """A single prompt waiting for a batch slot."""
+
+    __slots__ = ("prompt", "options", "future", "enqueued_at", "on_token", "cancel_token")
+
+    def __init__(self, prompt: str, options: Dict, on_token: Optional[Callable[[str], None]],
+                 cancel_token: Optional[CancellationToken]):
+        self.prompt = prompt
+        self.options = options
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.on_token = on_token
+        self.cancel_token = cancel_token
+
+    @property
+    def streaming(self) -> bool:
+        return self.on_token is not None
+
+    @property
+    def mode(self) -> Optional[str]:
+        return self.options.get("mode")
+
+    def cancelled(self) -> bool:
+        return self.cancel_token is not None and self.cancel_token.is_cancelled()
+
+    def resolve(self, output=None, error: Optional[BaseException] = None) -> None:
+        """Set the result or exception unless the caller already cancelled (or something else resolved) the future."""
+        if self.future.done():
+            return
+        try:
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(output)
+        except InvalidStateError:
+            pass  # Cancelled by the caller in the meantime
+
+
+class BatchScheduler:
+    """Gathers prompts for a short window and runs them through the model together."""
+
+    def __init__(
+        self,
+        generate_fn: Callable[..., List[str]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+    ):
+        """
+        Args:
+            generate_fn: Runs a list of prompts through the model and returns one
+                output (decoded continuation) per prompt, in order. Called with
+                per-prompt cancel_tokens (None allowed) and options lists, and
+                on_token, which is only set for a streaming job running alone
+            max_batch_size: Largest number of prompts sent to generate_fn at once
+            max_wait_ms: How long the first request in a batch waits for company
+        """
+        self.generate_fn = generate_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+
+        # Tuning stats
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._total_requests = 0
+        self._total_batches = 0
+
+        self._worker = threading.Thread(target=self._run, name="cpa-batch-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str, options: Optional[Dict] = None,
+               on_token: Optional[Callable[[str], None]] = None,
+               cancel_token: Optional[CancellationToken] = None) -> Future:
+        """
+        Queue a prompt for the next batch.
+
+        Args:
+            prompt: Full prompt text
+            options: Per-row options forwarded to generate_fn; jobs with a different
+                options["mode"] never share a batch
+            on_token: Streaming callback for decoded text; the job then runs in a batch of its own
+            cancel_token: Token that drops the job from the queue or stops its row of the batch
+
+        Returns:
+            Future resolving to the decoded continuation for this prompt, or
+            raising RequestCancelled if the token fired first
+        """
+        job = _Job(prompt, options or {}, on_token, cancel_token)
+        with self._cond:
+            self._pending.append(job)
+            self._total_requests += 1
+            self._cond.notify()
+        return job.future
+
+    def queue_position(self, cancel_token: CancellationToken) -> int:
+        """Number of jobs ahead of the one holding cancel_token, or -1 once it has left the queue."""
+        with self._cond:
+            for position, job in enumerate(self._pending):
+                if job.cancel_token is cancel_token:
+                    return position
+        return -1
+
+    def _drop_cancelled(self) -> None:
+        for job in [job for job in self._pending if job.cancelled() or job.future.cancelled()]:
+            self._pending.remove(job)
+            if job.cancelled():
+                job.resolve(error=RequestCancelled(job.cancel_token.reason))
+
+    def _collect(self) -> List[_Job]:
+        """Block until at least one job is queued, then fill the batch until the window closes."""
+        with self._cond:
+            while True:
+                self._drop_cancelled()
+                if self._pending:
+                    break
+                self._cond.wait()
+
+            if not self._pending[0].streaming:
+                deadline = self._pending[0].enqueued_at + self.max_wait_ms / 1000.0
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            self._queue_depths[len(self._pending)] += 1
+
+            # A streaming job runs alone; otherwise take the oldest job plus later ones of the same mode
+            first = self._pending[0]
+            batch = [first]
+            if not first.streaming:
+                for job in list(self._pending)[1:]:
+                    if len(batch) >= self.max_batch_size:
+                        break
+                    if not job.streaming and job.mode == first.mode:
+                        batch.append(job)
+            for job in batch:
+                self._pending.remove(job)
+            # Futures the caller cancelled while queued are dropped here; the rest can no longer be cancelled
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+
+            if batch:
+                self._batch_sizes[len(batch)] += 1
+                self._total_batches += 1
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception as e:
+                # Never let one bad batch stop the scheduler thread
+                print(f"[ERROR] Batch scheduler: {e}")
+
+    def _run_batch(self, batch: List[_Job]) -> None:
+        if not batch:
+            return
+        try:
+            outputs = list(self.generate_fn(
+                [job.prompt for job in batch],
+                cancel_tokens=[job.cancel_token for job in batch],
+                options=[job.options for job in batch],
+                on_token=batch[0].on_token
+            ))
+        except Exception as e:
+            for job in batch:
+                job.resolve(error=e)
+            return
+
+        for i, job in enumerate(batch):
+            if job.cancelled():
+                # Partial output from an aborted generation must not reach the caller
+                job.resolve(error=RequestCancelled(job.cancel_token.reason))
+            elif i < len(outputs):
+                job.resolve(outputs[i])
+            else:
+                job.resolve(error=RuntimeError("No output returned for this prompt"))
+
+    def stats(self) -> Dict:
+        """Queue depth and batch size histograms for tuning the batching window."""
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "total_requests": self._total_requests,
+                "total_batches": self._total_batches,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "queue_depth_histogram": dict(sorted(self._queue_depths.items())),
+            }
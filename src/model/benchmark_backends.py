@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+CPU Backend Benchmark
+Runs every function in examples/example_functions.py through each CPU backend
+and reports generated tokens/s and p50/p95 request latency.
+
+Usage:
+    python benchmark_backends.py [--backends fp16 fp32 bf16 int8] [--runs 3] [--output bench.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import pathlib
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .cpu_backend import CPU_BACKENDS, configure_cpu_threads, load_model
+    from .inference_engine import MAX_INPUT_LENGTH, build_prompt
+    from .performance_test_generator import PerformanceTestGenerator
+except ImportError:
+    from cpu_backend import CPU_BACKENDS, configure_cpu_threads, load_model
+    from inference_engine import MAX_INPUT_LENGTH, build_prompt
+    from performance_test_generator import PerformanceTestGenerator
+
+BASE_DIR = pathlib.Path(__file__).parent
+MODEL_PATH = BASE_DIR / "models" / "student" / "cpa"
+EXAMPLES = BASE_DIR / "examples" / "example_functions.py"
+
+MAX_NEW_TOKENS = 16
+
+
+def load_prompts(path: pathlib.Path) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        code = f.read()
+    functions = PerformanceTestGenerator().extract_all_functions(code)
+    return [build_prompt(func['code']) for func in functions]
+
+
+def benchmark_backend(backend: str, tokenizer, prompts: List[str], runs: int) -> Dict:
+    """
+    Time single-request generation for every prompt on one backend.
+
+    Args:
+        backend: One of CPU_BACKENDS
+        tokenizer: Model tokenizer
+        prompts: Analysis prompts
+        runs: Timed passes over all prompts
+
+    Returns:
+        Dictionary with tokens/s and latency percentiles
+    """
+    device = torch.device("cpu")
+    load_start = time.perf_counter()
+    model, used = load_model(MODEL_PATH, device, backend)
+    model.eval()
+    load_s = time.perf_counter() - load_start
+
+    def generate(prompt: str) -> int:
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=MAX_INPUT_LENGTH)
+        with torch.inference_mode():
+            output_ids = model.generate(
+                **inputs,
+                max_new_tokens=MAX_NEW_TOKENS,
+                do_sample=False,
+                use_cache=True,
+                pad_token_id=tokenizer.eos_token_id,
+                eos_token_id=tokenizer.eos_token_id
+            )
+        return output_ids.shape[1] - inputs["input_ids"].shape[1]
+
+    generate(prompts[0])  # Warmup
+
+    latencies, tokens = [], 0
+    for _ in range(runs):
+        for prompt in prompts:
+            start = time.perf_counter()
+            tokens += generate(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    del model
+    gc.collect()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'backend': used,
+        'requested': backend,
+        'load_s': round(load_s, 2),
+        'requests': len(latencies),
+        'tokens_per_s': round(tokens / sum(latencies), 2),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 1),
+    }
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description='Benchmark CPU inference backends')
+    parser.add_argument('--backends', nargs='+', choices=CPU_BACKENDS, default=list(CPU_BACKENDS),
+                        help='Backends to benchmark')
+    parser.add_argument('--runs', type=int, default=3, help='Timed passes over the example functions')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get("CPA_NUM_THREADS", 0)),
+                        help='Torch threads (default: container CPU quota)')
+    parser.add_argument('--output', '-o', help='Write results as JSON')
+    args = parser.parse_args()
+
+    threads = configure_cpu_threads(args.threads)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, use_fast=True, local_files_only=True)
+    prompts = load_prompts(EXAMPLES)
+    print(f"🔬 {len(prompts)} functions x {args.runs} runs, {threads} threads")
+
+    results = []
+    for backend in args.backends:
+        print(f"⏱️  Benchmarking {backend}...")
+        results.append(benchmark_backend(backend, tokenizer, prompts, args.runs))
+
+    print(f"\n{'Backend':<10} {'Load (s)':>10} {'Tokens/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    print("-" * 54)
+    for r in results:
+        name = r['backend'] if r['backend'] == r['requested'] else f"{r['requested']}->{r['backend']}"
+        print(f"{name:<10} {r['load_s']:>10} {r['tokens_per_s']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'threads': threads, 'results': results}, f, indent=2)
+        print(f"\n✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Big-O Parsing
+Parses Big-O expressions into a structured complexity object. Kept free of
+torch so the HTTP layer and the history store can classify results.
+"""
+
+import re
+from typing import Dict, Optional
+
+
+_FACTOR = re.compile(
+    r"(?P<base>\d+)\^\(?(?P<exp_var>[a-zA-Z])\)?"
+    r"|(?P<fact_var>[a-zA-Z])!"
+    r"|sqrt\s*\(?(?P<sqrt_var>[a-zA-Z])\)?"
+    r"|log(?:\^(?P<log_pow>\d+))?\s*\(?(?P<log_var>[a-zA-Z])\)?"
+    r"|(?P<var>[a-zA-Z])(?:\s*\^\s*(?P<pow>\d+))?"
+)
+_BIG_O_START = re.compile(r"O\s*\(")
+
+
+def big_o_argument(text: str) -> Optional[str]:
+    """Inside of the first O( ... ) in text, up to its matching parenthesis (None if it never closes)."""
+    match = _BIG_O_START.search(text)
+    if not match:
+        return None
+    depth = 0
+    for i in range(match.end() - 1, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return text[match.end():i]
+    return None
+
+
+def parse_big_o(text: str) -> Optional[Dict]:
+    """
+    Parse a Big-O expression into a structured object.
+
+    Args:
+        text: Model output containing an expression such as "O(n log n)"
+
+    Returns:
+        Dictionary with notation, class, variables, degree and log_factor,
+        or None if no O(...) expression is found
+
+    Only the first balanced O(...) counts, whatever prose follows it:
+
+    >>> parse_big_o("O(n) for loop (inner)")["class"]
+    'linear'
+    >>> parse_big_o("O(n log(n)) (merge sort)")["variables"]
+    ['n']
+    """
+    inner = big_o_argument(text)
+    if inner is None:
+        return None
+    inner = inner.replace("²", "^2").replace("³", "^3").replace("×", "*").replace("·", "*")
+    inner = " ".join(inner.split())
+
+    variables = set()
+    terms = []
+    for term in inner.split("+"):
+        degree, log_factor, exponential, factorial = 0.0, 0, False, False
+        term_vars = set()
+        for factor in _FACTOR.finditer(term):
+            if factor.group("exp_var"):
+                exponential = True
+                term_vars.add(factor.group("exp_var"))
+            elif factor.group("fact_var"):
+                factorial = True
+                term_vars.add(factor.group("fact_var"))
+            elif factor.group("sqrt_var"):
+                degree += 0.5
+                term_vars.add(factor.group("sqrt_var"))
+            elif factor.group("log_var"):
+                log_factor += int(factor.group("log_pow") or 1)
+                term_vars.add(factor.group("log_var"))
+            elif factor.group("var"):
+                degree += int(factor.group("pow") or 1)
+                term_vars.add(factor.group("var"))
+        variables |= term_vars
+        terms.append((factorial, exponential, degree, log_factor))
+
+    # Dominant term (meaningful for single-variable sums like n^2 + n)
+    factorial, exponential, degree, log_factor = max(terms)
+
+    if factorial:
+        complexity_class = "factorial"
+    elif exponential:
+        complexity_class = "exponential"
+    elif len(variables) > 1:
+        complexity_class = "multivariate"
+    elif degree == 0:
+        complexity_class = "logarithmic" if log_factor else "constant"
+    elif degree < 1:
+        complexity_class = "sublinear"
+    elif degree == 1:
+        complexity_class = "linearithmic" if log_factor else "linear"
+    else:
+        complexity_class = "polynomial"
+
+    return {
+        "notation": f"O({inner})",
+        "class": complexity_class,
+        "variables": sorted(variables),
+        "degree": int(degree) if degree == int(degree) else degree,
+        "log_factor": log_factor,
+    }
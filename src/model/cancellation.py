@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cancellation
+Thread-safe tokens that let the HTTP layer abort a generation running on the
+inference thread, either explicitly (client disconnect, superseded session) or
+when a per-request deadline passes.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class RequestCancelled(Exception):
+    """Raised for a request whose generation was aborted before it finished."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Request {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Flag shared between a request handler and the generate call serving it."""
+
+    def __init__(self, timeout_s: Optional[float] = None):
+        """
+        Args:
+            timeout_s: Seconds from now after which the token counts as cancelled (None or 0 for no deadline)
+        """
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[str], None]] = []
+        self.reason = None
+        self.deadline = time.monotonic() + timeout_s if timeout_s else None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(reason)
+
+    def add_callback(self, callback: Callable[[str], None]) -> None:
+        """Call callback(reason) on cancellation (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self.reason)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def is_cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise RequestCancelled(self.reason)
+
+
+class SessionRegistry:
+    """Tracks the live request per session so a newer request supersedes the older one."""
+
+    def __init__(self):
+        self._tokens: Dict[str, CancellationToken] = {}
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, token: CancellationToken) -> None:
+        """Make token the session's current request, cancelling whatever it replaces."""
+        if not session_id:
+            return
+        with self._lock:
+            previous = self._tokens.get(session_id)
+            self._tokens[session_id] = token
+        if previous is not None and previous is not token:
+            previous.cancel("superseded")
+
+    def release(self, session_id: str, token: CancellationToken) -> None:
+        """Forget the session's request once it has finished, unless a newer one took its place."""
+        if not session_id:
+            return
+        with self._lock:
+            if self._tokens.get(session_id) is token:
+                del self._tokens[session_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tokens)
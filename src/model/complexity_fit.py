@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Complexity Fit
+Empirical Big-O from a measured (size, time) series. Every candidate model
+t = a + c * f(n) is fitted at once by weighted least squares (relative error,
+since timing noise grows with the runtime) and the candidates are ranked by
+AIC or BIC. Only needs NumPy: generated performance tests embed everything
+below the imports, and the server runs the same code on series the extension
+already collected.
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+# Candidate growth functions, normalized to 1 at the largest size (keeps 2^n finite)
+COMPLEXITY_MODELS = {
+    "O(1)": lambda n, top: np.ones_like(n),
+    "O(log n)": lambda n, top: np.log2(n + 1) / np.log2(top + 1),
+    "O(n)": lambda n, top: n / top,
+    "O(n log n)": lambda n, top: (n * np.log2(n + 1)) / (top * np.log2(top + 1)),
+    "O(n^2)": lambda n, top: (n / top) ** 2,
+    "O(n^3)": lambda n, top: (n / top) ** 3,
+    "O(2^n)": lambda n, top: np.exp2(n - top),
+}
+
+
+def _scale(name: str, top: float) -> float:
+    """f(top) for a candidate, to turn the normalized constant back into time per unit of f(n)."""
+    with np.errstate(over="ignore"):
+        return {
+            "O(1)": 1.0,
+            "O(log n)": np.log2(top + 1),
+            "O(n)": top,
+            "O(n log n)": top * np.log2(top + 1),
+            "O(n^2)": top ** 2,
+            "O(n^3)": top ** 3,
+            "O(2^n)": np.exp2(top),
+        }[name]
+
+
+def fit_complexity(sizes: Sequence[float], times: Sequence[float], criterion: str = "bic") -> Dict:
+    """
+    Fit every candidate complexity to a runtime series and pick the best one.
+
+    Args:
+        sizes: Input sizes (n)
+        times: Runtime per size (any unit; constants are reported in that unit)
+        criterion: "bic" (default, prefers fewer parameters on short series) or "aic"
+
+    Returns:
+        Dictionary with best, constant, intercept, r2, confidence (Akaike/Schwarz
+        weight of the best model), exponent (log-log slope), criterion and models
+        (every candidate with its fit, ranked best first)
+    """
+    if criterion not in ("aic", "bic"):
+        raise ValueError(f"Unknown criterion '{criterion}' (expected aic or bic)")
+    n = np.asarray(sizes, dtype=float)
+    t = np.asarray(times, dtype=float)
+    if n.shape != t.shape or n.ndim != 1:
+        raise ValueError("sizes and times must be 1-D sequences of the same length")
+    keep = np.isfinite(n) & np.isfinite(t) & (n > 0) & (t > 0)
+    n, t = n[keep], t[keep]
+    if np.unique(n).size < 3:
+        raise ValueError("Need at least 3 distinct positive sizes to fit a complexity")
+
+    m = n.size
+    top = n.max()
+    names = list(COMPLEXITY_MODELS)
+    with np.errstate(over="ignore", under="ignore"):
+        features = np.stack([COMPLEXITY_MODELS[name](n, top) for name in names])  # (models, points)
+
+    # Design matrices [1, f(n)] for every model, weighted by 1/t (relative residuals)
+    weights = 1.0 / t
+    design = np.stack([np.ones_like(features), features], axis=-1) * weights[None, :, None]
+    design[0, :, 1] = 0.0  # O(1) is the intercept alone
+    target = t * weights  # all ones
+    coef = np.einsum("kij,j->ki", np.linalg.pinv(design), target)  # (models, 2)
+
+    residuals = design @ coef[:, :, None]
+    rss = np.sum((residuals[:, :, 0] - target) ** 2, axis=1)
+    params = np.array([1] + [2] * (len(names) - 1))
+    log_likelihood = m * np.log(np.maximum(rss, 1e-12) / m)
+    aic = log_likelihood + 2 * params
+    bic = log_likelihood + params * np.log(m)
+
+    # A growth term with a negative constant describes a shrinking runtime: not a candidate
+    valid = (coef[:, 1] > 0) | (params == 1)
+    score = np.where(valid, bic if criterion == "bic" else aic, np.inf)
+    delta = score - score.min()
+    relative = np.exp(-0.5 * delta)
+    confidence = relative / relative.sum()
+
+    # R^2 of the log runtimes, comparable across candidates and sizes
+    log_t = np.log(t)
+    predicted = coef[:, :1] + coef[:, 1:] * features  # (models, points)
+    log_residuals = log_t[None, :] - np.log(np.maximum(predicted, 1e-300))
+    log_tss = np.sum((log_t - log_t.mean()) ** 2)
+    if log_tss > 0:
+        r2 = 1.0 - np.sum(log_residuals ** 2, axis=1) / log_tss
+    else:
+        r2 = np.ones(len(names))
+    exponent = float(np.polyfit(np.log(n), log_t, 1)[0])
+
+    models: List[Dict] = []
+    for i in np.argsort(score, kind="stable"):
+        with np.errstate(over="ignore", under="ignore", divide="ignore"):
+            # O(1): the constant is the level itself
+            constant = float(coef[i, 1] / _scale(names[i], top)) if params[i] == 2 else float(coef[i, 0])
+        models.append({
+            "complexity": names[i],
+            "constant": constant,
+            "intercept": float(coef[i, 0]),
+            "r2": float(r2[i]),
+            "aic": float(aic[i]),
+            "bic": float(bic[i]),
+            "confidence": float(confidence[i]),
+            "valid": bool(valid[i]),
+        })
+
+    best = models[0]
+    return {
+        "best": best["complexity"],
+        "constant": best["constant"],
+        "intercept": best["intercept"],
+        "r2": best["r2"],
+        "confidence": best["confidence"],
+        "exponent": exponent,
+        "criterion": criterion,
+        "points": int(m),
+        "models": models,
+    }
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Constrained Decoding
+Restricts generation to well-formed Big-O expressions from a configurable
+grammar (parsing lives in big_o.py).
+"""
+
+from typing import Iterable, List, Sequence
+
+import torch
+from transformers import LogitsProcessor
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .big_o import parse_big_o  # noqa: F401 (re-exported)
+except ImportError:
+    from big_o import parse_big_o  # noqa: F401 (re-exported)
+
+
+class BigOGrammar:
+    """Enumerates the Big-O expressions the model is allowed to emit."""
+
+    def __init__(self, variables: Sequence[str] = ("n", "m"), max_degree: int = 3, extra: Iterable[str] = ()):
+        """
+        Args:
+            variables: Size variables; the first one is the primary variable
+            max_degree: Highest polynomial power (n^k) in the grammar
+            extra: Additional expressions, with or without the surrounding O(...)
+        """
+        self.variables = [v.strip() for v in variables if v.strip()] or ["n"]
+        self.max_degree = max(1, max_degree)
+        self.extra = [e.strip() for e in extra if e.strip()]
+
+    def _single(self, v: str) -> List[str]:
+        forms = [f"log {v}", f"sqrt({v})", v, f"{v} log {v}"]
+        for k in range(2, self.max_degree + 1):
+            forms += [f"{v}^{k}", f"{v}^{k} log {v}"]
+        forms += [f"2^{v}", f"{v}!"]
+        return forms
+
+    def expressions(self) -> List[str]:
+        """All allowed expressions, each wrapped in O(...)."""
+        inner = ["1"]
+        for v in self.variables:
+            inner += self._single(v)
+        for i, a in enumerate(self.variables):
+            for b in self.variables[i + 1:]:
+                inner += [f"{a}*{b}", f"{a} + {b}", f"{a} log {b}", f"{a}*{b} log {b}"]
+
+        expressions = [f"O({e})" for e in inner]
+        for e in self.extra:
+            expressions.append(e if e.startswith("O(") else f"O({e})")
+        return list(dict.fromkeys(expressions))
+
+
+class TokenTrie:
+    """Prefix trie over the token ids of every allowed expression."""
+
+    def __init__(self, tokenizer, expressions: Iterable[str]):
+        self.root = {}
+        for expression in expressions:
+            # The model may or may not put a space after "Complexity:"
+            for text in (f" {expression}", expression):
+                node = self.root
+                for token_id in tokenizer.encode(text, add_special_tokens=False):
+                    node = node.setdefault(token_id, {})
+                node[None] = True  # Terminal marker
+
+    def allowed(self, prefix: Sequence[int], eos_token_id: int) -> List[int]:
+        """
+        Token ids that may follow a generated prefix.
+
+        Args:
+            prefix: Tokens generated so far for one row
+            eos_token_id: Token that ends a finished expression
+
+        Returns:
+            Ids of the trie's children, plus EOS when the prefix is a complete expression
+        """
+        node = self.root
+        for token_id in prefix:
+            if token_id == eos_token_id:
+                return [eos_token_id]
+            node = node.get(token_id)
+            if node is None:
+                return [eos_token_id]
+        allowed = [token_id for token_id in node if token_id is not None]
+        if node.get(None) or not allowed:
+            allowed.append(eos_token_id)
+        return allowed
+
+
+class BigOLogitsProcessor(LogitsProcessor):
+    """Masks every token that would leave the grammar, for the rows that asked for it."""
+
+    def __init__(self, trie: TokenTrie, prompt_length: int, eos_token_id: int, rows: List[bool]):
+        self.trie = trie
+        self.prompt_length = prompt_length
+        self.eos_token_id = eos_token_id
+        self.rows = rows
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        for row, constrained in enumerate(self.rows):
+            if not constrained:
+                continue
+            allowed = self.trie.allowed(input_ids[row, self.prompt_length:].tolist(), self.eos_token_id)
+            mask = torch.full_like(scores[row], float("-inf"))
+            mask[allowed] = 0
+            scores[row] = scores[row] + mask
+        return scores
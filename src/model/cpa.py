@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+CPA Command Line
+Entry point for repository-level tooling.
+
+Usage:
+    python cpa.py scan <dir> [--format json|csv] [--output report.json]
+"""
+
+import argparse
+import sys
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .repo_scanner import RepoScanner
+except ImportError:
+    from repo_scanner import RepoScanner
+
+
+def scan(args: argparse.Namespace) -> int:
+    scanner = RepoScanner(
+        args.directory,
+        server_url=args.server,
+        manifest_path=args.manifest,
+        jobs=args.jobs,
+        batch_size=args.batch_size,
+        excludes=args.exclude,
+    )
+    report = scanner.scan(full=args.full)
+
+    output = args.output or f"cpa_scan_report.{args.format}"
+    scanner.write_report(report, output, args.format)
+
+    analyzed = sum(1 for row in report if row['complexity'] is not None)
+    print(f"✅ Report written to {output} ({analyzed}/{len(report)} functions analyzed)")
+    return 0 if analyzed == len(report) else 1
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(prog="cpa", description="Code Performance Analyzer tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = subparsers.add_parser('scan', help='Analyze every function in a source tree')
+    scan_parser.add_argument('directory', help='Root of the source tree to scan')
+    scan_parser.add_argument('--server', default='http://127.0.0.1:5000', help='Analysis server URL')
+    scan_parser.add_argument('--format', choices=['json', 'csv'], default='json', help='Report format')
+    scan_parser.add_argument('--output', '-o', help='Report path (default: cpa_scan_report.<format>)')
+    scan_parser.add_argument('--manifest', help='Incremental scan manifest (default: <directory>/.cpa_scan_manifest.json)')
+    scan_parser.add_argument('--jobs', '-j', type=int, help='Parser processes (default: CPU count)')
+    scan_parser.add_argument('--batch-size', type=int, default=64, help='Functions per /analyze-batch request')
+    scan_parser.add_argument('--exclude', action='append', default=[], help='Directory name to skip (repeatable)')
+    scan_parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-analyze everything')
+    scan_parser.set_defaults(handler=scan)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
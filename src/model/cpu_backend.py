@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+CPU Backend
+Model loading for the selectable inference backends. fp16 matmuls are slow (or
+silently upcast) on most CPUs, so the cluster can instead run fp32, bf16 on
+CPUs with native support, or fp32 with dynamically int8-quantized Linear layers.
+Thread count is pinned to the container's CPU quota.
+"""
+
+import math
+import os
+
+import torch
+from transformers import AutoModelForCausalLM
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .shared_weights import load_shared_model
+except ImportError:
+    from shared_weights import load_shared_model
+
+
+CPU_BACKENDS = ("fp16", "fp32", "bf16", "int8")
+
+
+def cpu_quota() -> int:
+    """
+    Number of CPUs this process may use: the cgroup quota if one is set,
+    otherwise the scheduler affinity mask.
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on Windows/macOS
+        available = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is None:
+        return max(1, available)
+    return max(1, min(available, math.ceil(quota)))
+
+
+def configure_cpu_threads(num_threads: int = 0) -> int:
+    """
+    Pin torch's intra-op thread pool.
+
+    Args:
+        num_threads: Explicit thread count, or 0 to follow the CPU quota
+
+    Returns:
+        The thread count in use
+    """
+    num_threads = num_threads or cpu_quota()
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Can only be set before any parallel work has started
+    return num_threads
+
+
+def bf16_supported() -> bool:
+    """True if the CPU has native bf16 matmul support (AVX512-BF16 / AMX)."""
+    check = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    return bool(check and check())
+
+
+def load_model(model_path, device: torch.device, backend: str = "fp16", shared_dir=None):
+    """
+    Load the causal LM for the given device and CPU backend.
+
+    Args:
+        model_path: Checkpoint directory
+        device: Target device; GPUs always use fp16
+        backend: One of CPU_BACKENDS (ignored on GPU)
+        shared_dir: If set, map the weights so all workers share them (CPU only; converted
+            copies are kept here)
+
+    Returns:
+        Tuple of (model, backend actually used)
+    """
+    if device.type == "cuda":
+        backend = "fp16"
+    elif backend not in CPU_BACKENDS:
+        print(f"[WARNING] Unknown CPU backend '{backend}', using fp32")
+        backend = "fp32"
+    elif backend == "bf16" and not bf16_supported():
+        print("[WARNING] CPU has no native bf16 support, using fp32")
+        backend = "fp32"
+
+    dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(backend, torch.float32)
+
+    if shared_dir is not None and device.type == "cpu":
+        if backend == "int8":
+            print("[WARNING] int8 weights are quantized per process and cannot be shared, loading normally")
+        else:
+            try:
+                return load_shared_model(model_path, dtype, shared_dir), backend
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARNING] Shared weight loading failed ({e}), loading normally")
+
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=dtype, local_files_only=True)
+
+    if backend == "int8":
+        # Weights stored as int8, activations quantized on the fly; only Linear layers are touched
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return model, backend
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Generation Utilities
+Streamers and stopping criteria plugged into model.generate by serve.py.
+"""
+
+from typing import Callable, List, Optional
+
+import torch
+from transformers import StoppingCriteria, TextStreamer
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .big_o import big_o_argument
+except ImportError:
+    from big_o import big_o_argument
+
+
+class CallbackStreamer(TextStreamer):
+    """Forwards decoded text to a callback as generate produces it (prompt excluded)."""
+
+    def __init__(self, tokenizer, on_text: Callable[[str], None]):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.on_text = on_text
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.on_text(text)
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Stops each row as soon as its request's cancellation token fires (disconnect, deadline, superseded)."""
+
+    def __init__(self, cancel_tokens: List[Optional[object]]):
+        self.cancel_tokens = cancel_tokens
+
+    def __call__(self, input_ids, scores, **kwargs) -> torch.BoolTensor:
+        return torch.tensor(
+            [token is not None and token.is_cancelled() for token in self.cancel_tokens],
+            dtype=torch.bool, device=input_ids.device
+        )
+
+
+def repeat_cache(past_key_values, repeats: int):
+    """Repeat every batch row of a KV cache `repeats` times (row b becomes rows b*repeats ... b*repeats+repeats-1)."""
+    if hasattr(past_key_values, "batch_repeat_interleave"):
+        past_key_values.batch_repeat_interleave(repeats)
+        return past_key_values
+    # Legacy tuple-of-tuples cache
+    return tuple(tuple(t.repeat_interleave(repeats, dim=0) for t in layer) for layer in past_key_values)
+
+
+def big_o_complete(text: str) -> bool:
+    """True once text holds an O( ... ) expression whose parentheses are balanced."""
+    return big_o_argument(text) is not None
+
+
+class BigOCompleteCriteria(StoppingCriteria):
+    """Stops each row once it has produced a complete O(...) expression instead of running to max_new_tokens."""
+
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids, scores, **kwargs) -> torch.BoolTensor:
+        generated = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor(
+            [big_o_complete(text) for text in generated],
+            dtype=torch.bool, device=input_ids.device
+        )
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+History Store
+Indexed SQLite history of every analysis, queried by /results with filters,
+cursor pagination and per-complexity-class counts. Rows are appended by the
+results writer thread alongside the export store; when the history is first
+created it imports the existing CSV export, so earlier analyses are included.
+"""
+
+import csv
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .big_o import parse_big_o
+    from .result_cache import code_hash
+except ImportError:
+    from big_o import parse_big_o
+    from result_cache import code_hash
+
+
+_FUNCTION_NAME = re.compile(r"^\s*(?:async\s+)?def\s+(\w+)", re.MULTILINE)
+
+# Columns returned by query(); code is only included on request
+FIELDS = ["id", "timestamp", "function_name", "code_hash", "complexity", "complexity_class", "mode", "execution_time_ms"]
+
+_INSERT = ("INSERT INTO history (timestamp, function_name, code_hash, code, complexity, complexity_class, "
+           "mode, execution_time_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def function_name(code: str) -> str:
+    """Name of the first function defined in the snippet, or an empty string."""
+    match = _FUNCTION_NAME.search(code)
+    return match.group(1) if match else ""
+
+
+def complexity_class(complexity: str) -> str:
+    """Coarse class (linear, polynomial, ...) of a Big-O answer, or "unknown"."""
+    parsed = parse_big_o(complexity or "")
+    return parsed["class"] if parsed else "unknown"
+
+
+class HistoryStore:
+    """Append-only analysis history with indexes for the /results filters."""
+
+    def __init__(self, db_path, seed_csv=None):
+        """
+        Args:
+            db_path: SQLite database file (shared by all workers; WAL mode)
+            seed_csv: CSV export (timestamp, code, complexity, execution_time_ms) imported
+                once, in the same transaction that creates the history table
+        """
+        self.db_path = db_path
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("BEGIN IMMEDIATE")  # Workers start together: one creates and seeds, the rest wait
+            created = db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history'"
+            ).fetchone() is None
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, function_name TEXT NOT NULL, "
+                "code_hash TEXT NOT NULL, code TEXT NOT NULL, complexity TEXT NOT NULL, "
+                "complexity_class TEXT NOT NULL, mode TEXT NOT NULL, execution_time_ms REAL NOT NULL)"
+            )
+            for column in ("timestamp", "function_name", "code_hash", "complexity", "complexity_class"):
+                db.execute(f"CREATE INDEX IF NOT EXISTS idx_history_{column} ON history ({column})")
+            if created and seed_csv and os.path.exists(seed_csv):
+                imported = self._import_csv(db, seed_csv)
+                print(f"[INFO] Imported {imported} past result(s) from {seed_csv} into the history")
+            db.execute("COMMIT")
+        finally:
+            db.close()  # Rolls back if anything above failed, so the next start retries the import
+
+    @staticmethod
+    def _records(rows: Sequence[Tuple[str, str, str, float, str]]) -> List[Tuple]:
+        return [
+            (timestamp, function_name(code), code_hash(code), code, complexity,
+             complexity_class(complexity), mode, execution_time_ms)
+            for timestamp, code, complexity, execution_time_ms, mode in rows
+        ]
+
+    def _import_csv(self, db: sqlite3.Connection, path, batch_size: int = 5000) -> int:
+        """Insert the rows of a CSV export; returns how many were imported."""
+        imported = 0
+        batch = []
+        with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # Header
+            for row in reader:
+                if len(row) < 4:
+                    continue
+                timestamp, code, complexity, execution_time_ms = row[:4]
+                try:
+                    execution_time_ms = float(execution_time_ms)
+                except ValueError:
+                    continue
+                # Older exports hold raw multi-line code, newer ones escape newlines (one row per line)
+                if "\n" not in code:
+                    code = code.replace("\\n", "\n")
+                batch.append((timestamp, code, complexity, execution_time_ms, "generate"))  # The only mode before the history
+                if len(batch) >= batch_size:
+                    db.executemany(_INSERT, self._records(batch))
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            db.executemany(_INSERT, self._records(batch))
+            imported += len(batch)
+        return imported
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def append(self, rows: Sequence[Tuple[str, str, str, float, str]]) -> None:
+        """
+        Args:
+            rows: (timestamp, code, complexity, execution_time_ms, mode) tuples
+        """
+        with self._connect() as db:
+            db.executemany(_INSERT, self._records(rows))
+
+    def clear(self) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM history")
+
+    @staticmethod
+    def _where(filters: Dict) -> Tuple[str, List]:
+        """SQL condition for the non-empty filters (exact matches plus a timestamp range)."""
+        clauses, params = [], []
+        for column in ("function_name", "code_hash", "complexity", "complexity_class", "mode"):
+            if filters.get(column):
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if filters.get("since"):
+            clauses.append("timestamp >= ?")
+            params.append(filters["since"])
+        if filters.get("until"):
+            clauses.append("timestamp < ?")
+            params.append(filters["until"])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, filters: Dict, limit: int = 50, cursor: Optional[int] = None,
+              include_code: bool = False) -> Tuple[List[Dict], Optional[int]]:
+        """
+        One page of results, newest first.
+
+        Args:
+            filters: function_name, code_hash, complexity, complexity_class, mode, since, until
+            limit: Page size
+            cursor: id of the last row of the previous page (None for the first page)
+            include_code: Also return each snippet's source
+
+        Returns:
+            Tuple of (rows, cursor for the next page or None when there are no more rows)
+        """
+        where, params = self._where(filters)
+        if cursor is not None:
+            where += (" AND " if where else " WHERE ") + "id < ?"
+            params.append(cursor)
+        columns = FIELDS + (["code"] if include_code else [])
+
+        db = self._connect()
+        try:
+            rows = db.execute(
+                f"SELECT {', '.join(columns)} FROM history{where} ORDER BY id DESC LIMIT ?", params + [limit + 1]
+            ).fetchall()
+        finally:
+            db.close()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return [dict(zip(columns, row)) for row in rows[:limit]], next_cursor
+
+    def counts(self, filters: Dict) -> Dict[str, int]:
+        """Number of matching results per complexity class."""
+        where, params = self._where(filters)
+        db = self._connect()
+        try:
+            rows = db.execute(
+                f"SELECT complexity_class, COUNT(*) FROM history{where} GROUP BY complexity_class ORDER BY 2 DESC",
+                params
+            ).fetchall()
+        finally:
+            db.close()
+        return dict(rows)
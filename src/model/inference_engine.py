@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Inference Engine
+Owns the tokenizer and model: loading, warmup, the prefix cache and the batch
+entry point the scheduler calls. serve.py imports this module lazily so the
+HTTP server is up (and torch/transformers are not imported) before the model
+finishes loading.
+"""
+
+import hashlib
+import os
+import pathlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+from transformers import AutoTokenizer, LogitsProcessorList, StoppingCriteriaList
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .generation_utils import BigOCompleteCriteria, CallbackStreamer, CancellationCriteria
+    from .constrained_decoding import BigOGrammar, BigOLogitsProcessor, TokenTrie, parse_big_o
+    from .label_scoring import DEFAULT_LABELS, LabelScorer
+    from .prefix_cache import PromptPrefixCache
+    from .cpu_backend import configure_cpu_threads, load_model
+    from .shared_weights import memory_usage
+except ImportError:
+    from generation_utils import BigOCompleteCriteria, CallbackStreamer, CancellationCriteria
+    from constrained_decoding import BigOGrammar, BigOLogitsProcessor, TokenTrie, parse_big_o
+    from label_scoring import DEFAULT_LABELS, LabelScorer
+    from prefix_cache import PromptPrefixCache
+    from cpu_backend import configure_cpu_threads, load_model
+    from shared_weights import memory_usage
+
+
+MAX_INPUT_LENGTH = 512
+
+# Fixed instruction every analysis prompt starts with
+ANALYSIS_PREFIX = "Analyze the following Python function and respond ONLY with its Big-O time complexity:\n\n"
+# Reuse the instruction's KV cache across requests instead of prefilling it every time
+PREFIX_CACHE = os.environ.get("CPA_PREFIX_CACHE", "1") == "1"
+
+# CPU inference backend: fp16 (legacy), fp32, bf16 or int8 (dynamically quantized Linear layers)
+CPU_BACKEND = os.environ.get("CPA_CPU_BACKEND", "fp16")
+# Torch threads on CPU (0 = follow the container's CPU quota)
+NUM_THREADS = int(os.environ.get("CPA_NUM_THREADS", 0))
+# Memory-map the weights so every worker shares one copy (CPU, non-int8 backends)
+SHARED_WEIGHTS = os.environ.get("CPA_SHARED_WEIGHTS", "0") == "1"
+SHARED_WEIGHTS_DIR = os.environ.get("CPA_SHARED_WEIGHTS_DIR") or None  # Default: <model dir>-shared
+
+# Grammar for constrained Big-O decoding
+BIG_O_VARIABLES = os.environ.get("CPA_BIG_O_VARIABLES", "n,m").split(",")
+BIG_O_MAX_DEGREE = int(os.environ.get("CPA_BIG_O_MAX_DEGREE", 3))
+BIG_O_EXTRA = [e for e in os.environ.get("CPA_BIG_O_EXTRA", "").split(";") if e]
+
+# Candidate labels for classify mode
+CLASSIFY_LABELS = [l for l in os.environ.get("CPA_CLASSIFY_LABELS", ";".join(DEFAULT_LABELS)).split(";") if l]
+CLASSIFY_TEMPERATURE = float(os.environ.get("CPA_CLASSIFY_TEMPERATURE", 1.0))
+# Subtract each label's score on a content-free prompt (the model's prior for the label)
+CLASSIFY_CALIBRATE = os.environ.get("CPA_CLASSIFY_CALIBRATE", "1") == "1"
+
+
+def build_prompt(code_snippet: str) -> str:
+    return f"{ANALYSIS_PREFIX}{code_snippet}\nComplexity:"
+
+
+class InferenceEngine:
+    """Loaded model plus everything needed to run analysis batches on it."""
+
+    def __init__(self, model_path: pathlib.Path):
+        """
+        Load, warm up and precompute caches (takes seconds on GPU, minutes on CPU).
+
+        Args:
+            model_path: Checkpoint directory
+        """
+        print(f"Loading model from: {model_path}")
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"Using device: {self.device}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, use_fast=True, local_files_only=True)
+        if self.device.type == "cpu":
+            print(f"Using {configure_cpu_threads(NUM_THREADS)} CPU threads")
+        shared_dir = None
+        if SHARED_WEIGHTS:
+            shared_dir = SHARED_WEIGHTS_DIR or pathlib.Path(model_path).parent / f"{pathlib.Path(model_path).name}-shared"
+        self.model, self.backend = load_model(model_path, self.device, CPU_BACKEND, shared_dir)
+        print(f"Using backend: {self.backend}")
+        torch.backends.cudnn.benchmark = True
+        self.model.to(self.device)
+        self.model.eval()
+        # model = torch.compile(model) # torch.compile() causes asyncio deadlock
+
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Left pad so every row of a batch ends at the same position for generate
+        self.tokenizer.padding_side = "left"
+
+        big_o_expressions = BigOGrammar(BIG_O_VARIABLES, BIG_O_MAX_DEGREE, BIG_O_EXTRA).expressions()
+        self.big_o_trie = TokenTrie(self.tokenizer, big_o_expressions)
+        # Fingerprint of everything constrained decoding may emit (variables, degree, extra terms)
+        self.grammar_id = hashlib.sha256("\n".join(sorted(big_o_expressions)).encode("utf-8")).hexdigest()[:16]
+
+        # Warmup
+        print("Warming up model...")
+        warmup = self.tokenizer("warmup", return_tensors="pt", padding=True)
+        warmup = {k: v.to(self.device) for k, v in warmup.items()}
+        with torch.inference_mode():
+            _ = self.model.generate(
+                warmup["input_ids"],
+                attention_mask=warmup["attention_mask"],
+                max_new_tokens=1,
+                do_sample=False,
+                use_cache=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id
+            )
+
+        # Precompute the shared instruction prefix so requests only prefill their own code
+        self.prefix_cache = (
+            PromptPrefixCache(self.model, self.tokenizer, ANALYSIS_PREFIX, self.device) if PREFIX_CACHE else None
+        )
+        self.label_scorer = LabelScorer(self.model, self.tokenizer, CLASSIFY_LABELS, CLASSIFY_TEMPERATURE)
+        if CLASSIFY_CALIBRATE:
+            inputs, past_key_values, past_length = self.prepare_inputs([build_prompt("N/A")])
+            self.label_scorer.calibrate(inputs["input_ids"], inputs["attention_mask"], past_key_values, past_length)
+        print("Model ready.")
+        print(f"[INFO] Worker memory: {memory_usage()}")
+
+    @property
+    def info(self) -> Dict:
+        """Settings that affect results (cache keys) and routing (heartbeats on CPU)."""
+        return {
+            "device": self.device.type,
+            "backend": self.backend,
+            "dtype": str(self.model.dtype).replace("torch.", ""),
+            "labels": self.label_scorer.labels,
+            "temperature": self.label_scorer.temperature,
+            "calibrated": self.label_scorer.calibrated,
+            "grammar": self.grammar_id,
+        }
+
+    def memory(self) -> Dict:
+        """ Resident memory of the process holding the model, shared vs private"""
+        return memory_usage()
+
+    def prepare_inputs(self, prompts: List[str]) -> Tuple[dict, object, int]:
+        """ Tokenize a batch; returns (inputs, past_key_values, cached_length) with the prefix cache when it applies"""
+        if self.prefix_cache is not None:
+            inputs = self.prefix_cache.prepare(prompts, MAX_INPUT_LENGTH, self.device)
+            if inputs is not None:
+                return inputs, self.prefix_cache.expand(len(prompts)), self.prefix_cache.length
+
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            truncation=True,
+            max_length=MAX_INPUT_LENGTH,
+            padding=True
+        )
+        return {k: v.to(self.device) for k, v in inputs.items()}, None, 0
+
+    def generate_batch(self, prompts: List[str], cancel_tokens: Optional[List[Optional[object]]] = None,
+                       options: Optional[List[dict]] = None,
+                       on_token: Optional[Callable[[str], None]] = None) -> List[str]:
+        """ Run a batch of prompts through one generate call and decode each row's new tokens"""
+        inputs, past_key_values, _ = self.prepare_inputs(prompts)
+        prompt_length = inputs["input_ids"].shape[1]
+
+        # Streaming jobs are scheduled alone, so the streamer only ever sees a single row
+        streamer = CallbackStreamer(self.tokenizer, on_token) if on_token else None
+        # Rows finish as soon as they hold a full O(...) or their request is cancelled
+        stopping_criteria = StoppingCriteriaList([BigOCompleteCriteria(self.tokenizer, prompt_length)])
+        if cancel_tokens and any(cancel_tokens):
+            stopping_criteria.append(CancellationCriteria(cancel_tokens))
+
+        # Constrained rows may only emit tokens that keep them inside the Big-O grammar
+        constrained_rows = [bool(o.get("constrained")) for o in options] if options else []
+        logits_processor = LogitsProcessorList()
+        if any(constrained_rows):
+            logits_processor.append(
+                BigOLogitsProcessor(self.big_o_trie, prompt_length, self.tokenizer.eos_token_id, constrained_rows)
+            )
+
+        with torch.inference_mode():
+            output_ids = self.model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                past_key_values=past_key_values,
+                max_new_tokens=16,
+                do_sample=False,
+                use_cache=True,
+                pad_token_id=self.tokenizer.eos_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=stopping_criteria,
+                logits_processor=logits_processor
+            )
+
+        return [
+            self.tokenizer.decode(row[prompt_length:], skip_special_tokens=True)
+            for row in output_ids
+        ]
+
+    def classify_batch(self, prompts: List[str]) -> List[dict]:
+        """ Score every candidate label for a batch of prompts with one shared prefill"""
+        inputs, past_key_values, past_length = self.prepare_inputs(prompts)
+        return self.label_scorer.score(inputs["input_ids"], inputs["attention_mask"], past_key_values, past_length)
+
+    def run_batch(self, snippets: List[str], cancel_tokens: Optional[List[Optional[object]]] = None,
+                  options: Optional[List[dict]] = None,
+                  on_token: Optional[Callable[[str], None]] = None) -> List[dict]:
+        """
+        Scheduler entry point; a batch only ever holds jobs of one mode.
+
+        Args:
+            snippets: Code snippets (the prompt is built here)
+            cancel_tokens: Per-row cancellation tokens
+            options: Per-row options with mode and constrained
+            on_token: Streaming callback for single-row batches
+
+        Returns:
+            One analysis dictionary per snippet
+        """
+        prompts = [build_prompt(code) for code in snippets]
+        if options and options[0].get("mode") == "classify":
+            return [{"mode": "classify", **scores} for scores in self.classify_batch(prompts)]
+
+        analyses = []
+        for i, text in enumerate(self.generate_batch(prompts, cancel_tokens, options, on_token)):
+            complexity = text.strip().split("\n")[0]
+            analysis = {"complexity": complexity, "mode": "generate"}
+            if options and options[i].get("constrained"):
+                analysis["parsed"] = parse_big_o(complexity)
+            analyses.append(analysis)
+        return analyses
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Inference Worker
+A single process that owns the model and batches jobs from every HTTP worker.
+uvicorn workers connect over a local socket (CPA_INFERENCE_ADDRESS) through
+InferenceClient, which mirrors the BatchScheduler API (submit / queue_position
+/ stats) so serve.py works the same in-process or remote. Both sides need the
+same CPA_INFERENCE_AUTHKEY, and the socket lives in a directory only this user
+can open.
+
+Usage:
+    CPA_INFERENCE_AUTHKEY=<secret> python inference_worker.py --address ~/.cpa/inference.sock
+"""
+
+import argparse
+import itertools
+import os
+import pathlib
+import stat
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, Optional
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .batch_scheduler import BatchScheduler
+    from .cancellation import CancellationToken, RequestCancelled
+except ImportError:
+    from batch_scheduler import BatchScheduler
+    from cancellation import CancellationToken, RequestCancelled
+
+BASE_DIR = pathlib.Path(__file__).parent
+MODEL_PATH = BASE_DIR / "models" / "student" / "cpa"
+
+INFERENCE_ADDRESS = os.environ.get("CPA_INFERENCE_ADDRESS", "")
+# Shared secret of the worker and its front-ends (required; e.g. generated at container start)
+INFERENCE_AUTHKEY = os.environ.get("CPA_INFERENCE_AUTHKEY", "").encode()
+
+# Same batching window settings as serve.py
+MAX_BATCH_SIZE = int(os.environ.get("CPA_MAX_BATCH_SIZE", 8))
+MAX_BATCH_WAIT_MS = float(os.environ.get("CPA_MAX_BATCH_WAIT_MS", 10))
+
+# How often queue positions of streaming jobs are pushed to their front-end
+POSITION_INTERVAL_S = 0.25
+
+
+def require_authkey(authkey: bytes) -> bytes:
+    """Refuse to serve or connect without a shared secret (anyone who can reach the socket could submit jobs)."""
+    if not authkey:
+        raise RuntimeError("CPA_INFERENCE_AUTHKEY must be set for the inference worker and its front-ends, "
+                           "e.g. to the output of: python -c 'import secrets; print(secrets.token_hex(32))'")
+    return authkey
+
+
+def private_socket_dir(address: str) -> str:
+    """
+    Create the socket's directory with mode 0700 (or check an existing one) so no
+    other user can connect to the socket or bind its path first.
+
+    Returns:
+        The directory
+    """
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Socket directory {directory} must be a directory owned by this user "
+                           f"with mode 0700 (is {stat.filemode(info.st_mode)}, uid {info.st_uid})")
+    return directory
+
+
+class InferenceServer:
+    """Loads the engine, then serves submit/cancel/stats messages from front-end connections."""
+
+    def __init__(self, address: str, authkey: bytes = INFERENCE_AUTHKEY):
+        # Fix dual import for relative path for cluster vs dev container
+        try:
+            from .inference_engine import InferenceEngine
+        except ImportError:
+            from inference_engine import InferenceEngine
+
+        self.address = address
+        self.authkey = require_authkey(authkey)
+        self.engine = InferenceEngine(MODEL_PATH)
+        self.scheduler = BatchScheduler(
+            self.engine.run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS
+        )
+
+    def serve_forever(self) -> None:
+        # Only listen once the model is ready; clients retry until then
+        private_socket_dir(self.address)
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket from a previous run
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            os.chmod(self.address, 0o600)
+            print(f"[INFO] Inference worker listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError, EOFError) as e:  # Wrong key, or the client went away
+                    print(f"[WARNING] Rejected an inference connection: {type(e).__name__}: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), name="cpa-inference-conn", daemon=True).start()
+
+    def _handle(self, conn: Connection) -> None:
+        """Serve one front-end until it disconnects; its unfinished jobs are then cancelled."""
+        send_lock = threading.Lock()
+        jobs: Dict[int, CancellationToken] = {}
+        streaming: Dict[int, CancellationToken] = {}
+        closed = threading.Event()
+
+        def send(message) -> None:
+            with send_lock:
+                try:
+                    conn.send(message)
+                except (OSError, EOFError):
+                    closed.set()
+
+        def finish(job_id: int, future: Future) -> None:
+            jobs.pop(job_id, None)
+            streaming.pop(job_id, None)
+            try:
+                send(("result", job_id, future.result()))
+            except RequestCancelled as e:
+                send(("cancelled", job_id, e.reason))
+            except Exception as e:
+                send(("error", job_id, str(e)))
+
+        def push_positions() -> None:
+            while not closed.wait(POSITION_INTERVAL_S):
+                positions = {job_id: self.scheduler.queue_position(token) for job_id, token in list(streaming.items())}
+                if positions:
+                    send(("positions", positions))
+
+        threading.Thread(target=push_positions, name="cpa-inference-positions", daemon=True).start()
+        send(("ready", self.engine.info))
+
+        try:
+            while True:
+                message = conn.recv()
+                kind = message[0]
+                if kind == "submit":
+                    _, job_id, snippet, options, stream, timeout_s = message
+                    token = CancellationToken(timeout_s)
+                    if timeout_s is not None and timeout_s <= 0:
+                        token.cancel("deadline exceeded")
+                    jobs[job_id] = token
+                    if stream:
+                        streaming[job_id] = token
+                    on_token = (lambda text, job_id=job_id: send(("token", job_id, text))) if stream else None
+                    future = self.scheduler.submit(snippet, options=options, on_token=on_token, cancel_token=token)
+                    future.add_done_callback(lambda f, job_id=job_id: finish(job_id, f))
+                elif kind == "cancel":
+                    _, job_id, reason = message
+                    token = jobs.get(job_id)
+                    if token is not None:
+                        token.cancel(reason)
+                elif kind == "stats":
+                    send(("stats", message[1], {"batching": self.scheduler.stats(), "memory": self.engine.memory()}))
+        except (EOFError, OSError):
+            pass
+        finally:
+            closed.set()
+            for token in list(jobs.values()):
+                token.cancel("disconnected")
+            conn.close()
+
+
+class InferenceClient:
+    """Front-end side of the worker connection, with the BatchScheduler interface."""
+
+    def __init__(self, address: str, authkey: bytes = INFERENCE_AUTHKEY):
+        self.address = address
+        self.authkey = require_authkey(authkey)
+        self.info: Optional[Dict] = None
+
+        self._conn: Optional[Connection] = None
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._futures: Dict[int, Future] = {}
+        self._streams: Dict[int, Callable[[str], None]] = {}
+        self._tokens: Dict[int, CancellationToken] = {}
+        self._positions: Dict[int, int] = {}
+        self._replies: Dict[int, Future] = {}
+        self._connected = threading.Event()
+
+    def connect(self, retry_s: float = 2.0) -> Dict:
+        """
+        Block until the worker accepts the connection (it only listens once the model is loaded).
+
+        Returns:
+            Engine info sent by the worker
+        """
+        while True:
+            try:
+                conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except (OSError, EOFError):  # Not listening yet, or reset by a dying worker
+                time.sleep(retry_s)
+                continue
+            try:
+                kind, info = conn.recv()
+                break
+            except (OSError, EOFError):
+                conn.close()
+                time.sleep(retry_s)
+
+        self._conn = conn
+        self.info = info
+        self._connected.set()
+        threading.Thread(target=self._read, name="cpa-inference-client", daemon=True).start()
+        return info
+
+    def _send(self, message) -> None:
+        if not self._connected.is_set():
+            raise RuntimeError("Inference worker is not connected")
+        with self._send_lock:
+            self._conn.send(message)
+
+    def _read(self) -> None:
+        """Dispatch worker messages to futures and streaming callbacks; reconnect if the worker goes away."""
+        try:
+            while True:
+                message = self._conn.recv()
+                kind = message[0]
+                if kind == "token":
+                    on_token = self._streams.get(message[1])
+                    if on_token is not None:
+                        on_token(message[2])
+                elif kind == "positions":
+                    self._positions.update(message[1])
+                elif kind == "stats":
+                    reply = self._replies.pop(message[1], None)
+                    if reply is not None:
+                        reply.set_result(message[2])
+                elif kind in ("result", "cancelled", "error"):
+                    job_id = message[1]
+                    self._streams.pop(job_id, None)
+                    self._tokens.pop(job_id, None)
+                    self._positions.pop(job_id, None)
+                    future = self._futures.pop(job_id, None)
+                    if future is None:
+                        continue
+                    if kind == "result":
+                        future.set_result(message[2])
+                    elif kind == "cancelled":
+                        future.set_exception(RequestCancelled(message[2]))
+                    else:
+                        future.set_exception(RuntimeError(message[2]))
+        except (EOFError, OSError):
+            print("[WARNING] Lost connection to the inference worker, reconnecting")
+        self._connected.clear()
+        for future in list(self._futures.values()) + list(self._replies.values()):
+            if not future.done():
+                future.set_exception(RuntimeError("Inference worker disconnected"))
+        self._futures.clear()
+        self._replies.clear()
+        self._streams.clear()
+        self._tokens.clear()
+        self.connect()
+
+    def submit(self, prompt: str, options: Optional[Dict] = None,
+               on_token: Optional[Callable[[str], None]] = None,
+               cancel_token: Optional[CancellationToken] = None) -> Future:
+        """Send a snippet to the worker; same contract as BatchScheduler.submit."""
+        future = Future()
+        if cancel_token is not None and cancel_token.is_cancelled():
+            future.set_exception(RequestCancelled(cancel_token.reason))
+            return future
+
+        job_id = next(self._ids)
+        self._futures[job_id] = future
+        if on_token is not None:
+            self._streams[job_id] = on_token
+        timeout_s = None
+        if cancel_token is not None:
+            self._tokens[job_id] = cancel_token
+            timeout_s = cancel_token.remaining()
+
+        try:
+            self._send(("submit", job_id, prompt, options or {}, on_token is not None, timeout_s))
+        except Exception as e:
+            self._futures.pop(job_id, None)
+            future.set_exception(RuntimeError(f"Inference worker unavailable: {e}"))
+            return future
+
+        if cancel_token is not None:
+            # Relay disconnects/supersedes; the worker enforces the deadline itself
+            cancel_token.add_callback(lambda reason: self._cancel(job_id, reason))
+        return future
+
+    def _cancel(self, job_id: int, reason: str) -> None:
+        if job_id in self._futures:
+            try:
+                self._send(("cancel", job_id, reason))
+            except Exception:
+                pass
+
+    def queue_position(self, cancel_token: CancellationToken) -> int:
+        for job_id, token in list(self._tokens.items()):
+            if token is cancel_token:
+                return self._positions.get(job_id, -1)
+        return -1
+
+    def _query(self, timeout_s: float = 2.0) -> Dict:
+        request_id = next(self._ids)
+        reply = Future()
+        self._replies[request_id] = reply
+        try:
+            self._send(("stats", request_id))
+            return reply.result(timeout=timeout_s)
+        except Exception:
+            self._replies.pop(request_id, None)
+            return {}
+
+    def alive(self, timeout_s: float = 2.0) -> bool:
+        """Whether the worker is connected and answers a stats request within timeout_s."""
+        return self._connected.is_set() and bool(self._query(timeout_s))
+
+    def stats(self) -> Dict:
+        """Batching stats of the worker's scheduler."""
+        return self._query().get("batching", {})
+
+    def memory(self) -> Dict:
+        """Memory of the worker process (the one holding the model)."""
+        return self._query().get("memory", {})
+
+
+def main():
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description='Run the model in a dedicated inference process')
+    parser.add_argument('--address', default=INFERENCE_ADDRESS or os.path.expanduser("~/.cpa/inference.sock"),
+                        help='Unix socket the HTTP workers connect to (CPA_INFERENCE_ADDRESS); '
+                             'its directory is created with mode 0700')
+    args = parser.parse_args()
+
+    InferenceServer(args.address).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Input Generators
+Seeded, vectorized inputs for generated performance tests. Values are drawn
+with NumPy and turned into Python objects in one step (.tolist()); every
+(kind, size, options) input is built once, cached, and handed out as a fresh
+copy, so runs are reproducible and a function that mutates its input never
+sees another run's leftovers. Only needs NumPy: generated tests embed
+everything below the imports.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def fresh_copy(value):
+    """Copy of a generated input, deep enough that mutating it leaves the original intact."""
+    if isinstance(value, list):
+        if value and isinstance(value[0], (list, dict, set, np.ndarray)):
+            return [fresh_copy(v) for v in value]
+        return value.copy()
+    if isinstance(value, dict):
+        if value and isinstance(next(iter(value.values())), (list, dict, set, np.ndarray)):
+            return {k: fresh_copy(v) for k, v in value.items()}
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(fresh_copy(v) for v in value)
+    if isinstance(value, (set, np.ndarray)):
+        return value.copy()
+    return value  # Numbers and strings are immutable
+
+
+def input_length(value) -> int:
+    """Rough element count of an input (tuple arguments summed), to size batches of copies."""
+    if isinstance(value, tuple):
+        return sum(input_length(v) for v in value) or 1
+    if isinstance(value, list) and value and isinstance(value[0], list):
+        return len(value) * len(value[0]) or 1
+    if isinstance(value, (list, dict, set, np.ndarray)):
+        return len(value) or 1
+    return 1
+
+
+class InputGenerator:
+    """Seeded input builders; each (kind, size, options) is generated once and copied out."""
+
+    def __init__(self, seed: int = 0):
+        """
+        Args:
+            seed: Base seed; every kind and size draws from its own stream derived from it
+        """
+        self.seed = seed
+        self._entropy = [seed]
+        self._cache: Dict[Tuple, object] = {}
+        self._streams: Dict[int, "InputGenerator"] = {}
+
+    def _rng(self, key: Tuple) -> np.random.Generator:
+        """A stream per key, so an input doesn't depend on which sizes were built before it."""
+        return np.random.default_rng([*self._entropy, *repr(key).encode()])
+
+    def _cached(self, key: Tuple, build: Callable):
+        """Build an input once per key and return a fresh copy of it."""
+        if key not in self._cache:
+            self._cache[key] = build(self._rng(key))
+        return fresh_copy(self._cache[key])
+
+    def stream(self, index: int) -> "InputGenerator":
+        """Independent generator for another argument of the same kind (two different lists, say)."""
+        if index not in self._streams:
+            child = InputGenerator(self.seed)
+            child._entropy = self._entropy + [256 + index]  # Above any byte of a key
+            self._streams[index] = child
+        return self._streams[index]
+
+    def clear(self) -> None:
+        """Drop the cached inputs."""
+        self._cache.clear()
+        for child in self._streams.values():
+            child.clear()
+
+    # Lists (high defaults to max(1000, 10 * size), so large lists stay mostly distinct)
+    def ints(self, size: int, low: int = 1, high: Optional[int] = None) -> List[int]:
+        """Uniform random integers in [low, high]."""
+        high = max(1000, 10 * size) if high is None else high
+        return self._cached(("ints", size, low, high), lambda rng: rng.integers(low, high + 1, size).tolist())
+
+    def floats(self, size: int) -> List[float]:
+        """Uniform random floats in [0, 1)."""
+        return self._cached(("floats", size), lambda rng: rng.random(size).tolist())
+
+    def sorted_ints(self, size: int, low: int = 1, high: Optional[int] = None) -> List[int]:
+        """Ascending random integers."""
+        high = max(1000, 10 * size) if high is None else high
+        return self._cached(("sorted_ints", size, low, high),
+                            lambda rng: np.sort(rng.integers(low, high + 1, size)).tolist())
+
+    def reversed_ints(self, size: int, low: int = 1, high: Optional[int] = None) -> List[int]:
+        """Descending random integers (worst case for many sorts)."""
+        high = max(1000, 10 * size) if high is None else high
+        return self._cached(("reversed_ints", size, low, high),
+                            lambda rng: np.sort(rng.integers(low, high + 1, size))[::-1].tolist())
+
+    def few_unique(self, size: int, distinct: int = 8) -> List[int]:
+        """Random integers drawn from only a handful of values."""
+        return self._cached(("few_unique", size, distinct), lambda rng: rng.integers(0, distinct, size).tolist())
+
+    def list_with_target(self, size: int) -> Tuple[List[int], int]:
+        """Ascending integers and a search target for them (see target)."""
+        arr = self.sorted_ints(size)
+        return arr, self.target(arr, size)
+
+    def target(self, values, size: int):
+        """
+        Search target for values, drawn at random from their range (not from the
+        values themselves), so it is usually absent and a search runs to the end.
+        """
+        rng = self._rng(("target", size))
+        if not values:
+            return "" if isinstance(values, str) else 0
+        if isinstance(values, str):
+            return chr(int(rng.integers(97, 123)))
+        first = values[0]
+        if isinstance(first, int) and not isinstance(first, bool):
+            return int(rng.integers(min(values), max(values) + 1))
+        if isinstance(first, float):
+            return float(rng.uniform(min(values), max(values)))
+        if isinstance(first, str) and rng.random() < 0.5:
+            # Half the time a random word of the same length (almost surely absent)
+            return rng.integers(97, 123, len(first), dtype=np.uint8).tobytes().decode("ascii")
+        return values[int(rng.integers(len(values)))]
+
+    # Strings
+    def string(self, size: int) -> str:
+        """Random lowercase string of the given length."""
+        return self._cached(("string", size),
+                            lambda rng: rng.integers(97, 123, size, dtype=np.uint8).tobytes().decode("ascii"))
+
+    def strings(self, size: int, length: int = 8) -> List[str]:
+        """List of random lowercase words of a fixed length."""
+        def build(rng):
+            letters = rng.integers(97, 123, (size, length), dtype=np.uint8)
+            return letters.view(f"S{length}").ravel().astype(f"U{length}").tolist()
+        return self._cached(("strings", size, length), build)
+
+    # Mappings
+    def int_dict(self, size: int) -> Dict[int, int]:
+        """Dictionary of distinct integer keys (shuffled) to random integers."""
+        def build(rng):
+            return dict(zip(rng.permutation(size).tolist(), rng.integers(1, 1001, size).tolist()))
+        return self._cached(("int_dict", size), build)
+
+    def str_dict(self, size: int, length: int = 8) -> Dict[str, int]:
+        """Dictionary of random words to random integers."""
+        def build(rng):
+            letters = rng.integers(97, 123, (size, length), dtype=np.uint8)
+            keys = letters.view(f"S{length}").ravel().astype(f"U{length}").tolist()
+            return dict(zip(keys, rng.integers(1, 1001, size).tolist()))
+        return self._cached(("str_dict", size, length), build)
+
+    # Graphs
+    def graph(self, size: int, degree: int = 4) -> Dict[int, List[int]]:
+        """Directed random graph as an adjacency dict: node -> `degree` other nodes."""
+        def build(rng):
+            if size < 2:
+                return {node: [] for node in range(size)}
+            offsets = rng.integers(1, size, (size, min(degree, size - 1)))
+            neighbors = (np.arange(size)[:, None] + offsets) % size  # Never the node itself
+            return dict(enumerate(neighbors.tolist()))
+        return self._cached(("graph", size, degree), build)
+
+    def edges(self, size: int, degree: int = 4) -> List[Tuple[int, int]]:
+        """Edge list of the same random graph."""
+        return self._cached(("edges", size, degree), lambda rng: [
+            (u, v) for u, targets in self.graph(size, degree).items() for v in targets
+        ])
+
+    # Matrices
+    def matrix(self, size: int, low: int = 1, high: int = 10) -> List[List[int]]:
+        """size x size matrix of random integers as nested lists."""
+        return self._cached(("matrix", size, low, high),
+                            lambda rng: rng.integers(low, high + 1, (size, size)).tolist())
+
+    def matrices(self, size: int, count: int = 2, low: int = 1, high: int = 10) -> Tuple[List[List[int]], ...]:
+        """Several independent size x size matrices."""
+        return self._cached(("matrices", size, count, low, high),
+                            lambda rng: tuple(rng.integers(low, high + 1, (count, size, size)).tolist()))
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Input Synthesis
+Builds the data generator of a generated performance test from the function's
+signature. Each parameter's type comes from its annotation (List[int], str,
+Dict[str, int], nested types), else its default value, else how the body uses
+it (indexing, len(), iteration, arithmetic, methods called on it), with its
+name as the last hint. Collections grow with n (ints do when no collection
+does), and the generator states which parameter n is.
+"""
+
+import ast
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# Types are tuples: ("int",), ("list", element), ("dict", key, value), ...
+INT, FLOAT, BOOL, STR, ANY = ("int",), ("float",), ("bool",), ("str",), ("any",)
+ELEMENT = ("element",)  # A value looked up in the scaled collection (search targets)
+
+# Kinds whose size follows n
+COLLECTIONS = ("list", "str", "dict", "set", "tuple", "graph", "matrix", "edges")
+
+_TYPE_NAMES = {
+    "int": INT, "float": FLOAT, "bool": BOOL, "str": STR, "Any": ANY, "object": ANY,
+    "list": ("list", INT), "List": ("list", INT), "Sequence": ("list", INT), "Iterable": ("list", INT),
+    "dict": ("dict", INT, INT), "Dict": ("dict", INT, INT), "Mapping": ("dict", INT, INT),
+    "set": ("set", INT), "Set": ("set", INT), "FrozenSet": ("set", INT),
+    "tuple": ("tuple", INT), "Tuple": ("tuple", INT),
+}
+
+DICT_METHODS = {"items", "keys", "values", "get", "setdefault"}
+STR_METHODS = {"lower", "upper", "split", "strip", "startswith", "endswith", "isalpha", "isdigit",
+               "isalnum", "isspace", "replace", "find", "encode", "splitlines"}
+LIST_METHODS = {"append", "extend", "insert", "sort", "remove", "reverse", "index", "count"}
+
+INT_NAMES = {"n", "m", "k", "num", "number", "size", "count", "length", "limit", "steps", "depth", "x"}
+STRING_NAMES = {"s", "text", "string", "word", "sentence", "str1", "str2", "s1", "s2", "pattern", "sub"}
+GRAPH_NAMES = {"graph", "adj", "adjacency", "neighbors", "tree"}
+MATRIX_NAMES = {"matrix", "grid", "board", "mat", "image"}
+LIST_NAMES = {"arr", "array", "lst", "list", "nums", "numbers", "items", "values", "data", "seq", "elements"}
+TARGET_NAMES = {"target", "key", "value", "val", "item", "needle", "goal", "elem", "element"}
+# Collections that stay small when another collection already scales (search patterns)
+SMALL_NAMES = {"pattern", "sub", "needle", "prefix", "suffix"}
+# Name tokens of functions that search sorted input (they get sorted input only if they also take a target)
+SEARCH_WORDS = {"search", "bsearch", "bisect", "sorted"}
+
+
+def name_tokens(name: str) -> Set[str]:
+    """Lowercase words of a snake_case or camelCase name."""
+    return {t.lower() for t in re.split(r"_+|(?<=[a-z0-9])(?=[A-Z])", name) if t}
+
+
+def annotation_type(node: Optional[ast.AST]) -> Optional[Tuple]:
+    """
+    Normalized type of an annotation, or None if there is none or it is not understood.
+
+    Optional[X] and X | None count as X; typing.X and quoted annotations are accepted.
+    """
+    if node is None:
+        return None
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        try:
+            return annotation_type(ast.parse(node.value, mode="eval").body)
+        except SyntaxError:
+            return None
+    if isinstance(node, ast.Attribute):  # typing.List
+        return _TYPE_NAMES.get(node.attr)
+    if isinstance(node, ast.Name):
+        return _TYPE_NAMES.get(node.id)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):  # X | None
+        for side in (node.left, node.right):
+            if not (isinstance(side, ast.Constant) and side.value is None):
+                return annotation_type(side)
+        return None
+    if not isinstance(node, ast.Subscript):
+        return None
+
+    outer = node.value.attr if isinstance(node.value, ast.Attribute) else getattr(node.value, "id", None)
+    args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+    inner = [annotation_type(arg) or ANY for arg in args]
+    if outer == "Optional":
+        return inner[0]
+    if outer == "Union":
+        return next((t for t, arg in zip(inner, args)
+                     if not (isinstance(arg, ast.Constant) and arg.value is None)), ANY)
+    if outer in ("list", "List", "Sequence", "Iterable", "MutableSequence"):
+        return ("list", inner[0])
+    if outer in ("set", "Set", "FrozenSet", "frozenset"):
+        return ("set", inner[0])
+    if outer in ("tuple", "Tuple"):
+        return ("tuple", inner[0])
+    if outer in ("dict", "Dict", "Mapping", "MutableMapping", "DefaultDict") and len(inner) == 2:
+        return ("dict", inner[0], inner[1])
+    return _TYPE_NAMES.get(outer)
+
+
+def type_name(t: Tuple) -> str:
+    """Readable form of a normalized type, e.g. List[int]."""
+    if t[0] in ("list", "set", "tuple"):
+        return f"{t[0].capitalize()}[{type_name(t[1])}]"
+    if t[0] == "dict":
+        return f"Dict[{type_name(t[1])}, {type_name(t[2])}]"
+    if t[0] == "graph":
+        return "Dict[int, List[int]]"
+    if t[0] == "matrix":
+        return f"List[List[{type_name(t[1])}]]"
+    if t[0] == "edges":
+        return "List[Tuple[int, int]]"
+    return t[0]
+
+
+class _UsageVisitor(ast.NodeVisitor):
+    """Records how a function body uses each parameter (index, len, iterate, arithmetic, method:<name>, ...)."""
+
+    def __init__(self, params: List[str]):
+        self.usage: Dict[str, Set[str]] = {p: set() for p in params}
+
+    def _param(self, node: ast.AST) -> Optional[str]:
+        return node.id if isinstance(node, ast.Name) and node.id in self.usage else None
+
+    def _mark(self, node: ast.AST, use: str) -> None:
+        param = self._param(node)
+        if param:
+            self.usage[param].add(use)
+
+    def visit_Subscript(self, node: ast.Subscript) -> None:
+        param = self._param(node.value)
+        if param:
+            if isinstance(node.slice, ast.Slice):
+                self.usage[param].add("slice")
+            elif isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str):
+                self.usage[param].add("str_key")
+            else:
+                self.usage[param].add("index")
+            self._mark(node.slice, "index_of")
+        elif isinstance(node.value, ast.Subscript):
+            self._mark(node.value.value, "index2")
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Name):
+            for arg in node.args:
+                if node.func.id == "len":
+                    self._mark(arg, "len")
+                elif node.func.id == "range":
+                    self._mark(arg, "range")
+                elif node.func.id in ("sorted", "sum", "min", "max", "set", "list", "enumerate", "reversed",
+                                      "zip", "any", "all", "iter"):
+                    self._mark(arg, "iterate")
+        elif isinstance(node.func, ast.Attribute):
+            self._mark(node.func.value, f"method:{node.func.attr}")
+        self.generic_visit(node)
+
+    def visit_For(self, node: ast.For) -> None:
+        self._mark(node.iter, "iterate")
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node: ast.comprehension) -> None:
+        self._mark(node.iter, "iterate")
+        self.generic_visit(node)
+
+    def visit_BinOp(self, node: ast.BinOp) -> None:
+        for side, other in ((node.left, node.right), (node.right, node.left)):
+            if isinstance(other, ast.Constant) and isinstance(other.value, str):
+                self._mark(side, "concat")
+            else:
+                self._mark(side, "arithmetic")
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self._mark(node.target, "arithmetic")
+        self.generic_visit(node)
+
+    def visit_Compare(self, node: ast.Compare) -> None:
+        operands = [node.left] + node.comparators
+        for i, op in enumerate(node.ops):
+            left, right = operands[i], operands[i + 1]
+            if isinstance(op, (ast.In, ast.NotIn)):
+                self._mark(left, "element")
+                self._mark(right, "iterate")
+                continue
+            for side, other in ((left, right), (right, left)):
+                if isinstance(other, ast.Subscript):
+                    self._mark(side, "element")
+                elif isinstance(other, ast.Constant) and isinstance(other.value, (int, float)) \
+                        and not isinstance(other.value, bool):
+                    self._mark(side, "compare_num")
+        self.generic_visit(node)
+
+
+def _default_type(value) -> Optional[Tuple]:
+    """Type of a literal default value (None tells nothing)."""
+    for kind, t in ((bool, BOOL), (int, INT), (float, FLOAT), (str, STR)):
+        if isinstance(value, kind):
+            return t
+    if isinstance(value, (list, tuple, set)):
+        first = next(iter(value), 0)
+        return (type(value).__name__, _default_type(first) or INT)
+    if isinstance(value, dict):
+        return ("dict", INT, INT)
+    return None
+
+
+def infer_type(name: str, usage: Set[str], func_name: str) -> Tuple[Tuple, str]:
+    """
+    Type of an unannotated parameter from how the body uses it, then from its name.
+
+    Returns:
+        Tuple of (type, evidence: "usage", "name" or "fallback")
+    """
+    lowered = name.lower()
+    methods = {u.split(":", 1)[1] for u in usage if u.startswith("method:")}
+    if methods & DICT_METHODS or "str_key" in usage:
+        return (("graph",) if lowered in GRAPH_NAMES else ("dict", INT, INT)), "usage"
+    if methods & STR_METHODS or "concat" in usage:
+        return STR, "usage"
+    if "index2" in usage:
+        return (("graph",) if lowered in GRAPH_NAMES else ("matrix", INT)), "usage"
+    if methods & LIST_METHODS or usage & {"len", "iterate", "index", "slice"}:
+        if lowered in GRAPH_NAMES:
+            return ("graph",), "usage"
+        if lowered in MATRIX_NAMES:
+            return ("matrix", INT), "usage"
+        if lowered in STRING_NAMES:
+            return STR, "usage"
+        return ("list", INT), "usage"
+    if "element" in usage or lowered in TARGET_NAMES:
+        return ELEMENT, "usage" if "element" in usage else "name"
+    if usage & {"range", "arithmetic", "compare_num", "index_of"}:
+        return INT, "usage"
+
+    for names, t in ((INT_NAMES, INT), (STRING_NAMES, STR), (GRAPH_NAMES, ("graph",)),
+                     (MATRIX_NAMES, ("matrix", INT)), (LIST_NAMES, ("list", INT))):
+        if lowered in names:
+            return t, "name"
+    if any(word in func_name.lower() for word in ("fib", "factorial", "prime", "power")):
+        return INT, "name"
+    return ("list", INT), "fallback"
+
+
+def _collection_expr(t: Tuple, size: str, inputs: str, sorted_input: bool) -> str:
+    """Expression building a collection of type t with `size` elements."""
+    kind = t[0]
+    if kind == "str":
+        return f"{inputs}.string({size})"
+    if kind == "graph" or (kind == "dict" and t[1] == INT and t[2][0] == "list"):
+        return f"{inputs}.graph({size})"
+    if kind == "edges" or (kind == "list" and t[1][0] == "tuple"):
+        return f"{inputs}.edges({size})"
+    if kind == "matrix" or (kind == "list" and t[1][0] in ("list", "matrix")):
+        return f"{inputs}.matrix({size})"
+    if kind == "dict":
+        return f"{inputs}.str_dict({size})" if t[1] == STR else f"{inputs}.int_dict({size})"
+    element = t[1] if len(t) > 1 else INT
+    if element == STR:
+        values = f"{inputs}.strings({size})"
+    elif element == FLOAT:
+        values = f"{inputs}.floats({size})"
+    elif element == BOOL:
+        values = f"[bool(v) for v in {inputs}.few_unique({size}, 2)]"
+    else:
+        values = f"{inputs}.sorted_ints({size})" if sorted_input else f"{inputs}.ints({size})"
+    if kind == "set":
+        return f"set({values})"
+    if kind == "tuple":
+        return f"tuple({values})"
+    return values
+
+
+def _describe(name: str, t: Tuple) -> str:
+    """What n measures for a scaling parameter."""
+    if t[0] == "graph":
+        return f"the number of nodes in {name}"
+    if t[0] == "matrix" or (t[0] == "list" and t[1][0] in ("list", "matrix")):
+        return f"the rows/columns of {name}"
+    if t[0] in COLLECTIONS:
+        return f"len({name})"
+    return f"the value of {name}"
+
+
+def synthesize_inputs(code: str, generator_name: str = "generate_input") -> Optional[Dict]:
+    """
+    Build a data generator for the first function in code.
+
+    Positional parameters without defaults are always passed; defaulted ones keep
+    their defaults unless one of them has to be the scaling parameter. self/cls
+    get None.
+
+    Args:
+        code: Source of the function
+        generator_name: Name of the generated function
+
+    Returns:
+        Dictionary with code (generator source, taking size), name, scaling
+        (parameters that grow with n), scaling_description and params (name,
+        type, evidence and expression per passed parameter), or None if code
+        holds no function
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    node = next((n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))), None)
+    if node is None:
+        return None
+
+    args = node.args.posonlyargs + node.args.args
+    defaults = [None] * (len(args) - len(node.args.defaults)) + list(node.args.defaults)
+    visitor = _UsageVisitor([a.arg for a in args])
+    for statement in node.body:
+        visitor.visit(statement)
+
+    params = []
+    for i, (arg, default) in enumerate(zip(args, defaults)):
+        if i == 0 and arg.arg in ("self", "cls"):
+            params.append({"name": arg.arg, "type": ANY, "evidence": "receiver", "default": None,
+                           "has_default": False, "usage": set()})
+            continue
+        literal = None
+        if default is not None:
+            try:
+                literal = ast.literal_eval(default)
+            except ValueError:
+                literal = None
+        t, evidence = annotation_type(arg.annotation), "annotation"
+        if t is None or t == ANY:
+            t, evidence = _default_type(literal), "default"
+        if t is None:
+            t, evidence = infer_type(arg.arg, visitor.usage[arg.arg], node.name)
+        params.append({"name": arg.arg, "type": t, "evidence": evidence, "default": literal,
+                       "has_default": default is not None, "usage": visitor.usage[arg.arg]})
+
+    # A parameter nothing is known about is a scalar beside a collection that is known (a start node)
+    if any(p["type"][0] in COLLECTIONS and p["evidence"] not in ("fallback", "receiver") for p in params):
+        for p in params:
+            if p["evidence"] == "fallback":
+                p["type"] = INT
+
+    # Sorted input only for searches (merge_sort must not get its best case)
+    searchy = bool(name_tokens(node.name) & SEARCH_WORDS) and any(p["type"] == ELEMENT for p in params)
+
+    # Scaling parameters: every collection (search patterns stay small), else one integer
+    candidates = [p for p in params if p["evidence"] != "receiver"]
+    required = [p for p in candidates if not p["has_default"]] or candidates
+    collections = [p for p in required if p["type"][0] in COLLECTIONS]
+    if len(collections) > 1:
+        collections = [p for p in collections if p["name"].lower() not in SMALL_NAMES] or collections[:1]
+    if collections:
+        scaling = collections
+    else:
+        numbers = [p for p in required if p["type"] in (INT, FLOAT)]
+        preferred = [p for p in numbers if p["usage"] & {"range", "arithmetic", "compare_num"}
+                     or p["name"].lower() in INT_NAMES]
+        scaling = (preferred or numbers)[:1]
+    scaling_names = [p["name"] for p in scaling]
+
+    # Pass every parameter up to the last required or scaling one
+    last = max([i for i, p in enumerate(params) if not p["has_default"] or p["name"] in scaling_names],
+               default=-1)
+    passed = params[:last + 1]
+    local = {p["name"]: p["name"] + "_" if p["name"] in ("size", "INPUTS") else p["name"] for p in passed}
+    first_sequence = next((p for p in scaling if p["type"][0] in ("list", "str", "tuple")), None)
+
+    lines, stream = [], 0
+    for p in passed:
+        name, t = p["name"], p["type"]
+        small = t[0] in COLLECTIONS and name not in scaling_names
+        if t[0] in COLLECTIONS:
+            inputs = "INPUTS" if stream == 0 else f"INPUTS.stream({stream})"
+            stream += 1
+            p["expr"] = _collection_expr(t, "size" if not small else "4", inputs, searchy)
+        elif name in scaling_names:
+            p["expr"] = "size" if t == INT else "float(size)"
+        elif p["evidence"] == "receiver":
+            p["expr"] = "None"
+        elif p["has_default"] and p["default"] is not None:
+            p["expr"] = repr(p["default"])
+        elif t == ELEMENT or (t in (INT, STR, FLOAT) and "element" in p["usage"]):
+            if first_sequence is not None:
+                # Random over the values' range, so it is often absent and searches run their course
+                p["expr"] = f"INPUTS.target({local[first_sequence['name']]}, size)"
+            else:
+                p["expr"] = "1"
+        elif t == INT:
+            lowered = name.lower()
+            if not scaling or scaling[0]["type"][0] not in COLLECTIONS:
+                p["expr"] = "2"
+            elif lowered in ("lo", "low", "left", "start", "begin", "i"):
+                p["expr"] = "0"
+            elif lowered in ("hi", "high", "right", "end", "stop", "j"):
+                p["expr"] = "max(size - 1, 0)"
+            else:
+                p["expr"] = "max(size // 2, 1)"  # A valid index and a mid-range k
+        elif t == FLOAT:
+            p["expr"] = "0.5"
+        elif t == BOOL:
+            p["expr"] = "True"
+        else:
+            p["expr"] = "None"
+        lines.append(f"    {local[name]} = {p['expr']}")
+
+    if scaling:
+        description = "n is " + " and ".join(_describe(p["name"], p["type"]) for p in scaling)
+    else:
+        description = "no parameter scales with n"
+    signature = ", ".join(
+        p["name"] if p["evidence"] == "receiver" or p["type"] == ELEMENT else f"{p['name']}: {type_name(p['type'])}"
+        for p in passed
+    )
+    if len(passed) == 1:
+        # A lone tuple argument must not be unpacked into several
+        result = f"({local[passed[0]['name']]},)" if passed[0]["type"][0] == "tuple" else local[passed[0]["name"]]
+    else:
+        result = "(" + ", ".join(local[p["name"]] for p in passed) + ")"
+
+    code_lines = [f"def {generator_name}(size: int):",
+                  f'    """Inputs for {node.name}({signature}); {description}."""']
+    code_lines += lines
+    code_lines.append(f"    return {result}")
+    return {
+        "code": "\n".join(code_lines) + "\n",
+        "name": generator_name,
+        "scaling": scaling_names,
+        "scaling_description": description,
+        "params": [{"name": p["name"], "type": type_name(p["type"]), "evidence": p["evidence"], "expr": p["expr"]}
+                   for p in passed],
+    }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Label Scoring
+Classification-style inference: instead of generating up to 16 tokens, score
+every candidate complexity label as a continuation of the prompt. The prompt
+is prefilled once and its KV cache is shared by all labels, so a batch costs
+one prefill plus one forward pass over the (short) label tokens.
+
+Labels tokenize to different lengths, so each is scored by its mean per-token
+log-probability rather than the sum (which favours the shortest labels). The
+scorer can also be calibrated on a content-free prompt: the labels' scores
+there measure the model's prior for each label, and are subtracted from every
+prompt's scores.
+"""
+
+from typing import Dict, List, Sequence
+
+import torch
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .generation_utils import repeat_cache
+except ImportError:
+    from generation_utils import repeat_cache
+
+
+DEFAULT_LABELS = ["O(1)", "O(log n)", "O(n)", "O(n log n)", "O(n^2)", "O(n^3)", "O(2^n)"]
+
+
+class LabelScorer:
+    """Scores a fixed set of complexity labels by their length-normalized log-likelihood under the model."""
+
+    def __init__(self, model, tokenizer, labels: Sequence[str] = DEFAULT_LABELS, temperature: float = 1.0):
+        """
+        Args:
+            model: Causal LM used for generation
+            tokenizer: Matching tokenizer
+            labels: Candidate answers, scored as they would follow "Complexity:"
+            temperature: Softmax temperature applied to the label scores (> 1 flattens, < 1 sharpens)
+        """
+        self.model = model
+        self.labels = list(labels)
+        self.temperature = temperature if temperature > 0 else 1.0
+        self.bias = None  # Label scores on a content-free prompt, set by calibrate
+
+        encoded = [tokenizer.encode(f" {label}", add_special_tokens=False) for label in self.labels]
+        width = max(len(ids) for ids in encoded)
+        pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self.label_ids = torch.tensor([ids + [pad_id] * (width - len(ids)) for ids in encoded])
+        self.label_mask = torch.tensor([[1] * len(ids) + [0] * (width - len(ids)) for ids in encoded])
+        self.label_lengths = self.label_mask.sum(-1).float()
+
+    @property
+    def calibrated(self) -> bool:
+        return self.bias is not None
+
+    def calibrate(self, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                  past_key_values=None, past_length: int = 0) -> None:
+        """
+        Record the label scores of a single content-free prompt (the prompt
+        template with "N/A" as code) and subtract them from all later scores.
+        """
+        self.bias = self.label_scores(input_ids, attention_mask, past_key_values, past_length)[0].cpu()
+
+    def label_scores(self, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+                     past_key_values=None, past_length: int = 0) -> torch.Tensor:
+        """
+        Mean per-token log-probability of every label for a left-padded batch of prompts.
+
+        Args:
+            input_ids: Prompt token ids (batch, prompt_length)
+            attention_mask: Matching attention mask
+            past_key_values: Optional cache already holding the first past_length tokens of every row
+            past_length: Number of leading tokens covered by past_key_values
+
+        Returns:
+            Scores of shape (batch, labels)
+        """
+        device = input_ids.device
+        batch_size, num_labels = input_ids.shape[0], len(self.labels)
+        label_ids = self.label_ids.to(device)
+        label_mask = self.label_mask.to(device)
+
+        with torch.inference_mode():
+            # Prefill the shared prompt once; positions skip the left padding like generate does
+            position_ids = (attention_mask.long().cumsum(-1) - 1).clamp(min=0)
+            prefill = self.model(
+                input_ids=input_ids[:, past_length:],
+                attention_mask=attention_mask,
+                position_ids=position_ids[:, past_length:],
+                past_key_values=past_key_values,
+                use_cache=True
+            )
+            first_logprobs = torch.log_softmax(prefill.logits[:, -1, :].float(), dim=-1)
+            scores = first_logprobs[:, label_ids[:, 0]]  # (batch, labels)
+
+            if label_ids.shape[1] > 1:
+                # Expand each prompt's cache across the labels and score the remaining label tokens together
+                past_key_values = repeat_cache(prefill.past_key_values, num_labels)
+                ids = label_ids.repeat(batch_size, 1)
+                mask = label_mask.repeat(batch_size, 1)
+                prompt_lengths = attention_mask.long().sum(-1).repeat_interleave(num_labels)
+                continuation = self.model(
+                    input_ids=ids[:, :-1],
+                    attention_mask=torch.cat(
+                        [attention_mask.repeat_interleave(num_labels, dim=0), mask[:, :-1]], dim=1
+                    ),
+                    position_ids=prompt_lengths.unsqueeze(1) + torch.arange(ids.shape[1] - 1, device=device),
+                    past_key_values=past_key_values,
+                    use_cache=True
+                )
+                logprobs = torch.log_softmax(continuation.logits.float(), dim=-1)
+                token_logprobs = logprobs.gather(-1, ids[:, 1:].unsqueeze(-1)).squeeze(-1) * mask[:, 1:]
+                scores = scores + token_logprobs.sum(-1).view(batch_size, num_labels)
+
+        return scores / self.label_lengths.to(device)
+
+    def score(self, input_ids: torch.Tensor, attention_mask: torch.Tensor,
+              past_key_values=None, past_length: int = 0) -> List[Dict]:
+        """
+        Score all labels for a left-padded batch of prompts (arguments as for label_scores).
+
+        Returns:
+            One dictionary per row with the argmax label and per-label probabilities
+        """
+        scores = self.label_scores(input_ids, attention_mask, past_key_values, past_length).cpu()
+        if self.bias is not None:
+            scores = scores - self.bias
+        probabilities = torch.softmax(scores / self.temperature, dim=-1)
+
+        results = []
+        for row in probabilities:
+            best = int(row.argmax())
+            results.append({
+                "complexity": self.labels[best],
+                "confidence": round(float(row[best]), 4),
+                "probabilities": {label: round(float(p), 4) for label, p in zip(self.labels, row)},
+            })
+        return results
@@ -5,17 +5,38 @@ Generates performance test files for Python functions with runtime and memory pr
 """
 
 import ast
+import inspect
 import re
 import json
 from typing import Dict, List, Optional, Tuple
 import textwrap
 
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from . import complexity_fit, input_generators
+    from .input_synthesis import synthesize_inputs
+    from .result_cache import code_hash
+except ImportError:
+    import complexity_fit
+    import input_generators
+    from input_synthesis import synthesize_inputs
+    from result_cache import code_hash
+
 
 class PerformanceTestGenerator:
     """Generates performance tests for Python functions."""
     
-    def __init__(self):
+    def __init__(self, size_budget_s: float = 2.0, total_budget_s: float = 20.0, seed: int = 0):
+        """
+        Args:
+            size_budget_s: Wall-clock budget per input size in generated tests
+            total_budget_s: Wall-clock budget for a whole generated test
+            seed: Seed of the generated tests' inputs
+        """
         self.template = self._load_template()
+        self.size_budget_s = size_budget_s
+        self.total_budget_s = total_budget_s
+        self.seed = seed
     
     def _load_template(self) -> str:
         """Returns the template for performance tests."""
@@ -24,13 +45,22 @@ class PerformanceTestGenerator:
 Auto-generated Performance Test
 Generated for: {function_name}
 Predicted Complexity: {complexity}
+Input Size: {scaling}
 """
 
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import signal
+import threading
 import time
 import tracemalloc
 import sys
-from typing import List, Tuple, Callable
-import matplotlib.pyplot as plt
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 import numpy as np
 
 
@@ -38,11 +68,70 @@ import numpy as np
 {original_code}
 
 
+# ============ INPUT GENERATION ============
+{input_library}
+
+# Seeded, so every run of this test measures the same inputs
+INPUTS = InputGenerator(seed={seed})
+
+
 # ============ TEST DATA GENERATORS ============
 {data_generators}
 
 
+# ============ COMPLEXITY FITTING ============
+{complexity_fitter}
+
+
 # ============ PERFORMANCE TESTING FRAMEWORK ============
+def environment_metadata() -> dict:
+    """Machine and interpreter details saved with the results so runs can be compared."""
+    cpu_model = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu_model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    clock = time.get_clock_info("perf_counter")
+    return {{
+        'cpu_model': cpu_model,
+        'cpu_count': os.cpu_count(),
+        'platform': platform.platform(),
+        'python_version': platform.python_version(),
+        'python_implementation': platform.python_implementation(),
+        'numpy_version': np.__version__,
+        'timer': clock.implementation,
+        'timer_resolution_s': clock.resolution,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }}
+
+
+class SizeBudgetExceeded(Exception):
+    """Raised inside a measurement that ran past its time budget."""
+
+
+@contextmanager
+def time_limit(seconds: float):
+    """Interrupt the block after the given number of seconds (Unix main thread only; otherwise a no-op)."""
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise SizeBudgetExceeded()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, max(seconds, 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
 class PerformanceTester:
     """Framework for measuring runtime and memory usage."""
     
@@ -50,44 +139,140 @@ class PerformanceTester:
         self.func = func
         self.complexity = complexity
         self.results = []
+        self.on_result = None  # Optional callback for each result as soon as it is measured
+        self.fit = None  # fit_complexity output, set by analyze_complexity
+        self.mutates = False  # Whether the function changes its input, checked per input
+        self.copy_budget = 1_000_000  # Input elements copied ahead of a timed batch
     
-    def measure_performance(self, input_data, runs: int = 5) -> Tuple[float, float]:
+    def call(self, input_data) -> None:
+        if isinstance(input_data, tuple):
+            self.func(*input_data)
+        else:
+            self.func(input_data)
+    
+    def detect_mutation(self, input_data) -> bool:
+        """Call the function once on a copy of the input and report whether the copy changed."""
+        probe = fresh_copy(input_data)
+        self.call(probe)
+        try:
+            return not bool(probe == input_data)
+        except ValueError:  # Ambiguous comparison (arrays): assume it does
+            return True
+    
+    def timed_calls(self, input_data, loops: int) -> float:
+        """
+        Seconds spent in loops calls. A function that mutates its input gets a
+        fresh copy for every call, made in batches outside the timed region.
+        """
+        if not self.mutates:
+            start_time = time.perf_counter()
+            for _ in range(loops):
+                self.call(input_data)
+            return time.perf_counter() - start_time
+        
+        elapsed = 0.0
+        batch = max(1, self.copy_budget // input_length(input_data))
+        while loops > 0:
+            copies = [fresh_copy(input_data) for _ in range(min(batch, loops))]
+            start_time = time.perf_counter()
+            for data in copies:
+                self.call(data)
+            elapsed += time.perf_counter() - start_time
+            loops -= len(copies)
+        return elapsed
+    
+    def calibrate_loops(self, input_data, min_sample_s: float) -> int:
+        """
+        Find how many calls one timing sample needs to last at least min_sample_s
+        (like timeit.autorange), so sub-microsecond calls aren't lost in timer
+        resolution. The first call doubles as warmup.
+        """
+        loops = 1
+        while True:
+            elapsed = self.timed_calls(input_data, loops)
+            if elapsed >= min_sample_s:
+                return loops
+            # Jump close to the target instead of doubling from 1 every time
+            loops = max(loops * 2, int(loops * min_sample_s / max(elapsed, 1e-9) * 1.2))
+    
+    @staticmethod
+    def summarize(samples: List[float]) -> dict:
+        """
+        Robust statistics of per-call times: Tukey-fence outlier rejection, then
+        median, IQR, min, mean and a bootstrap 95% confidence interval of the median.
         """
-        Measure average runtime and peak memory for a single input.
+        data = np.asarray(samples, dtype=float)
+        q1, q3 = np.percentile(data, [25, 75])
+        fence = 1.5 * (q3 - q1)
+        inliers = data[(data >= q1 - fence) & (data <= q3 + fence)]
+        if inliers.size == 0:
+            inliers = data
+        
+        q1, median, q3 = np.percentile(inliers, [25, 50, 75])
+        rng = np.random.default_rng(0)
+        medians = np.median(rng.choice(inliers, size=(1000, inliers.size)), axis=1)
+        ci_low, ci_high = np.percentile(medians, [2.5, 97.5])
+        return {{
+            'time_ms': float(median),
+            'min_ms': float(inliers.min()),
+            'mean_ms': float(inliers.mean()),
+            'iqr_ms': float(q3 - q1),
+            'ci_low_ms': float(ci_low),
+            'ci_high_ms': float(ci_high),
+            'outliers': int(data.size - inliers.size),
+        }}
+    
+    def measure_performance(self, input_data, runs: int = 7, warmup: int = 1,
+                            min_sample_s: float = 0.005) -> dict:
+        """
+        Measure runtime and peak memory for a single input.
+        
+        Timing and memory are separate passes, so tracemalloc's overhead never
+        reaches the timed region. Calls are warmed up, batched into samples of at
+        least min_sample_s and timed with the garbage collector disabled. If the
+        function mutates its input, every call gets a fresh copy of it.
         
         Args:
             input_data: Input to pass to the function
-            runs: Number of times to run for averaging
+            runs: Number of timing samples
+            warmup: Untimed calls before timing (on top of the calibration call)
+            min_sample_s: Minimum duration of one timing sample
         
         Returns:
-            Tuple of (average_time_ms, peak_memory_kb)
+            Dictionary with time_ms (median per call), min_ms, mean_ms, iqr_ms,
+            ci_low_ms, ci_high_ms, outliers, samples_ms, loops, runs, mutates
+            and memory_kb
         """
-        times = []
-        memories = []
-        
-        for _ in range(runs):
-            # Measure memory
-            tracemalloc.start()
-            
-            # Measure time
-            start_time = time.perf_counter()
-            if isinstance(input_data, tuple):
-                self.func(*input_data)
-            else:
-                self.func(input_data)
-            end_time = time.perf_counter()
-            
-            # Get memory stats
-            current, peak = tracemalloc.get_traced_memory()
+        # Time pass
+        self.mutates = self.detect_mutation(input_data)
+        loops = self.calibrate_loops(input_data, min_sample_s)
+        for _ in range(warmup):
+            self.timed_calls(input_data, 1)
+        
+        samples = []
+        gc_was_enabled = gc.isenabled()
+        gc.collect()
+        try:
+            gc.disable()
+            for _ in range(runs):
+                samples.append(self.timed_calls(input_data, loops) * 1000 / loops)  # ms per call
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        
+        # Memory pass
+        data = fresh_copy(input_data) if self.mutates else input_data
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self.call(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
             tracemalloc.stop()
-            
-            times.append((end_time - start_time) * 1000)  # Convert to ms
-            memories.append(peak / 1024)  # Convert to KB
         
-        avg_time = sum(times) / len(times)
-        avg_memory = sum(memories) / len(memories)
-        
-        return avg_time, avg_memory
+        stats = self.summarize(samples)
+        stats.update(samples_ms=samples, loops=loops, runs=runs, mutates=self.mutates, memory_kb=peak / 1024)
+        return stats
     
     def run_tests(self, test_sizes: List[int], data_generator: Callable) -> None:
         """
@@ -105,41 +290,193 @@ class PerformanceTester:
         self.results = []
         
         for size in test_sizes:
-            print(f"Testing with input size: {{size}}...", end=" ")
-            test_data = data_generator(size)
-            
-            avg_time, avg_memory = self.measure_performance(test_data)
-            
-            self.results.append({{
-                'size': size,
-                'time_ms': avg_time,
-                'memory_kb': avg_memory
-            }})
-            
-            print(f"Time: {{avg_time:.4f}}ms, Memory: {{avg_memory:.2f}}KB")
+            self.measure_size(size, data_generator)
+        
+        print("\\n" + "=" * 60 + "\\n")
+    
+    def measure_size(self, size: int, data_generator: Callable) -> float:
+        """
+        Generate the input for one size, measure it and record the result.
+        
+        Returns:
+            Wall-clock seconds spent on this size, input generation included
+        """
+        print(f"Testing with input size: {{size}}...", end=" ")
+        start = time.perf_counter()
+        test_data = data_generator(size)
+        
+        result = {{'size': size, **self.measure_performance(test_data)}}
+        self.results.append(result)
+        if self.on_result:
+            self.on_result(result)
+        
+        print(f"Time: {{result['time_ms']:.4f}}ms (IQR {{result['iqr_ms']:.4f}}, min {{result['min_ms']:.4f}}), "
+              f"Memory: {{result['memory_kb']:.2f}}KB")
+        return time.perf_counter() - start
+    
+    @staticmethod
+    def predict_seconds(walls: List[Tuple[int, float]], size: int) -> float:
+        """
+        Extrapolate the wall time of the next size from the last two measured ones.
+        
+        The local log-log slope is taken as the growth exponent (at least linear,
+        since building the input is), so a function that is slower than predicted
+        shows up as a steeper slope before the budget is spent on it.
+        """
+        if not walls:
+            return 0.0
+        last_size, last_wall = walls[-1]
+        exponent = 1.0
+        if len(walls) >= 2:
+            prev_size, prev_wall = walls[-2]
+            if prev_wall > 0 and last_wall > 0 and last_size > prev_size:
+                exponent = max(1.0, math.log(last_wall / prev_wall) / math.log(last_size / prev_size))
+        return last_wall * (size / last_size) ** exponent
+    
+    def run_adaptive(self, data_generator: Callable, start_size: int, max_size: int,
+                     size_budget_s: float = 2.0, total_budget_s: float = 20.0, growth: float = 2.0) -> None:
+        """
+        Run performance tests on sizes chosen to fit a time budget.
         
+        n grows geometrically from start_size. A size that is predicted (or turns
+        out) to take longer than size_budget_s, or to overrun total_budget_s, is
+        skipped and the search bisects back towards the last size that fit.
+        Where the growth rate changes between neighbouring sizes, the geometric
+        midpoint is measured too while budget remains.
+        
+        Args:
+            data_generator: Function that generates test data given a size
+            start_size: First input size
+            max_size: Largest input size to try
+            size_budget_s: Wall-clock budget for one size (input generation and all runs)
+            total_budget_s: Wall-clock budget for the whole test
+            growth: Factor between consecutive sizes
+        """
+        print("\\n" + "=" * 60)
+        print(f"Performance Testing: {{self.func.__name__}}")
+        print(f"Predicted Complexity: {{self.complexity}}")
+        print(f"Input size: {{SCALING}}")
+        print(f"Adaptive sizes: {{start_size}}..{{max_size}}, budget {{size_budget_s:g}}s/size, {{total_budget_s:g}}s total")
+        print("=" * 60 + "\\n")
+        
+        self.results = []
+        started = time.perf_counter()
+        walls = []
+        
+        def try_size(size: int, predicted: float) -> bool:
+            remaining = total_budget_s - (time.perf_counter() - started)
+            if predicted > size_budget_s or predicted > remaining:
+                return False
+            try:
+                # Hard stop in case the prediction was badly off
+                with time_limit(min(remaining, 2 * size_budget_s)):
+                    wall = self.measure_size(size, data_generator)
+            except SizeBudgetExceeded:
+                if tracemalloc.is_tracing():
+                    tracemalloc.stop()
+                print("stopped (time budget exceeded)")
+                return False
+            walls.append((size, wall))
+            return wall <= size_budget_s
+        
+        # Geometric sweep; once a size is too slow, bisect between it and the last size that fit
+        size, fitted, too_slow = max(1, int(start_size)), 0, None
+        while size <= max_size and time.perf_counter() - started < total_budget_s:
+            if try_size(size, self.predict_seconds(walls, size)):
+                fitted = size
+            else:
+                too_slow = size
+            if too_slow is None:
+                size = max(size + 1, int(size * growth))
+            else:
+                if not fitted or too_slow < 1.25 * fitted:
+                    break  # Close enough to the largest size that fits
+                size = int(math.sqrt(fitted * too_slow))
+        
+        # Refine where the log-log slope of the runtime changes
+        points = sorted((r['size'], r['time_ms']) for r in self.results)
+        slopes = [
+            math.log(max(t2, 1e-6) / max(t1, 1e-6)) / math.log(n2 / n1)
+            for (n1, t1), (n2, t2) in zip(points, points[1:])
+        ]
+        walls_by_size = dict(walls)
+        for i in range(1, len(slopes)):
+            (n1, t1), (n2, t2) = points[i], points[i + 1]
+            if abs(slopes[i] - slopes[i - 1]) < 0.5 or min(t1, t2) < 0.05 or n2 - n1 < 2:
+                continue  # Same growth rate, timer noise, or no room for a midpoint
+            midpoint = int(round(math.sqrt(n1 * n2)))
+            predicted = (walls_by_size.get(n1, 0.0) + walls_by_size.get(n2, 0.0)) / 2
+            if not try_size(midpoint, predicted):
+                break
+        self.results.sort(key=lambda r: r['size'])
+        
+        print(f"\\nMeasured {{len(self.results)}} sizes in {{time.perf_counter() - started:.1f}}s")
         print("\\n" + "=" * 60 + "\\n")
     
     def display_results(self) -> None:
         """Display test results in a formatted table."""
         print("\\nDetailed Results:")
-        print(f"{{'Input Size':<15}} {{'Time (ms)':<20}} {{'Memory (KB)':<20}}")
-        print("-" * 60)
+        print(f"{{'Input Size':<12}} {{'Median (ms)':<14}} {{'IQR (ms)':<12}} {{'Min (ms)':<12}} "
+              f"{{'95% CI (ms)':<24}} {{'Outliers':<10}} {{'Memory (KB)':<12}}")
+        print("-" * 100)
         
         for result in self.results:
-            print(f"{{result['size']:<15}} {{result['time_ms']:<20.4f}} {{result['memory_kb']:<20.2f}}")
+            ci = f"{{result['ci_low_ms']:.4f}}-{{result['ci_high_ms']:.4f}}"
+            print(f"{{result['size']:<12}} {{result['time_ms']:<14.4f}} {{result['iqr_ms']:<12.4f}} "
+                  f"{{result['min_ms']:<12.4f}} {{ci:<24}} {{result['outliers']:<10}} {{result['memory_kb']:<12.2f}}")
+    
+    def to_dict(self) -> dict:
+        """Everything a run produced: function, prediction, code hash, input scaling, environment, per-size results and fit."""
+        return {{
+            'function': self.func.__name__,
+            'complexity': self.complexity,
+            'code_hash': CODE_HASH,
+            'scaling': SCALING,
+            'environment': environment_metadata(),
+            'results': self.results,
+            'fit': self.fit,
+        }}
+    
+    def save_results(self, path: str) -> None:
+        """
+        Write the results in a machine-readable file.
+        
+        Args:
+            path: .json for compact JSON (to_dict), .npz for one NumPy array per
+                  result field (samples_ms padded with NaN) plus a JSON 'meta' entry
+        """
+        data = self.to_dict()
+        if path.endswith(".npz"):
+            fields = [k for k in (self.results[0] if self.results else {{}}) if k != 'samples_ms']
+            arrays = {{k: np.array([r[k] for r in self.results]) for k in fields}}
+            runs = max((len(r['samples_ms']) for r in self.results), default=0)
+            samples = np.full((len(self.results), runs), np.nan)
+            for i, r in enumerate(self.results):
+                samples[i, :len(r['samples_ms'])] = r['samples_ms']
+            meta = {{k: v for k, v in data.items() if k != 'results'}}
+            np.savez_compressed(path, samples_ms=samples, meta=np.array(json.dumps(meta)), **arrays)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+        print(f"Results saved to: {{path}}")
     
-    def plot_results(self, save_path: str = None) -> None:
+    def plot_results(self, save_path: str = None, show: bool = False) -> None:
         """
         Generate performance visualization plots.
         
         Args:
             save_path: Optional path to save the plot image
+            show: Open the plot in a window (otherwise rendering is headless)
         """
         if not self.results:
             print("No results to plot!")
             return
         
+        import matplotlib
+        if not show:
+            matplotlib.use("Agg")  # No display needed and nothing blocks
+        import matplotlib.pyplot as plt
+        
         sizes = [r['size'] for r in self.results]
         times = [r['time_ms'] for r in self.results]
         memories = [r['memory_kb'] for r in self.results]
@@ -163,66 +500,63 @@ class PerformanceTester:
         plt.tight_layout()
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            plt.savefig(save_path, dpi=120, bbox_inches='tight')
             print(f"\\nPlot saved to: {{save_path}}")
         
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
     
     def analyze_complexity(self) -> str:
         """
-        Analyze actual complexity based on measured results.
+        Fit every candidate complexity to the measured runtimes (see fit_complexity).
+        The full fit, with all candidates ranked, is kept in self.fit.
         
         Returns:
             String describing the empirical complexity
         """
+        self.fit = None
         if len(self.results) < 3:
             return "Insufficient data for complexity analysis"
         
-        sizes = np.array([r['size'] for r in self.results])
-        times = np.array([r['time_ms'] for r in self.results])
-        
-        # Normalize
-        sizes_norm = sizes / sizes[0]
-        times_norm = times / times[0]
-        
-        # Calculate growth ratios
-        ratios = []
-        for i in range(1, len(sizes_norm)):
-            size_ratio = sizes_norm[i] / sizes_norm[i-1]
-            time_ratio = times_norm[i] / times_norm[i-1]
-            if size_ratio > 1:
-                ratios.append(time_ratio / size_ratio)
-        
-        if not ratios:
-            return "Unable to determine complexity"
-        
-        avg_ratio = np.mean(ratios)
-        
-        # Classify complexity
-        if avg_ratio < 1.2:
-            empirical = "O(1) or O(log n)"
-        elif 1.2 <= avg_ratio < 1.8:
-            empirical = "O(n)"
-        elif 1.8 <= avg_ratio < 3.0:
-            empirical = "O(n log n)"
-        elif 3.0 <= avg_ratio < 5.0:
-            empirical = "O(n²)"
-        else:
-            empirical = "O(n³) or higher"
+        try:
+            self.fit = fit_complexity([r['size'] for r in self.results], [r['time_ms'] for r in self.results])
+        except ValueError as e:
+            return f"Unable to determine complexity: {{e}}"
         
-        return f"Empirical: {{empirical}} (predicted: {{self.complexity}})"
+        fit = self.fit
+        return (f"Empirical: {{fit['best']}} (R²={{fit['r2']:.3f}}, confidence {{fit['confidence']:.0%}}, "
+                f"constant {{fit['constant']:.3g}}ms; predicted: {{self.complexity}})")
+
+
+# ============ TEST CONFIGURATION ============
+# Sizes grow from START_SIZE until a time budget would be exceeded
+START_SIZE, MAX_SIZE = {start_size}, {max_size}
+SIZE_BUDGET_S, TOTAL_BUDGET_S = {size_budget_s}, {total_budget_s}
+# Normalized hash of the function's source; regression baselines are keyed by it
+CODE_HASH = "{code_hash}"
+# What the input size n measures
+SCALING = "{scaling}"
 
 
 # ============ RUN TESTS ============
-if __name__ == "__main__":
-    # Configure test parameters
-    test_sizes = {test_sizes}
+def run_performance_test(plot: bool = False, results_path: Optional[str] = None,
+                         show: bool = False) -> PerformanceTester:
+    """
+    Run the whole test and return the tester with its results.
     
+    Test runners import this file and call this function instead of executing it.
+    
+    Args:
+        plot: Also save the performance plots (headless unless show is set)
+        results_path: Write the results to this .json or .npz file
+        show: Open the plots in a window
+    """
     # Create tester
     tester = PerformanceTester({function_name}, "{complexity}")
     
     # Run tests
-    tester.run_tests(test_sizes, {data_generator_name})
+    tester.run_adaptive({data_generator_name}, START_SIZE, MAX_SIZE, SIZE_BUDGET_S, TOTAL_BUDGET_S)
     
     # Display results
     tester.display_results()
@@ -230,14 +564,48 @@ if __name__ == "__main__":
     # Analyze complexity
     print(f"\\nComplexity Analysis: {{tester.analyze_complexity()}}")
     
+    # Save machine-readable results
+    if results_path:
+        tester.save_results(results_path)
+    
     # Generate plots
-    try:
-        tester.plot_results(save_path="{function_name}_performance.png")
-    except Exception as e:
-        print(f"\\nNote: Could not generate plots: {{e}}")
-        print("Install matplotlib with: pip install matplotlib")
+    if plot or show:
+        try:
+            tester.plot_results(save_path="{function_name}_performance.png", show=show)
+        except ImportError as e:
+            print(f"\\nNote: Could not generate plots: {{e}}")
+            print("Install matplotlib with: pip install matplotlib")
+    
+    return tester
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance test for {function_name}")
+    parser.add_argument("--output", "-o", default="{function_name}_performance.json",
+                        help="Results file: .json (compact) or .npz (NumPy arrays)")
+    parser.add_argument("--plot", action="store_true", help="Also save {function_name}_performance.png")
+    parser.add_argument("--show", action="store_true", help="Open the plots in a window")
+    args = parser.parse_args()
+    
+    run_performance_test(plot=args.plot, results_path=args.output, show=args.show)
 '''
     
+    def _function_info(self, node: ast.AST, code: str) -> Dict:
+        """Build the function info dictionary for a single def node."""
+        params = [arg.arg for arg in node.args.args]
+        # Pad and dedent so methods and nested functions come out as standalone code
+        func_code = ast.get_source_segment(code, node, padded=True)
+        if func_code:
+            func_code = textwrap.dedent(func_code)
+
+        return {
+            'name': node.name,
+            'params': params,
+            'code': func_code or code,
+            'has_list_param': any('arr' in p or 'list' in p or 'array' in p for p in params),
+            'has_n_param': 'n' in params
+        }
+
     def extract_function_info(self, code: str) -> Optional[Dict]:
         """
         Extract function information from code.
@@ -253,91 +621,71 @@ if __name__ == "__main__":
             
             for node in ast.walk(tree):
                 if isinstance(node, ast.FunctionDef):
-                    # Get function name
-                    func_name = node.name
-                    
-                    # Get parameters
-                    params = [arg.arg for arg in node.args.args]
-                    
-                    # Get function body
-                    func_code = ast.get_source_segment(code, node)
-                    
-                    return {
-                        'name': func_name,
-                        'params': params,
-                        'code': func_code or code,
-                        'has_list_param': any('arr' in p or 'list' in p or 'array' in p for p in params),
-                        'has_n_param': 'n' in params
-                    }
+                    return self._function_info(node, code)
         except Exception as e:
             print(f"Error parsing code: {e}")
             return None
+
+    def extract_all_functions(self, code: str) -> List[Dict]:
+        """
+        Extract every function and method defined in code.
+        
+        Args:
+            code: Python source code (e.g. a whole module)
+        
+        Returns:
+            List of function info dictionaries in source order, each with an
+            added 'qualname' (Class.method, outer.inner) and 'lineno'
+        """
+        try:
+            tree = ast.parse(code)
+        except Exception as e:
+            print(f"Error parsing code: {e}")
+            return []
+
+        functions = []
+
+        def visit(node: ast.AST, prefix: str) -> None:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    info = self._function_info(child, code)
+                    info['qualname'] = prefix + child.name
+                    info['lineno'] = child.lineno
+                    functions.append(info)
+                    visit(child, f"{prefix}{child.name}.")
+                elif isinstance(child, ast.ClassDef):
+                    visit(child, f"{prefix}{child.name}.")
+                else:
+                    visit(child, prefix)
+
+        visit(tree, "")
+        return functions
     
-    def infer_data_generator(self, func_info: Dict, complexity: str) -> Tuple[str, str]:
+    def infer_data_generator(self, func_info: Dict, complexity: str) -> Tuple[str, str, str]:
         """
         Infer appropriate data generator based on function signature.
         
+        Parameter types come from annotations, defaults and how the body uses
+        each parameter (see input_synthesis); collections grow with the input
+        size, so the generator also says which parameter n is.
+        
         Args:
             func_info: Function information dictionary
             complexity: Predicted complexity
         
         Returns:
-            Tuple of (generator_code, generator_name)
-        """
-        params = func_info['params']
-        func_name = func_info['name']
-        
-        # Detect function type based on parameters and name
-        # Check for 2-parameter functions first (more specific)
-        if len(params) == 2 and func_info['has_list_param']:
-            # Array with target (e.g., search functions)
-            generator_code = '''def generate_list_with_target(size: int):
-    """Generate a sorted list with a target value (for search functions)."""
-    import random
-    arr = sorted([random.randint(1, 1000) for _ in range(size)])
-    target = arr[size // 2] if arr else 0
-    return (arr, target)
-'''
-            generator_name = "generate_list_with_target"
-        
-        elif func_info['has_list_param'] or 'sort' in func_name:
-            # Array/list based function (single parameter)
-            generator_code = '''def generate_list_input(size: int):
-    """Generate a random list of integers."""
-    import random
-    return [random.randint(1, 1000) for _ in range(size)]
-'''
-            generator_name = "generate_list_input"
-            
-        elif func_info['has_n_param'] or 'fib' in func_name or 'factorial' in func_name:
-            # Integer input function
-            generator_code = '''def generate_integer_input(size: int):
-    """Generate integer input."""
-    return size
-'''
-            generator_name = "generate_integer_input"
-            
-        elif 'matrix' in func_name.lower():
-            # Matrix operations
-            generator_code = '''def generate_matrix_input(size: int):
-    """Generate random square matrices."""
-    import random
-    matrix_a = [[random.randint(1, 10) for _ in range(size)] for _ in range(size)]
-    matrix_b = [[random.randint(1, 10) for _ in range(size)] for _ in range(size)]
-    return (matrix_a, matrix_b)
-'''
-            generator_name = "generate_matrix_input"
-            
-        else:
-            # Default: list input
-            generator_code = '''def generate_input(size: int):
+            Tuple of (generator_code, generator_name, scaling description)
+        """
+        synthesized = synthesize_inputs(func_info['code'])
+        if synthesized:
+            return synthesized['code'], synthesized['name'], synthesized['scaling_description']
+        
+        # Unparseable signature: a random list
+        generator_code = '''def generate_input(size: int):
     """Generate input data for testing."""
-    import random
-    return [random.randint(1, 1000) for _ in range(size)]
+    return INPUTS.ints(size)
 '''
-            generator_name = "generate_input"
-        
-        return generator_code, generator_name
+        return generator_code, "generate_input", "n is the length of the input list"
     
     def infer_test_sizes(self, complexity: str) -> List[int]:
         """
@@ -362,39 +710,100 @@ if __name__ == "__main__":
         else:  # O(n) or O(1)
             return [100, 1000, 5000, 10000, 50000, 100000]
     
-    def generate_test_file(self, code: str, complexity: str) -> Optional[str]:
+    @staticmethod
+    def complexity_fitter_source() -> str:
+        """Source of complexity_fit below its imports, embedded so generated tests stay standalone."""
+        source = inspect.getsource(complexity_fit)
+        return source.split("\nimport numpy as np\n", 1)[1].strip() + "\n"
+
+    @staticmethod
+    def input_library_source() -> str:
+        """Source of input_generators below its imports, embedded like the complexity fitter."""
+        source = inspect.getsource(input_generators)
+        return source.split("\nimport numpy as np\n", 1)[1].strip() + "\n"
+
+    def infer_size_range(self, complexity: str) -> Tuple[int, int]:
         """
-        Generate complete performance test file.
-        
+        Infer the range the adaptive size search covers.
+
+        The search starts small whatever the prediction, so a mislabeled function
+        is caught by the time budget before it reaches a size that takes hours;
+        the predicted complexity only sets how far it may grow.
+
+        Args:
+            complexity: Predicted time complexity
+
+        Returns:
+            Tuple of (start_size, max_size)
+        """
+        return 8, 10 * self.infer_test_sizes(complexity)[-1]
+
+    def build_harness(self, code: str, complexity: str) -> Optional[Dict]:
+        """
+        Generate the performance test file along with the names needed to drive it.
+
         Args:
             code: Original function code
             complexity: Predicted complexity from model
-        
+
         Returns:
-            Complete test file as string, or None if generation fails
+            Dictionary with test_file, function_name, data_generator, start_size,
+            max_size, size_budget_s, total_budget_s and scaling (what the input
+            size n measures), or None if generation fails
         """
         # Extract function info
         func_info = self.extract_function_info(code)
         if not func_info:
             return None
-        
+
         # Generate data generator
-        data_gen_code, data_gen_name = self.infer_data_generator(func_info, complexity)
-        
-        # Determine test sizes
-        test_sizes = self.infer_test_sizes(complexity)
-        
+        data_gen_code, data_gen_name, scaling = self.infer_data_generator(func_info, complexity)
+
+        # Determine the size range (sizes themselves are picked at run time)
+        start_size, max_size = self.infer_size_range(complexity)
+
         # Fill template
         test_file = self.template.format(
             function_name=func_info['name'],
             complexity=complexity,
             original_code=textwrap.indent(func_info['code'], ''),
             data_generators=data_gen_code,
-            test_sizes=test_sizes,
+            complexity_fitter=self.complexity_fitter_source(),
+            input_library=self.input_library_source(),
+            seed=self.seed,
+            start_size=start_size,
+            max_size=max_size,
+            size_budget_s=self.size_budget_s,
+            total_budget_s=self.total_budget_s,
+            code_hash=code_hash(func_info['code']),
+            scaling=scaling,
             data_generator_name=data_gen_name
         )
-        
-        return test_file
+
+        return {
+            'test_file': test_file,
+            'function_name': func_info['name'],
+            'data_generator': data_gen_name,
+            'start_size': start_size,
+            'max_size': max_size,
+            'size_budget_s': self.size_budget_s,
+            'total_budget_s': self.total_budget_s,
+            'scaling': scaling
+        }
+
+    def generate_test_file(self, code: str, complexity: str) -> Optional[str]:
+        """
+        Generate complete performance test file.
+
+        Args:
+            code: Original function code
+            complexity: Predicted complexity from model
+
+        Returns:
+            Complete test file as string, or None if generation fails
+        """
+        harness = self.build_harness(code, complexity)
+        return harness['test_file'] if harness else None
 
 
 # CLI interface
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Prefix Cache
+Every analysis prompt starts with the same instruction. Its attention states
+are computed once at startup; each batch then copies them across its rows and
+only prefills the request-specific suffix.
+"""
+
+import copy
+from typing import Dict, List, Optional
+
+import torch
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .generation_utils import repeat_cache
+except ImportError:
+    from generation_utils import repeat_cache
+
+
+# Suffix shapes used to find the part of the prefix that tokenizes the same whatever follows it
+_PROBES = ["def f(x):\n    return x", "class A:\n    pass", "@cache\ndef f(): pass", "import os", "x = 1"]
+
+
+class PromptPrefixCache:
+    """Precomputed past_key_values for the instruction shared by all prompts."""
+
+    def __init__(self, model, tokenizer, prefix: str, device: torch.device):
+        """
+        Args:
+            model: Causal LM used for generation
+            tokenizer: Matching tokenizer
+            prefix: Instruction text every prompt starts with
+            device: Device the model runs on
+        """
+        self.tokenizer = tokenizer
+
+        # BPE merges across the boundary (e.g. "\n\n" + "def"), so only cache the tokens that never change
+        probes = [tokenizer(prefix + probe)["input_ids"] for probe in _PROBES]
+        prefix_ids = probes[0]
+        for ids in probes[1:]:
+            common = 0
+            while common < min(len(prefix_ids), len(ids)) and prefix_ids[common] == ids[common]:
+                common += 1
+            prefix_ids = prefix_ids[:common]
+        self.prefix_ids = prefix_ids
+        self.length = len(prefix_ids)
+
+        with torch.inference_mode():
+            output = model(input_ids=torch.tensor([prefix_ids], device=device), use_cache=True)
+        self.past_key_values = output.past_key_values
+
+    def prepare(self, prompts: List[str], max_length: int, device: torch.device) -> Optional[Dict]:
+        """
+        Tokenize prompts as [cached prefix][left padding][suffix].
+
+        Args:
+            prompts: Full prompts (prefix included)
+            max_length: Truncation length for the whole prompt, as without the cache
+            device: Device for the returned tensors
+
+        Returns:
+            Dictionary with input_ids and attention_mask, or None if a prompt does
+            not tokenize to the cached prefix (the caller then skips the cache)
+        """
+        suffixes = []
+        for ids in self.tokenizer(prompts)["input_ids"]:
+            if ids[:self.length] != self.prefix_ids or len(ids) <= self.length:
+                return None
+            suffixes.append(ids[self.length:max_length])
+
+        width = max(len(suffix) for suffix in suffixes)
+        pad_id = self.tokenizer.pad_token_id
+        input_ids = [self.prefix_ids + [pad_id] * (width - len(s)) + s for s in suffixes]
+        attention_mask = [[1] * self.length + [0] * (width - len(s)) + [1] * len(s) for s in suffixes]
+        return {
+            "input_ids": torch.tensor(input_ids, device=device),
+            "attention_mask": torch.tensor(attention_mask, device=device),
+        }
+
+    def expand(self, batch_size: int):
+        """Fresh copy of the prefix cache with one row per prompt (generate appends to it in place)."""
+        return repeat_cache(copy.deepcopy(self.past_key_values), batch_size)
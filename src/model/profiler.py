@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Profiler
+Runs generated performance harnesses server-side. Each harness executes in its
+own subprocess with CPU-time, address-space and file-size rlimits, a wall-clock
+timeout and a scrubbed environment; a thread pool keeps several of them running
+at once, each pinned to a CPU of its own (sched_setaffinity) when there are
+enough CPUs. Measurements come back one JSON line per input size, so
+a harness that hits a limit still returns the sizes it finished.
+"""
+
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .cancellation import CancellationToken, RequestCancelled
+    from .sandbox import LIMITS_SOURCE, available_cpus, sandbox_env
+except ImportError:
+    from cancellation import CancellationToken, RequestCancelled
+    from sandbox import LIMITS_SOURCE, available_cpus, sandbox_env
+
+# Executed in the sandbox: apply the limits, import the harness without running
+# its __main__ block, then run its adaptive size search and print each result
+_DRIVER = LIMITS_SOURCE + r'''
+import contextlib, json, runpy, sys
+
+spec = json.load(open(sys.argv[2]))
+apply_limits(spec["cpu"], spec["memory_mb"], spec["cpu_s"], spec["file_mb"])
+
+def emit(record):
+    sys.__stdout__.write(json.dumps(record) + "\n")
+    sys.__stdout__.flush()
+
+try:
+    with contextlib.redirect_stdout(sys.stderr):  # The harness's own tables
+        harness = runpy.run_path(sys.argv[1], run_name="cpa_profile")
+        tester = harness["PerformanceTester"](harness[spec["function_name"]], spec["complexity"])
+        tester.on_result = lambda result: emit({"result": result})
+        tester.run_adaptive(
+            harness[spec["data_generator"]], spec["start_size"], spec["max_size"],
+            spec["size_budget_s"], spec["total_budget_s"]
+        )
+        analysis = tester.analyze_complexity()
+    emit({"analysis": analysis, "fit": tester.fit})
+except BaseException as e:
+    emit({"error": type(e).__name__, "detail": str(e)})
+    sys.exit(1)
+'''
+
+# Environment variables passed through to the sandbox (server secrets stay behind)
+_ENV_PASSTHROUGH = ("PATH", "HOME", "LANG", "LC_ALL", "MPLCONFIGDIR")
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on."""
+    return len(available_cpus()) or os.cpu_count() or 1
+
+
+def run_sandboxed(harness: Dict, complexity: str, cpu_s: int = 60, memory_mb: int = 1024,
+                  timeout_s: float = 60.0, file_mb: int = 16, cpu: Optional[int] = None,
+                  cancel_token: Optional[CancellationToken] = None) -> Dict:
+    """
+    Run one generated harness in a limited subprocess and collect its measurements.
+
+    Args:
+        harness: Output of PerformanceTestGenerator.build_harness
+        complexity: Predicted complexity passed to the tester
+        cpu_s: CPU-time limit (RLIMIT_CPU)
+        memory_mb: Address-space limit (RLIMIT_AS)
+        timeout_s: Wall-clock limit; the process group is killed when it passes
+        file_mb: Largest file the harness may write (RLIMIT_FSIZE)
+        cpu: CPU to pin the harness to, or None to let it float
+        cancel_token: Kills the harness's process group once cancelled
+
+    Returns:
+        Dictionary with status (ok, timeout, cpu_limit, memory_limit, cancelled or error),
+        results (size/time/memory per input size), analysis, fit (complexity_fit
+        output or None), detail and elapsed_ms
+    """
+    env = sandbox_env({k: os.environ[k] for k in _ENV_PASSTHROUGH if k in os.environ})
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="cpa-profile-") as workdir:
+        harness_path = os.path.join(workdir, "harness.py")
+        driver_path = os.path.join(workdir, "driver.py")
+        spec_path = os.path.join(workdir, "spec.json")
+        with open(harness_path, "w", encoding="utf-8") as f:
+            f.write(harness["test_file"])
+        with open(driver_path, "w", encoding="utf-8") as f:
+            f.write(_DRIVER)
+        with open(spec_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "function_name": harness["function_name"],
+                "data_generator": harness["data_generator"],
+                "start_size": harness["start_size"],
+                "max_size": harness["max_size"],
+                "size_budget_s": harness["size_budget_s"],
+                # Leave headroom for imports and the analysis so the search ends before the kill
+                "total_budget_s": min(harness["total_budget_s"], 0.8 * timeout_s),
+                "complexity": complexity,
+                "cpu_s": int(cpu_s),
+                "memory_mb": int(memory_mb),
+                "file_mb": int(file_mb),
+                "cpu": cpu,
+            }, f)
+
+        # -I: ignore PYTHON* variables and user site-packages; -B: no .pyc files
+        proc = subprocess.Popen(
+            [sys.executable, "-I", "-B", driver_path, harness_path, spec_path],
+            cwd=workdir, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, text=True, start_new_session=True
+        )
+        deadline = time.monotonic() + timeout_s
+        timed_out = cancelled = False
+        while True:
+            # Wake up a few times a second to notice cancellation
+            remaining = deadline - time.monotonic()
+            try:
+                stdout, stderr = proc.communicate(timeout=max(0.0, min(remaining, 0.25)))
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_token is not None and cancel_token.is_cancelled():
+                    cancelled = True
+                elif time.monotonic() >= deadline:
+                    timed_out = True
+                else:
+                    continue
+                os.killpg(proc.pid, signal.SIGKILL)
+                stdout, stderr = proc.communicate()
+                break
+
+    results: List[Dict] = []
+    analysis: Optional[str] = None
+    fit: Optional[Dict] = None
+    error: Optional[Dict] = None
+    for line in stdout.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "result" in record:
+            results.append(record["result"])
+        elif "analysis" in record:
+            analysis, fit = record["analysis"], record["fit"]
+        elif "error" in record:
+            error = record
+
+    detail = None
+    if cancelled:
+        status, detail = "cancelled", f"Request {cancel_token.reason}"
+    elif timed_out:
+        status, detail = "timeout", f"Exceeded the {timeout_s:g}s time limit"
+    elif proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        status, detail = "cpu_limit", f"Exceeded the {cpu_s}s CPU limit"
+    elif error is not None and error["error"] == "MemoryError":
+        status, detail = "memory_limit", f"Exceeded the {memory_mb}MB memory limit"
+    elif error is not None or proc.returncode != 0:
+        status = "error"
+        if error is not None:
+            detail = f"{error['error']}: {error['detail']}"
+        else:
+            detail = (stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+    else:
+        status = "ok"
+
+    return {
+        "status": status,
+        "results": results,
+        "analysis": analysis,
+        "fit": fit,
+        "detail": detail,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+class ProfilerPool:
+    """Runs sandboxed harnesses concurrently, at most max_workers at a time."""
+
+    def __init__(self, max_workers: int = 0, cpu_s: int = 60, memory_mb: int = 1024, timeout_s: float = 60.0):
+        """
+        Args:
+            max_workers: Concurrent subprocesses (0 = one per CPU)
+            cpu_s: CPU-time limit per harness
+            memory_mb: Memory limit per harness
+            timeout_s: Wall-clock limit per harness (requests may ask for less)
+        """
+        self.max_workers = max_workers or cpu_count()
+        self.cpu_s = cpu_s
+        self.memory_mb = memory_mb
+        self.timeout_s = timeout_s
+
+        # One CPU per running harness so concurrent measurements don't interfere
+        cpus = available_cpus()
+        if cpus and self.max_workers > len(cpus):
+            print(f"[WARNING] {self.max_workers} profiler workers but only {len(cpus)} CPUs: not pinning")
+            cpus = []
+        self.pinned = bool(cpus)
+        self._free_cpus = queue.Queue()
+        for cpu in cpus:
+            self._free_cpus.put(cpu)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpa-profiler")
+
+    def submit(self, harness: Dict, complexity: str, timeout_s: float = 0.0,
+               cancel_token: Optional[CancellationToken] = None) -> Future:
+        """
+        Queue a harness; returns a future of the run_sandboxed result.
+
+        Args:
+            harness: Output of PerformanceTestGenerator.build_harness
+            complexity: Predicted complexity passed to the tester
+            timeout_s: Wall-clock limit for this run (0 or above the pool's limit = the pool's limit)
+            cancel_token: Drops the run while queued (the future raises RequestCancelled)
+                or kills its sandbox while running (status "cancelled")
+        """
+        if not timeout_s or timeout_s > self.timeout_s:
+            timeout_s = self.timeout_s
+        future = self._executor.submit(self._run, harness, complexity, timeout_s, cancel_token)
+        if cancel_token is not None:
+            cancel_token.add_callback(lambda reason: future.cancel())  # Only succeeds while queued
+        return future
+
+    def _run(self, harness: Dict, complexity: str, timeout_s: float,
+             cancel_token: Optional[CancellationToken]) -> Dict:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        cpu = self._free_cpus.get() if self.pinned else None
+        try:
+            return run_sandboxed(harness, complexity, self.cpu_s, self.memory_mb, timeout_s, cpu=cpu,
+                                 cancel_token=cancel_token)
+        finally:
+            if cpu is not None:
+                self._free_cpus.put(cpu)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Performance Regression
+Baselines of generated-test results, keyed by function and code hash, and the
+statistics used to compare new runs against them: a one-sided Mann-Whitney U
+test per input size on the repeated timing samples (Holm-corrected across
+sizes), a bootstrap confidence interval of the slowdown, the spread between
+repeated runs of the suite, and shifts in the fitted complexity class.
+
+Timings drift between runs (CPU frequency, cache and scheduler state), which
+the samples of a single run cannot show, so baselines keep several runs and a
+comparison should use several too (test_runner --repeat).
+"""
+
+import json
+import math
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .complexity_fit import COMPLEXITY_MODELS
+except ImportError:
+    from complexity_fit import COMPLEXITY_MODELS
+
+BASELINE_VERSION = 2
+
+# Runs kept per function and code hash (oldest dropped first)
+MAX_BASELINE_RUNS = 10
+
+# Sizes faster than this (median ms per call) are dominated by call overhead and timer noise
+MIN_TIME_MS = 0.01
+
+# Smallest fit confidence for a complexity class to count as a class shift
+CLASS_CONFIDENCE = 0.9
+
+# Candidate classes from fastest to slowest growth
+COMPLEXITY_ORDER = list(COMPLEXITY_MODELS)
+
+
+def function_id(result: Dict) -> str:
+    """Stable name of a tested function: test file plus function name."""
+    return f"{os.path.basename(result['test'])}::{result['function']}"
+
+
+def _exact_u_distribution(m: int, n: int) -> np.ndarray:
+    """Number of orderings of m + n untied samples giving each value of U (0..m*n)."""
+    # counts[j][u]: orderings of i first-sample and j second-sample values with U = u
+    counts = [np.zeros(m * n + 1) for _ in range(n + 1)]
+    for j in range(n + 1):
+        counts[j][0] = 1.0
+    for _ in range(1, m + 1):
+        updated = [np.zeros(m * n + 1) for _ in range(n + 1)]
+        updated[0][0] = 1.0
+        for j in range(1, n + 1):
+            # The largest value comes from the first sample (beats all j others) or the second
+            updated[j][j:] += counts[j][:m * n + 1 - j]
+            updated[j] += updated[j - 1]
+        counts = updated
+    return counts[n]
+
+
+def mann_whitney_greater(current: Sequence[float], baseline: Sequence[float]) -> float:
+    """
+    One-sided Mann-Whitney U test that current tends to be larger (slower) than baseline.
+
+    Exact for small samples without ties, normal approximation with tie
+    correction otherwise.
+
+    Returns:
+        p-value
+    """
+    x = np.asarray(current, dtype=float)
+    y = np.asarray(baseline, dtype=float)
+    m, n = x.size, y.size
+    if m == 0 or n == 0:
+        return 1.0
+    u = float(np.sum(x[:, None] > y[None, :]) + 0.5 * np.sum(x[:, None] == y[None, :]))
+
+    pooled = np.concatenate([x, y])
+    _, ties = np.unique(pooled, return_counts=True)
+    if m * n <= 1000 and np.all(ties == 1):
+        distribution = _exact_u_distribution(m, n)
+        return float(distribution[int(math.ceil(u)):].sum() / distribution.sum())
+
+    total = m + n
+    tie_term = np.sum(ties ** 3 - ties) / (total * (total - 1))
+    sigma = math.sqrt(m * n / 12.0 * ((total + 1) - tie_term))
+    if sigma == 0:
+        return 1.0
+    z = (u - m * n / 2.0 - 0.5) / sigma
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def bootstrap_ratio(current: Sequence[float], baseline: Sequence[float], resamples: int = 2000,
+                    seed: int = 0) -> Tuple[float, float, float]:
+    """
+    Ratio of median runtimes (current / baseline) with a bootstrap 95% confidence interval.
+
+    Returns:
+        Tuple of (ratio, ci_low, ci_high)
+    """
+    x = np.asarray(current, dtype=float)
+    y = np.asarray(baseline, dtype=float)
+    rng = np.random.default_rng(seed)
+    x_medians = np.median(rng.choice(x, size=(resamples, x.size)), axis=1)
+    y_medians = np.median(rng.choice(y, size=(resamples, y.size)), axis=1)
+    ratios = x_medians / np.maximum(y_medians, 1e-12)
+    low, high = np.percentile(ratios, [2.5, 97.5])
+    return float(np.median(x) / max(np.median(y), 1e-12)), float(low), float(high)
+
+
+def holm(p_values: Sequence[float]) -> List[float]:
+    """Holm-Bonferroni adjusted p-values, in input order."""
+    order = sorted(range(len(p_values)), key=lambda i: p_values[i])
+    adjusted = [1.0] * len(p_values)
+    running = 0.0
+    for rank, i in enumerate(order):
+        running = max(running, min(1.0, (len(p_values) - rank) * p_values[i]))
+        adjusted[i] = running
+    return adjusted
+
+
+class BaselineStore:
+    """JSON file of per-function baselines; one entry (with its repeated runs) per code hash, the latest one marked."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Baseline file (e.g. <test dir>/.cpa_baselines.json)
+        """
+        self.path = path
+        self.data = self._load()
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == BASELINE_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {'version': BASELINE_VERSION, 'functions': {}}
+
+    def save(self) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def update(self, runs: List[Dict]) -> None:
+        """
+        Add a passed test's repeated runs to the baseline of its function and code
+        hash (runs of the same code accumulate across saves, up to MAX_BASELINE_RUNS).
+        """
+        result = runs[0]
+        entry = self.data['functions'].setdefault(function_id(result), {'latest': None, 'versions': {}})
+        code_hash = result.get('code_hash') or "unknown"
+        version = entry['versions'].get(code_hash)
+        if version is None or environment_changed(result, version):
+            version = {'runs': []}  # Runs measured elsewhere aren't comparable
+        version.update(complexity=result.get('complexity'), environment=result.get('environment'),
+                       saved=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        for run in runs:
+            fit = run.get('fit') or {}
+            version['runs'].append({
+                'results': [
+                    {k: r[k] for k in ('size', 'time_ms', 'memory_kb', 'samples_ms') if k in r}
+                    for r in run['results']
+                ],
+                'fit': {k: fit[k] for k in ('best', 'constant', 'r2', 'confidence') if k in fit} or None,
+            })
+        version['runs'] = version['runs'][-MAX_BASELINE_RUNS:]
+        entry['versions'][code_hash] = version
+        entry['latest'] = code_hash
+
+    def lookup(self, result: Dict) -> Tuple[Optional[Dict], bool]:
+        """
+        Baseline to compare a result against.
+
+        Returns:
+            Tuple of (baseline version with its runs, or None, whether the code
+            changed since it was recorded); a baseline of the same code is
+            preferred over the latest one
+        """
+        entry = self.data['functions'].get(function_id(result))
+        if not entry:
+            return None, False
+        code_hash = result.get('code_hash') or "unknown"
+        if code_hash in entry['versions']:
+            return entry['versions'][code_hash], False
+        return entry['versions'].get(entry['latest']), True
+
+
+def environment_changed(result: Dict, baseline: Dict) -> bool:
+    """Whether the machine or interpreter differs from the one the baseline was measured on."""
+    before, now = baseline.get('environment') or {}, result.get('environment') or {}
+    return any(before.get(k) != now.get(k) for k in ('cpu_model', 'cpu_count', 'python_version', 'numpy_version'))
+
+
+def _stable_class(runs: List[Dict]) -> Optional[str]:
+    """Complexity class every run fitted with at least CLASS_CONFIDENCE, or None if they don't agree."""
+    classes = {(run.get('fit') or {}).get('best') for run in runs}
+    confident = all((run.get('fit') or {}).get('confidence', 0.0) >= CLASS_CONFIDENCE for run in runs)
+    if len(classes) == 1 and confident:
+        return classes.pop()
+    return None
+
+
+def compare_run(runs: List[Dict], baseline: Dict, alpha: float = 0.01, threshold: float = 0.2) -> Dict:
+    """
+    Compare repeated runs of one test with its baseline runs.
+
+    A size counts when it takes at least MIN_TIME_MS and, if both sides have
+    repeats, was measured in at least two runs on each side. A counted size is
+    slower only when the slowdown is significant, large and larger than the
+    drift between runs: the pooled samples are significantly slower
+    (Holm-corrected Mann-Whitney p < alpha), the lower end of the bootstrap CI
+    of the median ratio exceeds 1 + threshold, and so does the ratio of the
+    fastest current run to the slowest baseline run (per-run medians). The
+    function regressed when most counted sizes are slower and their
+    geometric-mean slowdown exceeds threshold. The complexity class shifted
+    when every run on both sides fits its class with >= CLASS_CONFIDENCE and
+    the current class grows faster than the baseline's.
+
+    Args:
+        runs: Repeated results of the test, with per-size samples_ms and fit
+        baseline: BaselineStore version (with its runs)
+        alpha: Significance level
+        threshold: Smallest slowdown that counts (0.2 = 20%)
+
+    Returns:
+        Dictionary with sizes (per common size: ratio, CI, run range, repeated,
+        counted, p-value, memory ratio, slower), ratio (geometric mean over
+        counted sizes), runs, baseline_runs, regressed, class_shift,
+        baseline_class and current_class
+    """
+    def by_size(series: List[Dict]) -> Dict[int, List[Dict]]:
+        grouped: Dict[int, List[Dict]] = {}
+        for run in series:
+            for r in run['results']:
+                if r.get('samples_ms'):
+                    grouped.setdefault(r['size'], []).append(r)
+        return grouped
+
+    before, now = by_size(baseline['runs']), by_size(runs)
+    # With repeats on both sides, only sizes measured in several runs show the drift between runs
+    min_runs = 2 if len(runs) > 1 and len(baseline['runs']) > 1 else 1
+    sizes = []
+    for size in sorted(set(before) & set(now)):
+        old, new = before[size], now[size]
+        old_samples = [t for r in old for t in r['samples_ms']]
+        new_samples = [t for r in new for t in r['samples_ms']]
+        ratio, low, high = bootstrap_ratio(new_samples, old_samples)
+        old_medians = [float(np.median(r['samples_ms'])) for r in old]
+        new_medians = [float(np.median(r['samples_ms'])) for r in new]
+        old_memory = [r['memory_kb'] for r in old if r.get('memory_kb')]
+        new_memory = [r['memory_kb'] for r in new if r.get('memory_kb')]
+        sizes.append({
+            'size': size,
+            'baseline_ms': float(np.median(old_samples)),
+            'current_ms': float(np.median(new_samples)),
+            'ratio': ratio,
+            'ci_low': low,
+            'ci_high': high,
+            # Run-to-run range of the slowdown: fastest current vs slowest baseline run and vice versa
+            'run_low': min(new_medians) / max(max(old_medians), 1e-12),
+            'run_high': max(new_medians) / max(min(old_medians), 1e-12),
+            'repeated': min(len(old), len(new)) >= min_runs,
+            'counted': min(len(old), len(new)) >= min_runs and float(np.median(old_samples)) >= MIN_TIME_MS,
+            'p_value': mann_whitney_greater(new_samples, old_samples),
+            'memory_ratio': float(np.median(new_memory) / np.median(old_memory)) if old_memory and new_memory else None,
+        })
+    for size, adjusted in zip(sizes, holm([s['p_value'] for s in sizes])):
+        size['p_adjusted'] = adjusted
+        size['slower'] = (size['counted'] and adjusted < alpha and size['ci_low'] > 1 + threshold
+                          and size['run_low'] > 1 + threshold)
+    counted = [s for s in sizes if s['counted']]
+    ratio = float(np.exp(np.mean(np.log([s['ratio'] for s in counted])))) if counted else 1.0
+    slower = sum(s['slower'] for s in counted)
+
+    baseline_class = _stable_class(baseline['runs'])
+    current_class = _stable_class(runs)
+    class_shift = bool(
+        baseline_class in COMPLEXITY_ORDER and current_class in COMPLEXITY_ORDER
+        and COMPLEXITY_ORDER.index(current_class) > COMPLEXITY_ORDER.index(baseline_class)
+    )
+
+    return {
+        'sizes': sizes,
+        'ratio': ratio,
+        'runs': len(runs),
+        'baseline_runs': len(baseline['runs']),
+        'regressed': slower > len(counted) / 2 and ratio > 1 + threshold,
+        'class_shift': class_shift,
+        'baseline_class': baseline_class or "unstable",
+        'current_class': current_class or "unstable",
+    }
+
+
+def format_report(comparisons: List[Dict]) -> str:
+    """Human-readable diff report of compare_results, one block per function."""
+    lines = []
+    for c in comparisons:
+        if c['status'] != "compared":
+            lines.append(f"• {c['function']}: {c['status']}")
+            continue
+        verdict = "❌ REGRESSED" if c['regressed'] or c['class_shift'] else "✅ OK"
+        notes = [text for flag, text in ((c['code_changed'], "code changed"),
+                                         (c.get('environment_changed'), "environment changed")) if flag]
+        note = f" ({', '.join(notes)} since baseline)" if notes else ""
+        lines.append(f"{verdict} {c['function']}{note}")
+        lines.append(f"    runtime: x{c['ratio']:.2f} overall, "
+                     f"{sum(s['slower'] for s in c['sizes'])}/{sum(s['counted'] for s in c['sizes'])} "
+                     f"counted sizes significantly slower "
+                     f"({c['runs']} run(s) vs {c['baseline_runs']} baseline run(s))")
+        if min(c['runs'], c['baseline_runs']) < 2:
+            lines.append("    ⚠️ single run: drift between runs is not measured, use --repeat")
+        lines.append(f"    complexity: {c['baseline_class']} → {c['current_class']}"
+                     + ("  ⚠️ class shift" if c['class_shift'] else ""))
+        if not c['sizes']:
+            lines.append("    no input sizes in common with the baseline")
+        for s in c['sizes']:
+            if s['slower']:
+                flag = "  ⚠️"
+            elif not s['repeated']:
+                flag = "  (single run)"
+            else:
+                flag = "" if s['counted'] else f"  (under {MIN_TIME_MS} ms)"
+            memory = f", memory x{s['memory_ratio']:.2f}" if s['memory_ratio'] is not None else ""
+            lines.append(
+                f"    n={s['size']:<9} {s['baseline_ms']:.4f} → {s['current_ms']:.4f} ms  "
+                f"x{s['ratio']:.2f} [{s['ci_low']:.2f}, {s['ci_high']:.2f}]  "
+                f"runs x{s['run_low']:.2f}-x{s['run_high']:.2f}  "
+                f"p={s['p_adjusted']:.3g}{memory}{flag}"
+            )
+    return "\n".join(lines)
+
+
+def compare_results(runs: List[List[Dict]], store: BaselineStore, alpha: float = 0.01,
+                    threshold: float = 0.2) -> List[Dict]:
+    """
+    Compare repeated runs of a batch of tests with their stored baselines.
+
+    Args:
+        runs: Results of each run of the suite (the same tests every time)
+
+    Returns:
+        One entry per test with function, test, status ("compared", "no baseline",
+        "no results" or the test's own failure status), code_changed and
+        environment_changed, plus the compare_run fields when compared
+    """
+    by_test: Dict[str, List[Dict]] = {}
+    for results in runs:
+        for result in results:
+            by_test.setdefault(result['test'], []).append(result)
+
+    comparisons = []
+    for test, attempts in by_test.items():
+        result = attempts[0]
+        entry = {'function': function_id(result) if result.get('function') else test,
+                 'test': test, 'code_changed': False, 'regressed': False, 'class_shift': False}
+        failed = next((r for r in attempts if r['status'] != "passed"), None)
+        if failed is not None:
+            entry['status'] = f"test {failed['status']}"
+        elif not all(r.get('results') for r in attempts):
+            entry['status'] = "no results"
+        else:
+            baseline, code_changed = store.lookup(result)
+            if baseline is None or not baseline.get('runs'):
+                entry['status'] = "no baseline"
+            else:
+                entry.update(compare_run(attempts, baseline, alpha, threshold),
+                             status="compared", code_changed=code_changed,
+                             environment_changed=environment_changed(result, baseline))
+        comparisons.append(entry)
+    return comparisons
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Repository Scanner
+Walks a source tree, extracts every function in a process pool and sends the
+ones that changed since the last scan to the analysis server in batches.
+"""
+
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .performance_test_generator import PerformanceTestGenerator
+    from .result_cache import code_hash
+except ImportError:
+    from performance_test_generator import PerformanceTestGenerator
+    from result_cache import code_hash
+
+
+MANIFEST_VERSION = 1
+DEFAULT_EXCLUDES = {'.git', '.hg', '.venv', 'venv', '__pycache__', 'node_modules', '.tox', '.nox', 'build', 'dist'}
+
+
+def _extract_file(path: str, known_sha: Optional[str] = None) -> Dict:
+    """
+    Parse one file in a worker process.
+
+    Args:
+        path: File to parse
+        known_sha: Content hash from the previous scan; extraction is skipped if it still matches
+
+    Returns:
+        Dictionary with the file's sha256 and, unless unchanged, its functions
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    sha = hashlib.sha256(raw).hexdigest()
+    if sha == known_sha:
+        return {'sha256': sha, 'unchanged': True}
+
+    source = raw.decode('utf-8', errors='replace')
+    functions = []
+    for info in PerformanceTestGenerator().extract_all_functions(source):
+        functions.append({
+            'qualname': info['qualname'],
+            'lineno': info['lineno'],
+            'code': info['code'],
+            'code_hash': code_hash(info['code']),
+        })
+    return {'sha256': sha, 'unchanged': False, 'functions': functions}
+
+
+class RepoScanner:
+    """Incremental whole-repository complexity scan."""
+
+    def __init__(self, root: str, server_url: str = "http://127.0.0.1:5000",
+                 manifest_path: Optional[str] = None, jobs: Optional[int] = None,
+                 batch_size: int = 64, excludes: Iterable[str] = ()):
+        """
+        Args:
+            root: Directory to scan
+            server_url: Base URL of the running analysis server (serve.py)
+            manifest_path: Where to keep file hashes and past results (default: <root>/.cpa_scan_manifest.json)
+            jobs: Parser processes (default: CPU count)
+            batch_size: Snippets sent per /analyze-batch request
+            excludes: Extra directory names to skip
+        """
+        self.root = os.path.abspath(root)
+        self.server_url = server_url.rstrip('/')
+        self.manifest_path = manifest_path or os.path.join(self.root, '.cpa_scan_manifest.json')
+        self.jobs = jobs or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.excludes = DEFAULT_EXCLUDES | set(excludes)
+
+    def find_source_files(self) -> List[str]:
+        """
+        Find all Python files under the root.
+
+        Returns:
+            Sorted list of paths relative to the root
+        """
+        source_files = []
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if d not in self.excludes and not d.startswith('.')]
+            for file in files:
+                if file.endswith('.py'):
+                    source_files.append(os.path.relpath(os.path.join(root, file), self.root))
+        return sorted(source_files)
+
+    def load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': MANIFEST_VERSION, 'model': None, 'files': {}, 'results': {}}
+
+    def save_manifest(self, manifest: Dict) -> None:
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def server_model(self) -> Optional[str]:
+        """Model id reported by the server (checkpoint, device, backend and dtype), used to invalidate old results."""
+        try:
+            return requests.get(f"{self.server_url}/health", timeout=10).json().get('model')
+        except (requests.RequestException, ValueError):
+            return None
+
+    def analyze(self, snippets: Dict[str, str], results: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        """
+        Send snippets to /analyze-batch.
+
+        Args:
+            snippets: Mapping of code hash to code
+            results: Dictionary filled as records arrive, so a caller keeps them if a later batch fails
+
+        Returns:
+            Mapping of code hash to result ({'complexity': ...} or {'detail': error})
+        """
+        results = {} if results is None else results
+        hashes = list(snippets)
+        for start in range(0, len(hashes), self.batch_size):
+            chunk = hashes[start:start + self.batch_size]
+            response = requests.post(
+                f"{self.server_url}/analyze-batch",
+                json={'snippets': [snippets[h] for h in chunk]},
+                stream=True,
+                timeout=3600
+            )
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue  # Heartbeat
+                record = json.loads(line)
+                snippet_hash = chunk[record.pop('index')]
+                results[snippet_hash] = record
+            print(f"Analyzed {min(start + self.batch_size, len(hashes))}/{len(hashes)} functions")
+        return results
+
+    def scan(self, full: bool = False) -> List[Dict]:
+        """
+        Scan the tree, analyzing only functions whose normalized code has no stored result.
+
+        Args:
+            full: Ignore the manifest and re-analyze everything
+
+        Returns:
+            Per-function report rows
+        """
+        manifest = self.load_manifest()
+        model = self.server_model()
+        if full or (model and manifest.get('model') != model):
+            manifest['results'] = {}
+        manifest['model'] = model or manifest.get('model')
+
+        old_files = {} if full else manifest['files']
+        files = {}
+        to_parse = {}
+
+        for rel_path in self.find_source_files():
+            stat = os.stat(os.path.join(self.root, rel_path))
+            entry = old_files.get(rel_path)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                files[rel_path] = entry
+            else:
+                to_parse[rel_path] = (stat, entry)
+
+        print(f"Found {len(files) + len(to_parse)} source file(s), {len(to_parse)} new or modified")
+
+        if to_parse:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                futures = {
+                    rel_path: pool.submit(_extract_file, os.path.join(self.root, rel_path),
+                                          entry['sha256'] if entry else None)
+                    for rel_path, (stat, entry) in to_parse.items()
+                }
+                for rel_path, future in futures.items():
+                    stat, entry = to_parse[rel_path]
+                    try:
+                        parsed = future.result()
+                    except Exception as e:
+                        print(f"[WARNING] Failed to read {rel_path}: {e}")
+                        continue
+                    functions = entry['functions'] if parsed['unchanged'] else parsed['functions']
+                    files[rel_path] = {
+                        'mtime_ns': stat.st_mtime_ns,
+                        'size': stat.st_size,
+                        'sha256': parsed['sha256'],
+                        'functions': functions,
+                    }
+
+        # Dedupe by normalized code so identical functions are analyzed once
+        results = manifest['results']
+        pending = {}
+        for entry in files.values():
+            for func in entry['functions']:
+                if func['code_hash'] not in results:
+                    pending.setdefault(func['code_hash'], func['code'])
+
+        print(f"{len(pending)} function(s) to analyze")
+        analyzed = {}
+        try:
+            if pending:
+                self.analyze(pending, analyzed)
+        finally:
+            # Keep what was analyzed before an error; the rest is still pending on the next scan
+            for snippet_hash, result in analyzed.items():
+                if 'complexity' in result:
+                    results[snippet_hash] = {'complexity': result['complexity']}
+                else:
+                    print(f"[WARNING] Analysis failed: {result.get('detail')}")
+
+            live_hashes = {func['code_hash'] for entry in files.values() for func in entry['functions']}
+            manifest['results'] = {h: r for h, r in results.items() if h in live_hashes}
+            manifest['files'] = files
+            self.save_manifest(manifest)
+
+        report = []
+        for rel_path, entry in sorted(files.items()):
+            for func in entry['functions']:
+                report.append({
+                    'file': rel_path,
+                    'function': func['qualname'],
+                    'lineno': func['lineno'],
+                    'complexity': manifest['results'].get(func['code_hash'], {}).get('complexity'),
+                    'code_hash': func['code_hash'],
+                })
+        return report
+
+    @staticmethod
+    def write_report(report: List[Dict], output_path: str, fmt: str = 'json') -> None:
+        """Write the per-function report as JSON or CSV."""
+        with open(output_path, 'w', newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=['file', 'function', 'lineno', 'complexity', 'code_hash'])
+                writer.writeheader()
+                writer.writerows(report)
+            else:
+                json.dump(report, f, indent=2)
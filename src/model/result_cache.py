@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Result Cache
+Content-addressed cache for complexity predictions. Snippets are keyed on a
+normalized AST (docstrings/comments dropped, local identifiers alpha-renamed)
+plus a fingerprint of the model checkpoint, so reformatting or renaming a
+function still hits while swapping the model invalidates everything.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class _AlphaRenamer(ast.NodeTransformer):
+    """Renames every identifier bound inside the snippet to a positional placeholder."""
+
+    def __init__(self, bound_names):
+        self.mapping = {}
+        for name in bound_names:
+            self.mapping.setdefault(name, f"_v{len(self.mapping)}")
+
+    def _rename(self, name: str) -> str:
+        return self.mapping.get(name, name)
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        node.annotation = None
+        return node
+
+    def visit_FunctionDef(self, node):
+        node.name = self._rename(node.name)
+        node.returns = None
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        node.name = self._rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            node.name = self._rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_Global(self, node):
+        node.names = [self._rename(n) for n in node.names]
+        return node
+
+    visit_Nonlocal = visit_Global
+
+
+def _bound_names(tree: ast.AST):
+    """Yield names bound by the snippet, in structural (walk) order."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            yield node.name
+        elif isinstance(node, ast.arg):
+            yield node.arg
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            yield node.id
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            yield node.name
+
+
+def _strip_docstrings(tree: ast.AST) -> None:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if (body and isinstance(body[0], ast.Expr)
+                    and isinstance(body[0].value, ast.Constant)
+                    and isinstance(body[0].value.value, str)):
+                body.pop(0)
+                if not body:
+                    body.append(ast.Pass())
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of a snippet used for cache keys.
+
+    Args:
+        code: Python source code
+
+    Returns:
+        Unparsed AST with docstrings, comments, annotations and local names
+        normalized, or whitespace-collapsed source if the snippet does not parse
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return " ".join(code.split())
+
+    _strip_docstrings(tree)
+    tree = _AlphaRenamer(list(_bound_names(tree))).visit(tree)
+    return ast.unparse(tree)
+
+
+def model_fingerprint(model_path) -> str:
+    """
+    Identify a checkpoint by the name, size and mtime of its files.
+
+    Args:
+        model_path: Directory the model is loaded from
+
+    Returns:
+        Short hex digest that changes whenever the checkpoint files change
+    """
+    model_path = pathlib.Path(model_path)
+    digest = hashlib.sha256(str(model_path.resolve()).encode())
+    if model_path.is_dir():
+        for entry in sorted(model_path.iterdir()):
+            if entry.is_file():
+                stat = entry.stat()
+                digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def code_hash(code: str) -> str:
+    """Content address for a snippet, independent of the model (same for renamed copies)."""
+    return hashlib.sha256(normalize_code(code).encode('utf-8')).hexdigest()
+
+
+def cache_key(code: str, model_id: str) -> str:
+    """Content address for a snippet under a given model checkpoint."""
+    payload = f"{model_id}\0{normalize_code(code)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional SQLite) cache of analysis results."""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 86400.0, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Memory tier capacity before least recently used entries are evicted
+            ttl_seconds: Entry lifetime in both tiers (0 disables expiry)
+            db_path: SQLite file for the persistent tier, or None for memory only
+        """
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = json.loads(row[0]), row[1]
+                    if not self._expired(created_at, now):
+                        self._remember(key, value, created_at)
+                        self.disk_hits += 1
+                        return dict(value)
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict) -> None:
+        """Store a result in every configured tier."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, dict(value), now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"[WARNING] Failed to persist cache entry: {e}")
+
+    def _remember(self, key: str, value: Dict, created_at: float) -> None:
+        if self.max_entries == 0:
+            return
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for /health."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._db is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Results Store
+Append-only export of analysis results. Requests hand rows to a background
+writer thread that flushes them in batches (by row count or time) to a CSV
+file, a SQLite database or a directory of Parquet parts. Downloads stream the
+store as CSV, one chunk at a time. The same batches also feed the indexed
+history store behind /results.
+"""
+
+import csv
+import io
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; the dev server there runs a single worker
+    fcntl = None
+
+COLUMNS = ['timestamp', 'code', 'complexity', 'execution_time_ms']
+STORES = ("csv", "sqlite", "parquet")
+
+Row = Tuple[str, str, str, float, str]  # COLUMNS plus the inference mode
+
+
+def _lock(f) -> None:
+    """Exclusive lock on an open file until it is closed (no-op where flock is unavailable)."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _escape_code(code: str) -> str:
+    # One result per line in the CSV export
+    return code.replace('\n', '\\n').replace('\r', '')
+
+
+def _csv_lines(rows) -> Iterator[str]:
+    """Format rows as CSV text, header first, a few hundred rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for i, (timestamp, code, complexity, execution_time_ms) in enumerate(rows, 1):
+        writer.writerow([timestamp, _escape_code(code), complexity, execution_time_ms])
+        if i % 256 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _CsvStore:
+    """Single CSV file; flushes take an exclusive file lock so workers never interleave rows."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        # Header only if the file is new or empty, checked under the lock so starting workers can't race
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            _lock(f)
+            if f.seek(0, os.SEEK_END) == 0:
+                csv.writer(f).writerow(COLUMNS)
+
+    def append(self, rows: List[Row]) -> None:
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            _lock(f)
+            writer = csv.writer(f)
+            for timestamp, code, complexity, execution_time_ms, _ in rows:
+                writer.writerow([timestamp, _escape_code(code), complexity, execution_time_ms])
+
+    def clear(self) -> None:
+        # Open without truncating ('w' would empty the file before the lock is held), then truncate under the lock
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            _lock(f)
+            f.truncate(0)
+            csv.writer(f).writerow(COLUMNS)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def iter_csv(self) -> Iterator[str]:
+        # Already CSV: stream the file as is
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            while True:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class _SqliteStore:
+    """Append-only SQLite table; WAL mode lets one worker write while others read."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, code TEXT NOT NULL, "
+                "complexity TEXT NOT NULL, execution_time_ms REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def append(self, rows: List[Row]) -> None:
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO results (timestamp, code, complexity, execution_time_ms) VALUES (?, ?, ?, ?)",
+                [row[:4] for row in rows]
+            )
+
+    def clear(self) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM results")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def iter_csv(self) -> Iterator[str]:
+        db = self._connect()
+        try:
+            cursor = db.execute("SELECT timestamp, code, complexity, execution_time_ms FROM results ORDER BY id")
+            yield from _csv_lines(cursor)
+        finally:
+            db.close()
+
+
+class _ParquetStore:
+    """Directory of Parquet files, one per flush (Parquet files cannot be appended to)."""
+
+    def __init__(self, path: pathlib.Path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("The parquet results store requires pyarrow: pip install pyarrow")
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._parts = 0
+
+    def append(self, rows: List[Row]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: [row[i] for row in rows] for i, name in enumerate(COLUMNS)})
+        # Time-ordered names; pid keeps concurrent workers from colliding
+        self._parts += 1
+        name = f"part-{time.time_ns()}-{os.getpid()}-{self._parts}.parquet"
+        pq.write_table(table, self.path / f".{name}.tmp")
+        os.replace(self.path / f".{name}.tmp", self.path / name)
+
+    def clear(self) -> None:
+        for part in self.path.glob("part-*.parquet"):
+            part.unlink(missing_ok=True)
+
+    def exists(self) -> bool:
+        return self.path.is_dir()
+
+    def iter_csv(self) -> Iterator[str]:
+        import pyarrow.parquet as pq
+
+        def rows():
+            for part in sorted(self.path.glob("part-*.parquet")):
+                for batch in pq.ParquetFile(part).iter_batches(batch_size=1024):
+                    yield from zip(*(batch.column(name).to_pylist() for name in COLUMNS))
+
+        yield from _csv_lines(rows())
+
+
+class ResultsWriter:
+    """Buffers result rows on a queue and flushes them to the store from a background thread."""
+
+    def __init__(self, store: str, path: pathlib.Path, flush_rows: int = 64, flush_interval_s: float = 1.0,
+                 history=None):
+        """
+        Args:
+            store: One of STORES
+            path: CSV file, SQLite database or Parquet directory
+            flush_rows: Flush as soon as this many rows are buffered
+            flush_interval_s: Flush buffered rows at least this often
+            history: Optional HistoryStore that receives the same rows
+        """
+        if store not in STORES:
+            raise ValueError(f"Unknown results store '{store}' (expected one of {', '.join(STORES)})")
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.store = {"csv": _CsvStore, "sqlite": _SqliteStore, "parquet": _ParquetStore}[store](path)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval_s = flush_interval_s
+        self.history = history
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()  # Serializes flushes with clear()
+        self._worker = threading.Thread(target=self._run, name="cpa-results-writer", daemon=True)
+        self._worker.start()
+
+    def record(self, code: str, complexity: str, execution_time_ms: float, mode: str = "") -> None:
+        """Queue one result; never blocks on I/O."""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put((timestamp, code, complexity, round(execution_time_ms, 3), mode))
+
+    def _drain(self, rows: List[Row], markers: List[threading.Event]) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            (markers if isinstance(item, threading.Event) else rows).append(item)
+
+    def _flush(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            for store in (self.store, self.history):
+                if store is None:
+                    continue
+                try:
+                    store.append(rows)
+                except Exception as e:
+                    print(f"[WARNING] Failed to save {len(rows)} results to {type(store).__name__}: {e}")
+        rows.clear()
+
+    def _run(self) -> None:
+        rows: List[Row] = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, last_flush + self.flush_interval_s - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if isinstance(item, threading.Event):  # flush() marker
+                    markers = [item]
+                    self._drain(rows, markers)
+                    self._flush(rows)
+                    last_flush = time.monotonic()
+                    for marker in markers:
+                        marker.set()
+                    continue
+                rows.append(item)
+            except queue.Empty:
+                pass
+            if len(rows) >= self.flush_rows or time.monotonic() - last_flush >= self.flush_interval_s:
+                self._flush(rows)
+                last_flush = time.monotonic()
+
+    def flush(self, timeout_s: float = 5.0) -> None:
+        """Write everything queued so far (used before downloads, clears and shutdown)."""
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        flushed.wait(timeout_s)
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self.store.clear()
+            if self.history is not None:
+                self.history.clear()
+
+    def exists(self) -> bool:
+        return self.store.exists()
+
+    def iter_csv(self) -> Iterator[str]:
+        """The whole store as CSV text chunks."""
+        return self.store.iter_csv()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Sandbox
+Limits shared by every process that runs generated code (test_runner's tests
+and the server's profiler): CPU pinning, rlimits and an environment with
+headless plotting and single-threaded BLAS. apply_limits runs in the child
+itself (preexec_fn is unsafe with worker threads); launcher scripts that can't
+import this module embed it through LIMITS_SOURCE.
+"""
+
+import inspect
+import os
+from typing import Dict, List, Optional
+
+# Headless plots (plt.show() would block) and single-threaded BLAS on the pinned core
+SANDBOX_ENV = {"MPLBACKEND": "Agg", "OMP_NUM_THREADS": "1", "OPENBLAS_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (pinning targets); empty where affinity is unsupported."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return []
+
+
+def sandbox_env(base: Dict[str, str]) -> Dict[str, str]:
+    """base plus SANDBOX_ENV."""
+    return {**base, **SANDBOX_ENV}
+
+
+def apply_limits(cpu: Optional[int] = None, memory_mb: int = 0, cpu_s: int = 0, file_mb: int = 0) -> None:
+    """
+    Pin the calling process and apply its rlimits (call it in the child).
+
+    Args:
+        cpu: CPU to pin to, or None to let it float
+        memory_mb: Address-space limit (0 for none)
+        cpu_s: CPU-time limit in seconds (0 for none)
+        file_mb: Largest file the process may write (0 for none)
+    """
+    import os
+    try:
+        import resource
+    except ImportError:  # Windows: no rlimits
+        resource = None
+
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    if resource is None:
+        return
+    if memory_mb > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_mb << 20, memory_mb << 20))
+    if cpu_s > 0:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s + 1))
+    if file_mb > 0:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_mb << 20, file_mb << 20))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+# Source of apply_limits for child scripts (e.g. python -I drivers, which can't import this package)
+LIMITS_SOURCE = "from typing import Optional\n\n" + inspect.getsource(apply_limits)
@@ -1,23 +1,42 @@
 #!/usr/bin/env python3
-import torch
-import csv
 import os
 from datetime import datetime
 import pathlib
 import asyncio
 import json
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import time
+import threading
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Callable, List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from transformers import AutoTokenizer, AutoModelForCausalLM
 
 
 # Fix dual import for relative path for cluster vs dev container
+# torch/transformers are only pulled in by inference_engine, imported once the server is up
 try:
     from .performance_test_generator import PerformanceTestGenerator
+    from .batch_scheduler import BatchScheduler
+    from .result_cache import ResultCache, cache_key, model_fingerprint
+    from .cancellation import CancellationToken, RequestCancelled, SessionRegistry
+    from .inference_worker import InferenceClient
+    from .results_store import ResultsWriter
+    from .history_store import HistoryStore
+    from .profiler import ProfilerPool
+    from .complexity_fit import fit_complexity
 except ImportError:
     from performance_test_generator import PerformanceTestGenerator
+    from batch_scheduler import BatchScheduler
+    from result_cache import ResultCache, cache_key, model_fingerprint
+    from cancellation import CancellationToken, RequestCancelled, SessionRegistry
+    from inference_worker import InferenceClient
+    from results_store import ResultsWriter
+    from history_store import HistoryStore
+    from profiler import ProfilerPool
+    from complexity_fit import fit_complexity
 
 # Fix cluster path
 BASE_DIR = pathlib.Path(__file__).parent
@@ -25,107 +44,191 @@ MODEL_PATH = BASE_DIR / "models" / "student" / "cpa"
 
 # paths for export feature
 EXPORT_DIR = BASE_DIR / "exported_results"
-EXPORT_FILE = EXPORT_DIR / "analysis_result.csv"
 
 # create directory for results
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
-# initialize csv export file wit headers
-if not EXPORT_FILE.exists():
-    with open(EXPORT_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'code', 'complexity', 'execution_time_ms'])
+# Results export: "csv", "sqlite" or "parquet" (needs pyarrow), written in batches by a background thread
+RESULTS_STORE = os.environ.get("CPA_RESULTS_STORE", "csv")
+RESULTS_PATH = os.environ.get("CPA_RESULTS_PATH") or EXPORT_DIR / {
+    "csv": "analysis_result.csv", "sqlite": "analysis_result.db", "parquet": "analysis_result.parquet"
+}.get(RESULTS_STORE, "analysis_result")
+RESULTS_FLUSH_ROWS = int(os.environ.get("CPA_RESULTS_FLUSH_ROWS", 64))
+RESULTS_FLUSH_MS = float(os.environ.get("CPA_RESULTS_FLUSH_MS", 1000))
+# Indexed history behind /results (SQLite)
+HISTORY_DB = os.environ.get("CPA_HISTORY_DB") or EXPORT_DIR / "history.db"
 # ---------------------------
 
-MAX_INPUT_LENGTH = 512
-
-print(f"Loading model from: {MODEL_PATH}")
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"Using device: {device}")
-
-tokenizer = AutoTokenizer.from_pretrained(
-    MODEL_PATH, use_fast=True, local_files_only=True
-)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_PATH, torch_dtype=torch.float16, local_files_only=True
-)
-torch.backends.cudnn.benchmark = True
-model.to(device)
-model.eval()
-# model = torch.compile(model) # torch.compile() causes asyncio deadlock
- 
-if tokenizer.pad_token is None:
-    tokenizer.pad_token = tokenizer.eos_token
-
-# Warmup
-print("Warming up model...")
-warmup = tokenizer("warmup", return_tensors="pt", padding=True)
-warmup = {k: v.to(device) for k, v in warmup.items()}
-with torch.inference_mode():
-    _ = model.generate(
-        warmup["input_ids"],
-        attention_mask=warmup["attention_mask"],
-        max_new_tokens=1,
-        do_sample=False,
-        use_cache=True,
-        pad_token_id=tokenizer.eos_token_id,
-        eos_token_id=tokenizer.eos_token_id
-    )
-print("Model ready.")
+# Micro-batching window for /analyze (tune with the /health batching stats)
+MAX_BATCH_SIZE = int(os.environ.get("CPA_MAX_BATCH_SIZE", 8))
+MAX_BATCH_WAIT_MS = float(os.environ.get("CPA_MAX_BATCH_WAIT_MS", 10))
+
+# Prediction cache (set CPA_CACHE_DB to a file path to keep entries across restarts)
+CACHE_SIZE = int(os.environ.get("CPA_CACHE_SIZE", 4096))
+CACHE_TTL_S = float(os.environ.get("CPA_CACHE_TTL_S", 86400))
+CACHE_DB = os.environ.get("CPA_CACHE_DB") or None
+
+# Default per-request deadline in seconds (0 = none); requests can override with timeout_s, /analyze-batch applies it per item
+REQUEST_TIMEOUT_S = float(os.environ.get("CPA_REQUEST_TIMEOUT_S", 0))
+
+# Grammar-constrained Big-O decoding (default for requests that don't set "constrained")
+CONSTRAINED_DECODING = os.environ.get("CPA_CONSTRAINED_DECODING", "0") == "1"
+
+# Default inference mode: "generate" (autoregressive) or "classify" (score fixed labels in one pass)
+ANALYSIS_MODE = os.environ.get("CPA_ANALYSIS_MODE", "generate")
+
+
+# Sandboxed /profile runs: concurrent harnesses (0 = one per CPU) and per-run limits
+PROFILE_WORKERS = int(os.environ.get("CPA_PROFILE_WORKERS", 0))
+PROFILE_CPU_S = int(os.environ.get("CPA_PROFILE_CPU_S", 60))
+PROFILE_MEMORY_MB = int(os.environ.get("CPA_PROFILE_MEMORY_MB", 1024))
+PROFILE_TIMEOUT_S = float(os.environ.get("CPA_PROFILE_TIMEOUT_S", 60))
+
+# Unix socket of a dedicated inference worker (inference_worker.py); unset = run the model in this process
+INFERENCE_ADDRESS = os.environ.get("CPA_INFERENCE_ADDRESS", "")
+
 
-app = FastAPI()
+# Model state, filled in by the background loader (see /ready)
+engine = None
+engine_status = {"status": "loading", "detail": None, "started": time.time(), "load_s": None}
+
+def load_engine():
+    """ Import torch/transformers and load the model; runs in a thread so the server answers meanwhile"""
+    global engine
+    try:
+        if INFERENCE_ADDRESS:
+            # The worker owns the model; wait until it is up and use the client as the engine
+            scheduler.connect()
+            engine = scheduler
+        else:
+            try:
+                from .inference_engine import InferenceEngine
+            except ImportError:
+                from inference_engine import InferenceEngine
+            engine = InferenceEngine(MODEL_PATH)
+        engine_status.update(status="ready", load_s=round(time.time() - engine_status["started"], 1))
+    except Exception as e:
+        print(f"[ERROR] Failed to load model: {e}")
+        engine_status.update(status="failed", detail=str(e))
+
+def require_engine():
+    """ Reject model-backed requests until loading has finished"""
+    if engine is None:
+        detail = "Model failed to load" if engine_status["status"] == "failed" else "Model is loading"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "10"})
+    return engine
+
+def engine_id(info: dict) -> str:
+    """ Checkpoint fingerprint plus the device, backend and dtype it runs with (outputs differ between them)"""
+    return f"{MODEL_ID}:{info['device']}:{info['backend']}:{info.get('dtype')}"
+
+def on_gpu() -> bool:
+    return engine is not None and engine.info["device"] == "cuda"
+
+def run_batch(snippets: List[str], cancel_tokens: Optional[List[Optional[CancellationToken]]] = None,
+              options: Optional[List[dict]] = None, on_token: Optional[Callable[[str], None]] = None) -> List[dict]:
+    """ Scheduler entry point"""
+    return engine.run_batch(snippets, cancel_tokens, options, on_token)
+
+
+if INFERENCE_ADDRESS:
+    scheduler = InferenceClient(INFERENCE_ADDRESS)
+else:
+    scheduler = BatchScheduler(run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS)
+
+# Keys include the checkpoint fingerprint so a new model never serves stale predictions
+MODEL_ID = model_fingerprint(MODEL_PATH)
+result_cache = ResultCache(max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL_S, db_path=CACHE_DB)
+# A new history starts with the rows of the CSV export (the only store before the history existed)
+history = HistoryStore(HISTORY_DB, RESULTS_PATH if RESULTS_STORE == "csv" else EXPORT_DIR / "analysis_result.csv")
+results_writer = ResultsWriter(RESULTS_STORE, RESULTS_PATH, RESULTS_FLUSH_ROWS, RESULTS_FLUSH_MS / 1000, history)
+profiler = ProfilerPool(PROFILE_WORKERS, PROFILE_CPU_S, PROFILE_MEMORY_MB, PROFILE_TIMEOUT_S)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load in the background: /health answers right away and /ready flips once the model is up
+    threading.Thread(target=load_engine, name="model-loader", daemon=True).start()
+    yield
+    results_writer.flush()
+    profiler.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 test_generator = PerformanceTestGenerator()
+sessions = SessionRegistry()
 
 # Request schemas
 class CodeRequest(BaseModel):
     code: str
     complexity: str = ""
+    mode: Optional[Literal["generate", "classify"]] = None  # /analyze only: default CPA_ANALYSIS_MODE
+    constrained: Optional[bool] = None  # /analyze only: Big-O grammar decoding (default CPA_CONSTRAINED_DECODING)
+    stream: bool = False  # /analyze only: stream tokens as NDJSON (or SSE with Accept: text/event-stream)
+    session_id: str = ""  # /analyze only: a newer request with the same id cancels this one
+    timeout_s: float = 0.0  # /analyze only: deadline override (0 = CPA_REQUEST_TIMEOUT_S)
+
+class BatchRequest(BaseModel):
+    snippets: List[str] = []
+    source: str = ""  # whole file, split into one snippet per function
+    mode: Optional[Literal["generate", "classify"]] = None
+    constrained: Optional[bool] = None
+
+class ProfileRequest(BaseModel):
+    code: str
+    complexity: str = ""  # predicted by the model when empty
+    timeout_s: float = 0.0  # wall-clock limit (0 = CPA_PROFILE_TIMEOUT_S, which also caps it)
+
+class FitRequest(BaseModel):
+    sizes: List[float]
+    times: List[float]  # runtime per size, any unit
+    criterion: Literal["aic", "bic"] = "bic"
+
+def save_results(code: str, complexity: str, execution_time_ms: float = 0.0, mode: str = ""):
+    """ Queue analysis result for the export and history stores - non-blocking"""
+    results_writer.record(code, complexity, execution_time_ms, mode)
+
+def submit_analysis(code_snippet: str, mode: Optional[str] = None, constrained: Optional[bool] = None,
+                    on_token: Optional[Callable[[str], None]] = None,
+                    cancel_token: Optional[CancellationToken] = None) -> Future:
+    """ Resolve from the cache or queue the snippet for the next batch; returns a future of the result dict"""
+    info = require_engine().info
+    start = time.perf_counter()
+    elapsed_ms = lambda: (time.perf_counter() - start) * 1000
+    result = Future()
+    mode = mode or ANALYSIS_MODE
+    if constrained is None:
+        constrained = CONSTRAINED_DECODING
+
+    if mode == "classify":
+        variant = (f"{engine_id(info)}:classify:{'|'.join(info['labels'])}:{info['temperature']}:"
+                   f"{'calibrated' if info.get('calibrated') else 'raw'}")
+    else:
+        variant = f"{engine_id(info)}:constrained:{info['grammar']}" if constrained else engine_id(info)
+    key = cache_key(code_snippet, variant)
+    cached = result_cache.get(key)
+    if cached is not None:
+        save_results(code_snippet, cached["complexity"], elapsed_ms(), mode)
+        result.set_result(cached)
+        return result
+
+    def finish(generation: Future):
+        try:
+            analysis = generation.result()
+            result_cache.put(key, analysis)
+            save_results(code_snippet, analysis["complexity"], elapsed_ms(), mode)
+            result.set_result(analysis)
+        except Exception as e:
+            result.set_exception(e)
 
-def save_results(code: str, complexity: str, execution_time: float = 0.0):
-    """ Save analysis result to CSV file for analysis export featyre - non-blocking"""
-    try:
-        with open(EXPORT_FILE, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            timestamp = datetime.now().strftime('%Y=%m-%d %H:%M:%S')
-            code = code.replace('\n', '\\n').replace('\r', '')
-            writer.writerow([timestamp, code, complexity, execution_time])
-    except Exception as e:
-        print(f"[WARNING] Failed to save result to CSV file: {e}")
-
-def run_analysis(code_snippet: str) -> dict:
-
-    prompt = (
-        f"Analyze the following Python function and respond ONLY with its Big-O time complexity:\n\n"
-        f"{code_snippet}\nComplexity:"
+    # Queued behind concurrent requests and generated as one batch
+    generation = scheduler.submit(
+        code_snippet, options={"mode": mode, "constrained": constrained}, on_token=on_token, cancel_token=cancel_token
     )
+    generation.add_done_callback(finish)
+    return result
 
+def run_analysis(code_snippet: str) -> dict:
     try:
-        inputs = tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=MAX_INPUT_LENGTH,
-            padding=True
-        )
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-
-        with torch.inference_mode():
-            output_ids = model.generate(
-                input_ids=inputs["input_ids"],
-                attention_mask=inputs["attention_mask"],
-                max_new_tokens=16,
-                do_sample=False,
-                use_cache=True,
-                pad_token_id=tokenizer.eos_token_id,
-                eos_token_id=tokenizer.eos_token_id
-            )
-
-        decoded = tokenizer.decode(output_ids[0], skip_special_tokens=True)
-        complexity = decoded[len(prompt):].strip().split("\n")[0]
-
-        save_results(code_snippet, complexity)
-        return {"complexity": complexity}
-
+        return submit_analysis(code_snippet).result()
     except Exception as e:
         print(f"[ERROR] {e}")
         raise e
@@ -155,29 +258,132 @@ def run_generate_test(code_snippet: str, complexity_hint: str) -> dict:
         raise e
 
 
+def cancelled_status(e: RequestCancelled) -> int:
+    """ HTTP status for an aborted request"""
+    return 504 if e.reason == "deadline exceeded" else 409
+
+async def wait_for_analysis(request: Request, future, cancel_token: CancellationToken) -> dict:
+    """ Await an analysis (or profile) future, cancelling it if the client disconnects first"""
+    pending = asyncio.wrap_future(future)
+    while True:
+        done, _ = await asyncio.wait({pending}, timeout=1.0)
+        if done:
+            return pending.result()
+        if await request.is_disconnected():
+            cancel_token.cancel("disconnected")
+            print("[INFO] Client disconnected, aborting generation")
+
+async def analysis_event_stream(request: Request, code_snippet: str, mode: Optional[str],
+                                constrained: Optional[bool], sse: bool,
+                                cancel_token: CancellationToken):
+    """ Stream queue position, generated tokens and the final result; abort generation if the client leaves"""
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    tokens = asyncio.Queue()
+
+    def frame(event: str, **data) -> str:
+        data = {"event": event, **data, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+        if sse:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps(data) + "\n"
+
+    result = asyncio.wrap_future(submit_analysis(
+        code_snippet,
+        mode,
+        constrained,
+        on_token=lambda text: loop.call_soon_threadsafe(tokens.put_nowait, text),
+        cancel_token=cancel_token
+    ))
+
+    last_position = None
+    last_frame = time.perf_counter()
+    next_token = None
+    try:
+        while True:
+            if next_token is None:
+                next_token = asyncio.ensure_future(tokens.get())
+            done, _ = await asyncio.wait({result, next_token}, timeout=0.25, return_when=asyncio.FIRST_COMPLETED)
+
+            if next_token in done:
+                yield frame("token", text=next_token.result())
+                next_token = None
+                last_frame = time.perf_counter()
+                continue
+            if result in done:
+                break
+
+            if await request.is_disconnected():
+                cancel_token.cancel("disconnected")
+                print("[INFO] Client disconnected, aborting generation")
+                return
+
+            position = scheduler.queue_position(cancel_token)
+            if position >= 0 and (position != last_position or time.perf_counter() - last_frame > 15.0):
+                yield frame("queued", position=position)
+                last_position = position
+                last_frame = time.perf_counter()
+
+        while not tokens.empty():
+            yield frame("token", text=tokens.get_nowait())
+
+        yield frame("result", **result.result())
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        yield frame("error", detail=str(e))
+    finally:
+        # Also covers the response being torn down mid-stream
+        cancel_token.cancel("disconnected")
+        if next_token is not None:
+            next_token.cancel()
+
+
 @app.post("/analyze")
-def analyze(req: CodeRequest):  # sync
+async def analyze(req: CodeRequest, request: Request):
     code_snippet = req.code.strip()
     if not code_snippet:
         raise HTTPException(status_code=400, detail="Missing 'code' field")
+    require_engine()
+
+    cancel_token = CancellationToken(req.timeout_s or REQUEST_TIMEOUT_S)
+    sessions.register(req.session_id, cancel_token)
 
-    if device.type == 'cuda':
-        # No async or hb on gpu
+    if req.stream:
+        sse = "text/event-stream" in request.headers.get("accept", "")
+
+        async def session_stream():
+            try:
+                events = analysis_event_stream(request, code_snippet, req.mode, req.constrained, sse, cancel_token)
+                async for chunk in events:
+                    yield chunk
+            finally:
+                sessions.release(req.session_id, cancel_token)
+
+        return StreamingResponse(
+            session_stream(),
+            media_type="text/event-stream" if sse else "application/x-ndjson"
+        )
+
+    if on_gpu():
+        # No hb on gpu
         print("Using Fast (GPU) inference") # Only on dev container
         try:
-            result = run_analysis(code_snippet)
-            return result
+            future = submit_analysis(code_snippet, req.mode, req.constrained, cancel_token=cancel_token)
+            return await wait_for_analysis(request, future, cancel_token)
+        except RequestCancelled as e:
+            raise HTTPException(status_code=cancelled_status(e), detail=str(e))
         except Exception as e:
             print(f"[ERROR] {e}")
             raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            sessions.release(req.session_id, cancel_token)
     
     else:
         # Slow inference fix: Hearbeat by streaming spaces to maintain connection
         print("Using Slow (CPU) inference with heartbeats") # Kind does not support gpu cluster
         
         async def analysis_generator():
-            loop = asyncio.get_event_loop()
-            analysis_task = loop.run_in_executor(None, run_analysis, code_snippet)
+            future = submit_analysis(code_snippet, req.mode, req.constrained, cancel_token=cancel_token)
+            analysis_task = asyncio.wrap_future(future)
             
             try:
                 while True:
@@ -192,6 +398,10 @@ def analyze(req: CodeRequest):  # sync
                 print(f"[ERROR] {e}")
                 error_response = {"detail": str(e)}
                 yield json.dumps(error_response)
+            finally:
+                # Starlette closes the generator when the client disconnects
+                cancel_token.cancel("disconnected")
+                sessions.release(req.session_id, cancel_token)
 
         return StreamingResponse(analysis_generator(), media_type="application/json")
 
@@ -204,9 +414,11 @@ def generate_test(req: CodeRequest):
 
     if not code_snippet:
         raise HTTPException(status_code=400, detail="Missing 'code' field")
+    if not complexity_hint:
+        require_engine()  # Only the analysis step needs the model
     
     # GPU vs CPU split path for tests
-    if device.type == 'cuda':
+    if on_gpu():
         print("Using Fast (GPU) inference")
         try:
             result = run_generate_test(code_snippet, complexity_hint)
@@ -243,33 +455,222 @@ def generate_test(req: CodeRequest):
         return StreamingResponse(test_generator_stream(), media_type="application/json")
 
 
+async def run_profile(code_snippet: str, complexity: str, timeout_s: float,
+                      cancel_token: CancellationToken) -> dict:
+    """ Analyze (if no complexity was given), build the harness and run it in the sandbox"""
+    if not complexity:
+        # The analysis gets the usual deadline; cancel_token (disconnect) aborts it too
+        analysis_token = CancellationToken(REQUEST_TIMEOUT_S)
+        cancel_token.add_callback(analysis_token.cancel)
+        try:
+            analysis = await asyncio.wrap_future(submit_analysis(code_snippet, cancel_token=analysis_token))
+        except RequestCancelled as e:
+            raise HTTPException(status_code=cancelled_status(e), detail=str(e))
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        complexity = analysis["complexity"]
+
+    harness = test_generator.build_harness(code_snippet, complexity)
+    if not harness:
+        raise HTTPException(
+            status_code=400,
+            detail="Failed to generate test file. Ensure the code contains a valid function definition."
+        )
+
+    try:
+        run = await asyncio.wrap_future(profiler.submit(harness, complexity, timeout_s, cancel_token=cancel_token))
+    except RequestCancelled as e:
+        raise HTTPException(status_code=cancelled_status(e), detail=str(e))
+    return {"function_name": harness["function_name"], "complexity": complexity, "scaling": harness["scaling"], **run}
+
+
+@app.post("/profile")
+async def profile(req: ProfileRequest, request: Request):
+    """Generate the performance test and run it in the sandbox; returns the measured size/time/memory series"""
+    code_snippet = req.code.strip()
+    complexity = req.complexity.strip()
+    if not code_snippet:
+        raise HTTPException(status_code=400, detail="Missing 'code' field")
+    if not complexity:
+        require_engine()  # Only the analysis step needs the model
+
+    # Cancelled on disconnect: drops the queued analysis and kills the sandbox
+    cancel_token = CancellationToken()
+
+    if on_gpu():
+        task = asyncio.ensure_future(run_profile(code_snippet, complexity, req.timeout_s, cancel_token))
+        try:
+            return await wait_for_analysis(request, task, cancel_token)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    # Slow inference fix: Hearbeat by streaming spaces to maintain connection
+    async def profile_stream():
+        task = asyncio.ensure_future(run_profile(code_snippet, complexity, req.timeout_s, cancel_token))
+        try:
+            while True:
+                try:
+                    # Pulse
+                    result = await asyncio.wait_for(asyncio.shield(task), timeout=15.0)
+                    yield json.dumps(result)
+                    break
+                except asyncio.TimeoutError:
+                    yield " "
+        except HTTPException as e:
+            yield json.dumps({"detail": e.detail})
+        except Exception as e:
+            print(f"[ERROR] {e}")
+            yield json.dumps({"detail": str(e)})
+        finally:
+            # Starlette closes the generator when the client disconnects
+            cancel_token.cancel("disconnected")
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(profile_stream(), media_type="application/json")
+
+
+@app.post("/fit-complexity")
+def fit_complexity_endpoint(req: FitRequest):
+    """Empirical complexity of a measured size/time series (candidates ranked by AIC/BIC)"""
+    try:
+        return fit_complexity(req.sizes, req.times, req.criterion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/analyze-batch")
+async def analyze_batch(req: BatchRequest):
+    """Analyze many snippets (or every function in a source file) and stream NDJSON results as they finish"""
+    if req.source.strip():
+        functions = test_generator.extract_all_functions(req.source)
+        if not functions:
+            raise HTTPException(status_code=400, detail="No function definitions found in 'source'")
+        items = [{"name": f["qualname"], "lineno": f["lineno"], "code": f["code"]} for f in functions]
+    else:
+        items = [{"code": s.strip()} for s in req.snippets]
+        if not items or not all(item["code"] for item in items):
+            raise HTTPException(status_code=400, detail="Provide non-empty 'snippets' or a 'source' file")
+    require_engine()
+
+    # Bucket by length so each generate call pads rows of similar size
+    order = sorted(range(len(items)), key=lambda i: len(items[i]["code"]))
+    buckets = [order[i:i + MAX_BATCH_SIZE] for i in range(0, len(order), MAX_BATCH_SIZE)]
+
+    async def batch_stream():
+        pending = {}
+        tokens = {}
+        next_bucket = 0
+        try:
+            while next_bucket < len(buckets) or pending:
+                # Keep two buckets in flight so /analyze callers can still interleave
+                while next_bucket < len(buckets) and len(pending) < 2 * MAX_BATCH_SIZE:
+                    for i in buckets[next_bucket]:
+                        # Each item gets its own deadline from submission, so a long batch doesn't starve its tail
+                        tokens[i] = CancellationToken(REQUEST_TIMEOUT_S)
+                        future = submit_analysis(items[i]["code"], req.mode, req.constrained, cancel_token=tokens[i])
+                        pending[asyncio.wrap_future(future)] = i
+                    next_bucket += 1
+
+                done, _ = await asyncio.wait(pending, timeout=15.0, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    yield "\n"  # Heartbeat for slow CPU batches
+                    continue
+
+                for task in done:
+                    i = pending.pop(task)
+                    tokens.pop(i, None)
+                    record = {"index": i, **{k: v for k, v in items[i].items() if k != "code"}}
+                    try:
+                        record.update(task.result())
+                    except Exception as e:
+                        print(f"[ERROR] {e}")
+                        record["detail"] = str(e)
+                    yield json.dumps(record) + "\n"
+        finally:
+            # Drop whatever is still queued if the client goes away
+            for token in tokens.values():
+                token.cancel("disconnected")
+
+    return StreamingResponse(batch_stream(), media_type="application/x-ndjson")
+
+
 @app.get("/health")
 async def health():  # async since we ping periodically
-    return {"status": "ok"}
+    """Liveness: answers as soon as the server is up, whether or not the model has loaded"""
+    return {
+        "status": "ok",
+        "model": engine_id(engine.info) if engine is not None else None,  # None while loading
+        "engine": engine_status["status"],
+        "memory": await run_in_threadpool(engine.memory) if engine is not None else None,
+        "batching": await run_in_threadpool(scheduler.stats),
+        "cache": result_cache.stats()
+    }
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before (or if loading failed or the worker is gone)"""
+    if engine is None:
+        return JSONResponse(status_code=503, content={"ready": False, **engine_status})
+    if INFERENCE_ADDRESS and not await run_in_threadpool(scheduler.alive):
+        return JSONResponse(status_code=503, content={
+            "ready": False, **engine_status, "status": "worker unavailable",
+            "detail": "Inference worker is not responding"
+        })
+    return {"ready": True, **engine_status, **engine.info}
 
 
 # New endpoints for export feature
 @app.get("/download-results")
 async def download_results():
     """Downloads analysis results as CSV"""
-    from fastapi.responses import FileResponse
-    
-    if not EXPORT_FILE.exists():
+    if not results_writer.exists():
         raise HTTPException(status_code=404, detail="No results found")
 
-    return FileResponse(
-        path=str(EXPORT_FILE),
+    # Include rows still buffered, then stream the store chunk by chunk
+    await run_in_threadpool(results_writer.flush)
+    filename = f'cpa_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return StreamingResponse(
+        results_writer.iter_csv(),
         media_type='text/csv',
-        filename=f'cpa_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
+@app.get("/results")
+def results(
+    function: str = "",
+    code_hash: str = "",
+    complexity: str = "",
+    complexity_class: str = "",
+    mode: str = "",
+    since: str = "",  # "YYYY-MM-DD[ HH:MM:SS]", inclusive
+    until: str = "",  # exclusive
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = None,  # next_cursor from the previous page
+    include_code: bool = False,
+    counts: bool = True,
+    fresh: bool = False  # Flush the writer's buffered rows first (blocks until written)
+):
+    """Page through the analysis history, newest first, with per-complexity-class counts"""
+    filters = {
+        "function_name": function, "code_hash": code_hash, "complexity": complexity,
+        "complexity_class": complexity_class, "mode": mode, "since": since, "until": until
+    }
+    if fresh:
+        results_writer.flush()
+    rows, next_cursor = history.query(filters, limit, cursor, include_code)
+    response = {"results": rows, "next_cursor": next_cursor}
+    if counts:
+        response["counts"] = history.counts(filters)
+    return response
+
 @app.post("/clear-results")
 async def clear_results():
     """Clears all the saved results"""
     try:
-        with open(EXPORT_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['timestamp', 'code', 'complexity', 'execution_time_ms'])
+        await run_in_threadpool(results_writer.clear)
         return {"message": "Results cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=505, detail=str(e))
@@ -283,5 +684,5 @@ if __name__ == "__main__":
         port=5000,
         log_level="info",
         reload=False,
-        workers=1  # Cuda deadlocks with multiple workers in dev container
+        workers=1  # Cuda deadlocks with multiple workers in dev container; use CPA_INFERENCE_ADDRESS to scale
     )
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Shared Weights
+Loads model weights as copy-on-write memory maps of the safetensors files, so
+every uvicorn worker (a separate spawned process) maps the same page-cache
+pages instead of holding its own copy. Checkpoints stored in a different dtype
+than the backend needs are converted once to a side file that all workers map.
+"""
+
+import json
+import os
+import pathlib
+import struct
+from typing import Dict, List
+
+import torch
+from transformers import AutoConfig
+from transformers.models.auto.modeling_auto import MODEL_FOR_CAUSAL_LM_MAPPING
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; the dev server there runs a single worker
+    fcntl = None
+
+
+_DTYPES = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+
+def read_header(path: pathlib.Path) -> Dict:
+    """Tensor table of a safetensors file, with offsets made absolute."""
+    with open(path, 'rb') as f:
+        length = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(length))
+    header.pop("__metadata__", None)
+    for entry in header.values():
+        entry["data_offsets"] = [8 + length + offset for offset in entry["data_offsets"]]
+    return header
+
+
+def checkpoint_files(model_path: pathlib.Path) -> List[pathlib.Path]:
+    files = sorted(pathlib.Path(model_path).glob("*.safetensors"))
+    if not files:
+        raise FileNotFoundError(f"No safetensors files in {model_path}")
+    return files
+
+
+def mmap_state_dict(files: List[pathlib.Path]) -> Dict[str, torch.Tensor]:
+    """
+    Map checkpoint files privately (copy-on-write) and view each tensor in place.
+
+    Args:
+        files: safetensors files making up the checkpoint
+
+    Returns:
+        State dict whose tensors share the files' page-cache pages
+    """
+    state_dict = {}
+    for path in files:
+        header = read_header(path)
+        storage = torch.UntypedStorage.from_file(str(path), False, os.path.getsize(path))
+        raw = torch.empty(0, dtype=torch.uint8).set_(storage)
+        for name, entry in header.items():
+            dtype = _DTYPES[entry["dtype"]]
+            begin, end = entry["data_offsets"]
+            if begin % dtype.itemsize:
+                raise ValueError(f"Tensor {name} in {path.name} is not aligned for in-place mapping")
+            state_dict[name] = raw[begin:end].view(dtype).reshape(entry["shape"])
+    return state_dict
+
+
+def convert_checkpoint(files: List[pathlib.Path], output: pathlib.Path, dtype: torch.dtype) -> None:
+    """
+    Write a single safetensors file with every floating point tensor cast to dtype.
+    Tensors are streamed one at a time, so peak memory stays at the largest tensor.
+    """
+    source = mmap_state_dict(files)
+    converted = lambda t: dtype if t.is_floating_point() else t.dtype
+    # Largest elements first keeps every offset aligned to its dtype
+    names = sorted(source, key=lambda name: -converted(source[name]).itemsize)
+
+    header, offset = {}, 0
+    for name in names:
+        tensor = source[name]
+        size = tensor.numel() * converted(tensor).itemsize
+        header[name] = {"dtype": _CODES[converted(tensor)], "shape": list(tensor.shape),
+                        "data_offsets": [offset, offset + size]}
+        offset += size
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(8 + len(encoded)) % 8)
+
+    partial = output.with_suffix(f".{os.getpid()}.tmp")
+    with open(partial, 'wb') as f:
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        for name in names:
+            tensor = source[name].to(converted(source[name])).contiguous()
+            f.write(tensor.view(torch.uint8).reshape(-1).numpy().tobytes())
+    os.replace(partial, output)
+
+
+def load_shared_model(model_path: pathlib.Path, dtype: torch.dtype, cache_dir: pathlib.Path):
+    """
+    Build the causal LM on top of memory-mapped weights.
+
+    Args:
+        model_path: Checkpoint directory
+        dtype: Dtype the backend runs in
+        cache_dir: Where converted copies are kept when the checkpoint dtype differs
+
+    Returns:
+        Model whose parameters live in shared file mappings
+    """
+    files = checkpoint_files(model_path)
+    stored = {_DTYPES[entry["dtype"]] for entry in read_header(files[0]).values()}
+    if stored != {dtype}:
+        cache_dir = pathlib.Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        output = cache_dir / f"model.{_CODES[dtype].lower()}.safetensors"
+        # Workers start together; the first one converts, the rest wait and reuse the file
+        with open(cache_dir / ".lock", 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            if not output.exists() or output.stat().st_mtime < max(f.stat().st_mtime for f in files):
+                print(f"[INFO] Converting checkpoint to {_CODES[dtype]} for shared loading: {output}")
+                convert_checkpoint(files, output, dtype)
+        files = [output]
+
+    config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+    model_class = MODEL_FOR_CAUSAL_LM_MAPPING[type(config)]
+    return model_class.from_pretrained(None, config=config, state_dict=mmap_state_dict(files), torch_dtype=dtype)
+
+
+def memory_usage() -> Dict:
+    """
+    This process's resident memory split into pages shared with other processes
+    and private pages (Linux only; empty elsewhere).
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    mb = lambda *keys: round(sum(fields.get(k, 0) for k in keys) / 1024, 1)
+    return {
+        "pid": os.getpid(),
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+    }
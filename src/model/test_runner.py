@@ -6,11 +6,225 @@ Executes generated performance test files and provides additional analysis.
 
 import sys
 import os
+import contextlib
+import gc
+import importlib.util
+import io
+import itertools
+import multiprocessing
+import signal
 import subprocess
 import json
-from typing import Dict, List, Optional
+import threading
+import time
+import traceback
+import queue
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
 import argparse
 
+# Fix dual import for relative path for cluster vs dev container
+try:
+    from .sandbox import LIMITS_SOURCE, SANDBOX_ENV, apply_limits, available_cpus, sandbox_env
+except ImportError:
+    from sandbox import LIMITS_SOURCE, SANDBOX_ENV, apply_limits, available_cpus, sandbox_env
+
+
+# Runs a test file as __main__ after applying the memory limit and CPU pinning
+# (done in the child itself, since preexec_fn is unsafe with worker threads)
+_LAUNCHER = LIMITS_SOURCE + """
+import os, runpy, sys
+memory_mb, cpu, path = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+apply_limits(None if cpu < 0 else cpu, memory_mb)
+sys.argv = sys.argv[3:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+runpy.run_path(path, run_name="__main__")
+"""
+
+
+def print_result(result: Dict) -> None:
+    """One status line per finished test, plus the end of its output when it did not pass."""
+    icon = "✅ PASS" if result['status'] == "passed" else f"❌ {result['status'].upper()}"
+    print(f"{icon} - {os.path.basename(result['test'])} ({result['duration_s']:.1f}s)")
+    if result['status'] != "passed":
+        # Last lines usually hold the traceback
+        print("\n".join("    " + line for line in result['output'].strip().splitlines()[-10:]))
+
+
+def _rss_mb() -> float:
+    """Current resident memory of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_results_file(path: str) -> Dict:
+    """
+    Read a results file written by a generated test (save_results).
+    
+    Returns:
+        Dictionary with function, complexity, code_hash, environment, results and fit
+    """
+    if path.endswith(".npz"):
+        import numpy as np
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            fields = [k for k in data.files if k not in ('meta', 'samples_ms')]
+            columns = {k: data[k].tolist() for k in fields}
+            samples = data['samples_ms']
+            results = []
+            for i in range(samples.shape[0]):
+                row = {k: columns[k][i] for k in fields}
+                row['samples_ms'] = [x for x in samples[i].tolist() if x == x]  # Drop NaN padding
+                results.append(row)
+        return {**meta, 'results': results}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def collect_results(directory: str) -> List[Dict]:
+    """Load every results file (*_performance*.json / .npz) under directory, tagged with its path."""
+    collected = []
+    for root, dirs, files in os.walk(directory):
+        for file in sorted(files):
+            if '_performance' in file and file.endswith(('.json', '.npz')):
+                path = os.path.join(root, file)
+                try:
+                    collected.append({'path': path, **load_results_file(path)})
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️  Skipping {path}: {e}")
+    return collected
+
+
+def run_test_module(test_file: str) -> Dict:
+    """
+    Import a generated test and call its run_performance_test() in this process.
+    
+    Returns:
+        Dictionary with test, status, returncode (None), duration_s, output,
+        function, complexity, environment, results and fit
+    """
+    start = time.perf_counter()
+    output = io.StringIO()
+    result = {'test': test_file, 'status': "passed", 'returncode': None, 'function': None,
+              'complexity': None, 'results': [], 'fit': None}
+    name = f"cpa_performance_test_{time.time_ns()}"
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            spec = importlib.util.spec_from_file_location(name, test_file)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)  # Not __main__: defines the test without running it
+            if not hasattr(module, "run_performance_test"):
+                raise RuntimeError("Not a current generated performance test (no run_performance_test); "
+                                   "regenerate it or run without --in-process")
+            tester = module.run_performance_test(plot=False)
+        result.update(tester.to_dict())
+    except MemoryError:
+        result['status'] = "memory_limit"
+        output.write(traceback.format_exc())
+    except BaseException:
+        result['status'] = "failed"
+        output.write(traceback.format_exc())
+    finally:
+        module = None
+        gc.collect()
+    result['duration_s'] = round(time.perf_counter() - start, 3)
+    result['output'] = output.getvalue()
+    return result
+
+
+def _in_process_worker(conn, cpu: Optional[int], max_tests: int, memory_mb: int, recycle_mb: int) -> None:
+    """Worker loop: run test files sent over conn until told to stop or due for recycling."""
+    try:
+        apply_limits(cpu, memory_mb)
+    except (ValueError, OSError):
+        pass
+    
+    for count in itertools.count(1):
+        try:
+            test_file = conn.recv()
+        except EOFError:
+            return
+        if test_file is None:
+            return
+        result = run_test_module(test_file)
+        # Fresh process after max_tests or once leftovers push memory over the threshold
+        recycle = count >= max_tests or _rss_mb() > recycle_mb
+        conn.send((result, recycle))
+        if recycle:
+            return
+
+
+def _worker_context():
+    """
+    Start method for in-process workers: a fork server that has numpy and
+    matplotlib (Agg) imported already, so every worker starts warm.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")  # Windows: workers import on their own
+    os.environ.setdefault("MPLBACKEND", SANDBOX_ENV["MPLBACKEND"])
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["numpy", "matplotlib", "matplotlib.pyplot"])
+    return context
+
+
+class InProcessWorker:
+    """A long-lived worker process that imports and runs generated tests one at a time."""
+    
+    def __init__(self, context, cpu: Optional[int], max_tests: int, memory_mb: int, recycle_mb: int):
+        self.cpu = cpu
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_in_process_worker,
+            args=(child, cpu, max_tests, memory_mb, recycle_mb),
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+    
+    def run(self, test_file: str, timeout_s: float) -> Tuple[Dict, bool]:
+        """
+        Run one test in the worker.
+        
+        Returns:
+            Tuple of (result, whether the worker can take another test)
+        """
+        start = time.perf_counter()
+        failed = {'test': test_file, 'returncode': None, 'cpu': self.cpu, 'output': "",
+                  'function': None, 'complexity': None, 'results': [], 'fit': None}
+        try:
+            self.conn.send(test_file)
+            if not self.conn.poll(timeout_s):
+                self.close(kill=True)
+                return {**failed, 'status': "timeout", 'duration_s': round(time.perf_counter() - start, 3)}, False
+            result, recycle = self.conn.recv()
+        except (EOFError, OSError):
+            # Crashed (segfault, OOM kill, os._exit) mid-test
+            self.close(kill=True)
+            return {**failed, 'status': "failed", 'returncode': self.process.exitcode,
+                    'output': f"Worker exited with code {self.process.exitcode}",
+                    'duration_s': round(time.perf_counter() - start, 3)}, False
+        result['cpu'] = self.cpu
+        if recycle:
+            self.close()
+        return result, not recycle
+    
+    def close(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        self.process.join(5)
+        self.conn.close()
+
 
 class TestRunner:
     """Runner for executing performance tests."""
@@ -31,11 +245,11 @@ class TestRunner:
             'numpy': False
         }
         
+        # Locate without importing: probing shouldn't pay for loading matplotlib and numpy
         for dep in dependencies.keys():
             try:
-                __import__(dep)
-                dependencies[dep] = True
-            except ImportError:
+                dependencies[dep] = importlib.util.find_spec(dep) is not None
+            except (ImportError, ValueError):
                 dependencies[dep] = False
         
         return dependencies
@@ -112,6 +326,70 @@ class TestRunner:
             print(f"\n❌ Unexpected error: {e}")
             return False
     
+    def run_isolated(self, timeout_s: float = 300.0, memory_mb: int = 2048, cpu: Optional[int] = None) -> Dict:
+        """
+        Execute the test file in a limited subprocess and capture its output.
+        
+        Args:
+            timeout_s: Wall-clock limit; the test (and anything it started) is killed after it
+            memory_mb: Address-space limit (0 for none; ignored where rlimits are unsupported)
+            cpu: CPU to pin the test to, or None to let it float
+        
+        Returns:
+            Dictionary with test, status (passed, failed, timeout or memory_limit),
+            returncode, duration_s, cpu and output, plus the contents of the
+            test's results file (function, complexity, environment, results, fit)
+        """
+        results_path = os.path.splitext(os.path.abspath(self.test_file))[0] + ".json"
+        env = sandbox_env(dict(os.environ))
+        
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-c", _LAUNCHER, str(memory_mb), str(-1 if cpu is None else cpu),
+             os.path.abspath(self.test_file), "--output", results_path],
+            cwd=os.path.dirname(os.path.abspath(self.test_file)),
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            start_new_session=os.name == "posix"
+        )
+        try:
+            output, _ = proc.communicate(timeout=timeout_s)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+            output, _ = proc.communicate()
+            timed_out = True
+        
+        if timed_out:
+            status = "timeout"
+        elif proc.returncode == 0:
+            status = "passed"
+        elif "MemoryError" in output:
+            status = "memory_limit"
+        else:
+            status = "failed"
+        
+        result = {
+            'test': self.test_file,
+            'status': status,
+            'returncode': proc.returncode,
+            'duration_s': round(time.perf_counter() - start, 3),
+            'cpu': cpu,
+            'output': output
+        }
+        if status == "passed" and os.path.exists(results_path):
+            try:
+                result.update(load_results_file(results_path))
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not read {results_path}: {e}")
+        return result
+    
     def quick_test(self, sizes: Optional[List[int]] = None) -> None:
         """
         Run a quick test with smaller input sizes.
@@ -189,6 +467,180 @@ class BatchTestRunner:
         print(f"\nTotal: {passed}/{total} tests passed")
         
         return results
+    
+    def run_parallel(self, jobs: int = 0, timeout_s: float = 300.0, memory_mb: int = 2048,
+                     pin: bool = True) -> List[Dict]:
+        """
+        Run all found performance tests concurrently, each in a limited subprocess.
+        
+        Args:
+            jobs: Concurrent tests (0 = one per available CPU)
+            timeout_s: Per-test wall-clock limit
+            memory_mb: Per-test memory limit
+            pin: Give each running test a CPU of its own so timings don't interfere
+        
+        Returns:
+            One TestRunner.run_isolated result per test, in discovery order
+        """
+        test_files = self.find_test_files()
+        
+        if not test_files:
+            print(f"⚠️  No performance test files found in {self.test_directory}")
+            return []
+        
+        cpus = available_cpus() if pin else []
+        jobs = jobs or len(cpus) or os.cpu_count() or 1
+        if cpus and jobs > len(cpus):
+            print(f"⚠️  {jobs} jobs but only {len(cpus)} CPUs: not pinning")
+            cpus = []
+        free_cpus = queue.Queue()
+        for cpu in cpus:
+            free_cpus.put(cpu)
+        
+        print(f"📋 Found {len(test_files)} performance test(s), running {jobs} at a time\n")
+        print_lock = threading.Lock()
+        
+        def run(test_file: str) -> Dict:
+            cpu = free_cpus.get() if cpus else None
+            try:
+                return TestRunner(test_file).run_isolated(timeout_s, memory_mb, cpu)
+            finally:
+                if cpu is not None:
+                    free_cpus.put(cpu)
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(run, test_file): test_file for test_file in test_files}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                with print_lock:
+                    print_result(result)
+        
+        ordered = [results[test_file] for test_file in test_files]
+        passed = sum(1 for r in ordered if r['status'] == "passed")
+        print(f"\nTotal: {passed}/{len(ordered)} tests passed")
+        return ordered
+    
+    def run_in_process(self, jobs: int = 1, timeout_s: float = 300.0, memory_mb: int = 2048,
+                       max_tests: int = 50, recycle_mb: int = 512, pin: bool = True) -> List[Dict]:
+        """
+        Run all found performance tests inside pre-warmed worker processes.
+        
+        Workers are forked from a server that already imported numpy and
+        matplotlib, import each test as a module and call its
+        run_performance_test() directly, so no test pays for interpreter startup
+        or those imports. A worker is replaced after max_tests tests, once its
+        memory passes recycle_mb, or when a test times out or crashes it.
+        
+        Args:
+            jobs: Concurrent workers (0 = one per available CPU)
+            timeout_s: Per-test wall-clock limit
+            memory_mb: Address-space limit per worker
+            max_tests: Tests per worker before it is recycled
+            recycle_mb: Resident memory above which a worker is recycled
+            pin: Pin each worker to a CPU of its own
+        
+        Returns:
+            One result per test, in discovery order, including the measured
+            results and complexity fit
+        """
+        test_files = self.find_test_files()
+        
+        if not test_files:
+            print(f"⚠️  No performance test files found in {self.test_directory}")
+            return []
+        
+        cpus = available_cpus() if pin else []
+        jobs = jobs or len(cpus) or os.cpu_count() or 1
+        if cpus and jobs > len(cpus):
+            print(f"⚠️  {jobs} jobs but only {len(cpus)} CPUs: not pinning")
+            cpus = []
+        
+        print(f"📋 Found {len(test_files)} performance test(s), running {jobs} at a time in warm workers\n")
+        context = _worker_context()
+        pending = queue.Queue()
+        for test_file in test_files:
+            pending.put(test_file)
+        results = {}
+        print_lock = threading.Lock()
+        
+        def slot(cpu: Optional[int]) -> None:
+            worker = None
+            while True:
+                try:
+                    test_file = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if worker is None:
+                    worker = InProcessWorker(context, cpu, max_tests, memory_mb, recycle_mb)
+                result, alive = worker.run(test_file, timeout_s)
+                if not alive:
+                    worker = None
+                results[test_file] = result
+                with print_lock:
+                    print_result(result)
+            if worker is not None:
+                worker.close()
+        
+        threads = [
+            threading.Thread(target=slot, args=(cpus[i] if cpus else None,), name=f"cpa-test-slot-{i}")
+            for i in range(jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        ordered = [results[test_file] for test_file in test_files]
+        passed = sum(1 for r in ordered if r['status'] == "passed")
+        print(f"\nTotal: {passed}/{len(ordered)} tests passed")
+        return ordered
+
+
+def write_json_summary(results: List[Dict], path: str, comparisons: Optional[List[Dict]] = None) -> None:
+    """Write a machine-readable summary of run_parallel/run_in_process results (outputs included) and any regression comparisons."""
+    summary = {
+        'tests': len(results),
+        'passed': sum(1 for r in results if r['status'] == "passed"),
+        'duration_s': round(sum(r['duration_s'] for r in results), 3),
+        'results': results
+    }
+    if comparisons is not None:
+        summary['regressions'] = comparisons
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+
+def write_junit_summary(results: List[Dict], path: str) -> None:
+    """Write run_parallel/run_in_process results as a JUnit XML report for CI."""
+    failures = sum(1 for r in results if r['status'] != "passed")
+    suite = ET.Element(
+        'testsuite',
+        name='performance-tests',
+        tests=str(len(results)),
+        failures=str(failures),
+        errors='0',
+        time=f"{sum(r['duration_s'] for r in results):.3f}"
+    )
+    for result in results:
+        case = ET.SubElement(
+            suite,
+            'testcase',
+            classname='performance',
+            name=os.path.basename(result['test']),
+            file=result['test'],
+            time=f"{result['duration_s']:.3f}"
+        )
+        if result['status'] != "passed":
+            message = {
+                'timeout': "Timed out",
+                'memory_limit': "Exceeded the memory limit",
+            }.get(result['status'], "Failed" if result['returncode'] is None else f"Exit code {result['returncode']}")
+            failure = ET.SubElement(case, 'failure', message=message, type=result['status'])
+            failure.text = "\n".join(result['output'].strip().splitlines()[-50:])
+        ET.SubElement(case, 'system-out').text = result['output']
+    ET.ElementTree(suite).write(path, encoding='utf-8', xml_declaration=True)
 
 
 def main():
@@ -228,9 +680,180 @@ def main():
         help='Run quick test with smaller input sizes'
     )
     
+    parser.add_argument(
+        '--jobs',
+        '-j',
+        type=int,
+        default=None,
+        help='Run tests in parallel, N at a time (0 = one per CPU), each pinned to a CPU'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=300.0,
+        help='Per-test time limit in seconds (parallel mode)'
+    )
+    
+    parser.add_argument(
+        '--memory-mb',
+        type=int,
+        default=2048,
+        help='Per-test memory limit in MB, 0 for none (parallel mode)'
+    )
+    
+    parser.add_argument(
+        '--no-pin',
+        action='store_true',
+        help='Do not pin parallel tests to CPUs'
+    )
+    
+    parser.add_argument(
+        '--in-process',
+        action='store_true',
+        help='Run tests inside pre-warmed worker processes instead of one interpreter per test'
+    )
+    
+    parser.add_argument(
+        '--max-tests',
+        type=int,
+        default=50,
+        help='Tests per worker before it is replaced (in-process mode)'
+    )
+    
+    parser.add_argument(
+        '--recycle-mb',
+        type=int,
+        default=512,
+        help='Replace a worker once its memory exceeds this many MB (in-process mode)'
+    )
+    
+    parser.add_argument(
+        '--collect',
+        action='store_true',
+        help='Only aggregate existing results files under --directory (no tests are run)'
+    )
+    
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='Store the per-size results of this run as regression baselines'
+    )
+    
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='Re-run the tests and report regressions against the stored baselines'
+    )
+    
+    parser.add_argument(
+        '--baseline-file',
+        help='Baseline store (default: .cpa_baselines.json in --directory)'
+    )
+    
+    parser.add_argument(
+        '--alpha',
+        type=float,
+        default=0.01,
+        help='Significance level for regressions (compare mode)'
+    )
+    
+    parser.add_argument(
+        '--threshold',
+        type=float,
+        default=0.2,
+        help='Smallest slowdown reported as a regression, 0.2 = 20%% (compare mode)'
+    )
+    
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='Runs of the suite when saving or comparing baselines, to measure drift between runs'
+    )
+    
+    parser.add_argument(
+        '--json',
+        help='Write a JSON summary to this file (parallel mode)'
+    )
+    
+    parser.add_argument(
+        '--junit',
+        help='Write a JUnit XML summary to this file (parallel mode)'
+    )
+    
     args = parser.parse_args()
     
-    if args.batch:
+    if args.collect:
+        # Aggregate saved results without re-running anything
+        collected = collect_results(args.directory)
+        for data in collected:
+            fit = (data.get('fit') or {}).get('best', "-")
+            print(f"{data['function']:<30} predicted {data['complexity']:<12} fitted {fit:<12} "
+                  f"{len(data['results'])} sizes  ({data['path']})")
+        print(f"\n📊 Collected {len(collected)} result file(s)")
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(collected, f)
+            print(f"📝 JSON summary: {args.json}")
+        sys.exit(0 if collected else 1)
+    
+    baseline_mode = args.compare or args.save_baseline
+    if baseline_mode and args.jobs is None and not args.in_process:
+        args.jobs = 1  # Baselines need measured results, which the parallel runner collects
+    
+    runs = []
+    for run in range(max(1, args.repeat) if baseline_mode else 1):
+        if baseline_mode and args.repeat > 1:
+            print(f"\n🔁 Run {run + 1}/{args.repeat}")
+        if args.in_process:
+            # Warm worker mode
+            runner = BatchTestRunner(args.directory)
+            runs.append(runner.run_in_process(
+                1 if args.jobs is None else args.jobs, args.timeout, args.memory_mb,
+                args.max_tests, args.recycle_mb, pin=not args.no_pin
+            ))
+        elif args.jobs is not None:
+            # Parallel batch mode
+            runner = BatchTestRunner(args.directory)
+            runs.append(runner.run_parallel(args.jobs, args.timeout, args.memory_mb, pin=not args.no_pin))
+    
+    if args.in_process or args.jobs is not None:
+        results = runs[-1]
+        comparisons = None
+        if baseline_mode:
+            # Fix dual import for relative path for cluster vs dev container
+            try:
+                from .regression import BaselineStore, compare_results, format_report
+            except ImportError:
+                from regression import BaselineStore, compare_results, format_report
+            store = BaselineStore(args.baseline_file or os.path.join(args.directory, ".cpa_baselines.json"))
+            if args.compare:
+                comparisons = compare_results(runs, store, args.alpha, args.threshold)
+                print("\n📉 Regression report\n" + format_report(comparisons))
+            if args.save_baseline:
+                by_test = {}
+                for run_results in runs:
+                    for result in run_results:
+                        by_test.setdefault(result['test'], []).append(result)
+                saved = [attempts for attempts in by_test.values()
+                         if all(r['status'] == "passed" and r.get('results') for r in attempts)]
+                for attempts in saved:
+                    store.update(attempts)
+                store.save()
+                print(f"\n💾 Saved {len(saved)} baseline(s) to {store.path}")
+        if args.json:
+            write_json_summary(results, args.json, comparisons)
+            print(f"📝 JSON summary: {args.json}")
+        if args.junit:
+            write_junit_summary(results, args.junit)
+            print(f"📝 JUnit summary: {args.junit}")
+        regressed = any(c['regressed'] or c['class_shift'] for c in comparisons or [])
+        if regressed:
+            print("\n❌ Performance regressions detected")
+        passed = all(r['status'] == "passed" for run_results in runs for r in run_results)
+        sys.exit(0 if results and passed and not regressed else 1)
+    elif args.batch:
         # Batch mode
         runner = BatchTestRunner(args.directory)
         runner.run_all_tests()